@@ -18,6 +18,7 @@ DATABASE_PATH = BASE_DIR / "rss_media_bus.db"
 CONFIG_DIR = BASE_DIR / "config"
 SOURCES_CONFIG = CONFIG_DIR / "sources.yaml"
 USERS_CONFIG = CONFIG_DIR / "users.yaml"
+PROXY_CONFIG = CONFIG_DIR / "proxy.yaml"
 
 # Логи
 LOGS_DIR = BASE_DIR / "logs"
@@ -32,9 +33,158 @@ MONITORING_INTERVAL = 300  # 5 минут
 HTTP_TIMEOUT = 30
 REQUEST_TIMEOUT = HTTP_TIMEOUT  # Алиас для совместимости
 
+# Общий HTTP пул RSS парсера (переопределяются секцией http в sources.yaml)
+HTTP_MAX_CONNECTIONS = 20
+HTTP_MAX_CONNECTIONS_PER_HOST = 2
+
+# Сколько простаивающее keep-alive соединение остается в пуле (секунды)
+HTTP_KEEPALIVE_TIMEOUT = 300
+
+# Время жизни кэша DNS резолвера (секунды)
+HTTP_DNS_CACHE_TTL = 600
+
+# Вежливость к хосту: запросов в секунду и запас (burst) в token bucket хоста
+HOST_REQUESTS_PER_SECOND = 1.0
+HOST_BURST = 2
+
+# Общий лимит одновременных запросов (AIMD): старт и границы
+FETCH_CONCURRENCY_START = 5
+FETCH_CONCURRENCY_MIN = 2
+FETCH_CONCURRENCY_MAX = HTTP_MAX_CONNECTIONS
+
+# Ответ быстрее этого увеличивает общий лимит, медленнее - уменьшает вдвое (секунды)
+FETCH_LATENCY_TARGET_SECONDS = 2.0
+
+# Хост со средней задержкой выше порога уходит в отдельную полосу и не занимает общий лимит (секунды)
+FETCH_SLOW_HOST_SECONDS = 8.0
+FETCH_SLOW_LANE_SLOTS = 10
+
+# Бюджет времени на опрос источников за цикл: повтор, не успевающий в бюджет, откладывается (секунды)
+FETCH_CYCLE_BUDGET_SECONDS = 60
+
+# Меньше этого остатка бюджета новая попытка запроса не начинается (секунды)
+FETCH_MIN_ATTEMPT_SECONDS = 3
+
+# Ожидаемая длительность запроса к фиду без истории задержек (секунды)
+FETCH_DEFAULT_LATENCY_SECONDS = 5
+
+# Задержки последних запросов на фид для p50/p95 и минимум замеров для hedged запроса
+FETCH_LATENCY_HISTORY = 50
+FETCH_HEDGE_MIN_SAMPLES = 10
+
+# Hedged запрос не отправляется раньше этой задержки, даже если p95 фида меньше (секунды)
+FETCH_HEDGE_MIN_DELAY_SECONDS = 1.0
+
+# Подряд идущих сетевых ошибок, после которых прокси выводится из ротации
+PROXY_MAX_FAILURES = 2
+
+# Через сколько выведенный прокси проходит повторную проверку (секунды, удваивается до часа)
+PROXY_RETRY_AFTER_SECONDS = 300
+
+# Проверка здоровья прокси: URL и таймаут (секунды)
+PROXY_HEALTH_CHECK_URL = "http://www.google.com/generate_204"
+PROXY_HEALTH_CHECK_TIMEOUT = 10
+
 # Максимальное количество попыток при ошибке
 MAX_RETRY_ATTEMPTS = 3
 
+# Пул разбора RSS: "thread" (потоки) или "process" (процессы, параллельно на всех ядрах)
+PARSE_EXECUTOR = "thread"
+
+# Количество воркеров пула разбора RSS
+PARSE_WORKERS = min(4, os.cpu_count() or 1)
+
+# Адаптивное расписание опроса: границы интервала для одного источника (секунды)
+POLL_MIN_INTERVAL_SECONDS = 60
+POLL_MAX_INTERVAL_SECONDS = 30 * 60
+
+# Сколько новых статей в среднем ожидаем за один опрос источника
+POLL_TARGET_ARTICLES_PER_POLL = 1.0
+
+# Окно истории articles.added_date для оценки темпа публикации (часы)
+POLL_RATE_WINDOW_HOURS = 48
+
+# Случайный разброс следующего опроса (доля интервала)
+POLL_JITTER = 0.1
+
+# Фиды крупнее этого размера разбираются потоково, без загрузки тела целиком (байты)
+STREAM_PARSE_MIN_BYTES = 1024 * 1024
+
+# Размер куска чтения ответа при потоковом разборе (байты)
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Ожидаемое число новых статей в сутки по всем источникам (емкость индекса дедупликации)
+DEDUP_EXPECTED_ARTICLES_PER_DAY = 5000
+
+# Допустимая доля ложных срабатываний Bloom-фильтра дедупликации
+DEDUP_BLOOM_ERROR_RATE = 0.001
+
+# Размер LRU недавно виденных ссылок (покрывает все записи всех фидов за цикл)
+DEDUP_LRU_SIZE = 20000
+
+# ============= УВЕДОМЛЕНИЯ =============
+
+# Как часто User Notification Service проверяет outbox новых статей (секунды)
+NOTIFICATION_OUTBOX_POLL_SECONDS = 2
+
+# Сколько событий outbox обрабатывается за один проход
+NOTIFICATION_BATCH_SIZE = 500
+
+# Получатель, у которого фильтрация/перевод падает столько циклов подряд, откладывается на паузу:
+# его курсор не участвует в общем чтении, и страницы с его позиции не перечитываются каждый цикл
+NOTIFICATION_MAX_FAILURES = 3
+NOTIFICATION_PARK_SECONDS = 600
+
+# Сколько готовых к отправке сообщений очереди доставки забирается за один проход
+DELIVERY_BATCH_SIZE = 500
+
+# Повтор неудачной отправки: пауза base * 2^(попытка - 1), но не больше max (секунды)
+DELIVERY_RETRY_BASE_SECONDS = 30
+DELIVERY_RETRY_MAX_SECONDS = 3600
+
+# После стольких неудачных попыток сообщение помечается failed и больше не отправляется
+DELIVERY_MAX_ATTEMPTS = 6
+
+# Сколько хранятся отправленные и failed записи очереди (окно дедупликации, дни)
+DELIVERY_RETENTION_DAYS = 7
+
+# Дайджест топика (digest в topics_mapping): отправка при накоплении стольких статей
+# или по истечении ожидания самой ранней из них (секунды)
+DIGEST_MIN_ARTICLES = 3
+DIGEST_MAX_WAIT_SECONDS = 120
+
+# Максимальная длина текста сообщения Telegram (символы)
+TELEGRAM_MESSAGE_LIMIT = 4096
+
+# Соединений с api.telegram.org в пуле сессии одного бота
+TELEGRAM_CONNECTIONS_PER_BOT = 8
+
+# Лимиты Telegram Bot API (token bucket): на бота по всем чатам, в секунду;
+# скорость + запас не превышают ~30 сообщений за любую секунду
+TELEGRAM_BOT_MESSAGES_PER_SECOND = 25
+TELEGRAM_BOT_BURST = 5
+
+# На группу/супергруппу: лимит Telegram (сообщений за любые 60 секунд) и запас для всплеска.
+# Запас входит в лимит: bucket пополняется со скоростью (лимит - запас) в минуту;
+# каждое сообщение запаса отнимает его от устойчивой скорости, поэтому запас минимальный
+TELEGRAM_GROUP_MESSAGES_PER_MINUTE = 20
+TELEGRAM_GROUP_BURST = 1
+
+# На личный чат: сообщений в секунду
+TELEGRAM_PRIVATE_MESSAGES_PER_SECOND = 1
+TELEGRAM_PRIVATE_BURST = 1
+
+# На топик супергруппы: лимит за 60 секунд и запас, входящий в него
+TELEGRAM_TOPIC_MESSAGES_PER_MINUTE = 20
+TELEGRAM_TOPIC_BURST = 1
+
+# Обучение на 429: скорость чата умножается на этот коэффициент (но не ниже минимальной доли),
+# успешная отправка возвращает долю исходной скорости - медленно (~2000 отправок до исходной),
+# чтобы обученная скорость держалась ниже лимита сервера, а не возвращалась к 429
+TELEGRAM_RATE_BACKOFF = 0.8
+TELEGRAM_RATE_RECOVERY = 0.0005
+TELEGRAM_RATE_MIN_FRACTION = 0.25
+
 # ============= БАЗА ДАННЫХ =============
 
 # Время хранения старых статей (дни)
@@ -43,6 +193,21 @@ ARTICLE_RETENTION_DAYS = 90
 # Максимальное количество статей в базе
 MAX_ARTICLES_COUNT = 100000
 
+# Таймаут ожидания блокировки SQLite (секунды)
+DATABASE_BUSY_TIMEOUT = 30
+
+# Режим синхронизации SQLite (NORMAL безопасен в режиме WAL)
+DATABASE_SYNCHRONOUS = "NORMAL"
+
+# Размер кэша страниц SQLite на соединение (KiB)
+DATABASE_CACHE_SIZE_KB = 16384
+
+# Объем memory-mapped I/O для SQLite (байты)
+DATABASE_MMAP_SIZE = 256 * 1024 * 1024
+
+# Размер кэша подготовленных выражений на соединение
+DATABASE_STATEMENT_CACHE_SIZE = 256
+
 # ============= СОЗДАНИЕ ДИРЕКТОРИЙ =============
 
 def ensure_directories():
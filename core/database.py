@@ -1,189 +1,259 @@
 import sqlite3
 import os
+import json
+import threading
+from contextlib import contextmanager
 from datetime import datetime
-from config import DATABASE_PATH
+from config import (
+    DATABASE_PATH, DATABASE_BUSY_TIMEOUT, DATABASE_SYNCHRONOUS,
+    DATABASE_CACHE_SIZE_KB, DATABASE_MMAP_SIZE, DATABASE_STATEMENT_CACHE_SIZE
+)
+from core.migrations import apply_migrations
+
+# Общая часть INSERT для статей: одинаковый текст SQL переиспользует подготовленное выражение
+ARTICLE_INSERT_SQL = '''articles
+    (feed_id, title, link, description, content, author, published_date,
+     guid, category, tags, full_text, media_attachments, modification_date,
+     news_id, content_type, newsline)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'''
+
+# Сдвиг курсора получателя (commit_subscriber_offsets и enqueue_deliveries)
+SUBSCRIBER_OFFSET_UPSERT_SQL = '''
+    INSERT INTO subscriber_offsets (subscriber, last_article_id, updated_at) VALUES (?, ?, CURRENT_TIMESTAMP)
+    ON CONFLICT(subscriber) DO UPDATE SET last_article_id = excluded.last_article_id, updated_at = excluded.updated_at
+'''
 
 class DatabaseManager:
-    def __init__(self):
-        self.db_path = DATABASE_PATH
+    def __init__(self, db_path=None):
+        self.db_path = db_path or DATABASE_PATH
+
+        # Долгоживущие соединения: по одному на поток
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+
         self.init_database()
-    
+
     def get_connection(self):
-        return sqlite3.connect(self.db_path)
-    
-    def init_database(self):
+        """
+        Долгоживущее соединение текущего потока (WAL + настроенные PRAGMA).
+        Соединение переиспользуется между вызовами - закрывать его не нужно.
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._open_connection()
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def _open_connection(self):
+        """Открытие нового соединения с настройками производительности"""
+        conn = sqlite3.connect(
+            str(self.db_path),
+            timeout=DATABASE_BUSY_TIMEOUT,
+            cached_statements=DATABASE_STATEMENT_CACHE_SIZE
+        )
+        # WAL: читатели (User Notification Service) не блокируют писателя (RSS Bus Core)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(f'PRAGMA synchronous={DATABASE_SYNCHRONOUS}')
+        conn.execute(f'PRAGMA cache_size=-{DATABASE_CACHE_SIZE_KB}')
+        conn.execute(f'PRAGMA mmap_size={DATABASE_MMAP_SIZE}')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        conn.execute(f'PRAGMA busy_timeout={DATABASE_BUSY_TIMEOUT * 1000}')
+        return conn
+
+    @contextmanager
+    def transaction(self, immediate=False):
+        """
+        Транзакция на соединении текущего потока: commit при успехе, rollback при ошибке.
+        immediate=True сразу захватывает блокировку записи (BEGIN IMMEDIATE).
+        """
         conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''CREATE TABLE IF NOT EXISTS feeds (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            url TEXT UNIQUE NOT NULL,
-            title TEXT,
-            description TEXT,
-            active BOOLEAN DEFAULT 1,
-            added_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            last_updated TIMESTAMP
-        )''')
-        
-        cursor.execute('''CREATE TABLE IF NOT EXISTS articles (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            feed_id INTEGER NOT NULL,
-            title TEXT NOT NULL,
-            link TEXT UNIQUE,
-            description TEXT,
-            content TEXT,
-            author TEXT,
-            published_date TIMESTAMP,
-            added_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            guid TEXT,
-            category TEXT,
-            tags TEXT,
-            full_text TEXT,
-            media_attachments TEXT,
-            modification_date TIMESTAMP,
-            news_id TEXT,
-            content_type TEXT,
-            newsline TEXT,
-            FOREIGN KEY (feed_id) REFERENCES feeds (id)
-        )''')
-        
-        # Попытка добавить новые поля к существующей таблице (миграция)
-        self._migrate_articles_table()
-        
-        conn.commit()
-        conn.close()
+        if immediate:
+            conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+
+    def close(self):
+        """Закрытие всех открытых соединений (при остановке процесса)"""
+        with self._connections_lock:
+            connections = self._connections
+            self._connections = []
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.ProgrammingError:
+                # Соединение создано в другом потоке - закроется вместе с ним
+                pass
+        self._local = threading.local()
+
+    def init_database(self):
+        # BEGIN IMMEDIATE: DDL и миграции выполняются в одной транзакции под блокировкой записи -
+        # процессы, стартующие одновременно (RSS Bus Core и User Notification Service), применяют их по очереди
+        with self.transaction(immediate=True) as conn:
+            conn.execute('''CREATE TABLE IF NOT EXISTS feeds (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                url TEXT UNIQUE NOT NULL,
+                title TEXT,
+                description TEXT,
+                active BOOLEAN DEFAULT 1,
+                added_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                last_updated TIMESTAMP
+            )''')
+
+            conn.execute('''CREATE TABLE IF NOT EXISTS articles (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                feed_id INTEGER NOT NULL,
+                title TEXT NOT NULL,
+                link TEXT UNIQUE,
+                description TEXT,
+                content TEXT,
+                author TEXT,
+                published_date TIMESTAMP,
+                added_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                guid TEXT,
+                category TEXT,
+                tags TEXT,
+                full_text TEXT,
+                media_attachments TEXT,
+                modification_date TIMESTAMP,
+                news_id TEXT,
+                content_type TEXT,
+                newsline TEXT,
+                FOREIGN KEY (feed_id) REFERENCES feeds (id)
+            )''')
+
+            # Версионированные миграции: новые поля, индексы и служебные таблицы
+            apply_migrations(conn)
+
         print("✅ База данных инициализирована")
-    
-    def _migrate_articles_table(self):
-        """Миграция существующей таблицы articles для добавления новых полей"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        # Список новых полей для добавления
-        new_fields = [
-            ('guid', 'TEXT'),
-            ('category', 'TEXT'), 
-            ('tags', 'TEXT'),
-            ('full_text', 'TEXT'),
-            ('media_attachments', 'TEXT'),
-            ('modification_date', 'TIMESTAMP'),
-            ('news_id', 'TEXT'),
-            ('content_type', 'TEXT'),
-            ('newsline', 'TEXT')
-        ]
-        
-        # Проверяем существующие колонки
-        cursor.execute("PRAGMA table_info(articles)")
-        existing_columns = [row[1] for row in cursor.fetchall()]
-        
-        # Добавляем недостающие колонки
-        for field_name, field_type in new_fields:
-            if field_name not in existing_columns:
-                try:
-                    cursor.execute(f"ALTER TABLE articles ADD COLUMN {field_name} {field_type}")
-                    print(f"✅ Добавлен столбец: {field_name}")
-                except Exception as e:
-                    print(f"⚠️ Ошибка добавления столбца {field_name}: {e}")
-        
-        conn.commit()
-        conn.close()
-    
+
     def add_feed(self, url, title=None, description=None):
-        conn = self.get_connection()
-        cursor = conn.cursor()
         try:
-            cursor.execute('INSERT INTO feeds (url, title, description) VALUES (?, ?, ?)', 
-                         (url, title, description))
-            feed_id = cursor.lastrowid
-            conn.commit()
+            with self.transaction() as conn:
+                cursor = conn.execute('INSERT INTO feeds (url, title, description) VALUES (?, ?, ?)',
+                                      (url, title, description))
+                feed_id = cursor.lastrowid
             print(f"✅ Добавлен источник: {title or url}")
             return feed_id
         except sqlite3.IntegrityError:
             print(f"⚠️  Источник уже существует: {url}")
             return None
-        finally:
-            conn.close()
-    
+
     def get_feed_id_by_url(self, url):
         """Получение feed_id по URL (для совместимости с MockDBManager)"""
         conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT id FROM feeds WHERE url = ?', (url,))
-        result = cursor.fetchone()
-        conn.close()
-        
+        result = conn.execute('SELECT id FROM feeds WHERE url = ?', (url,)).fetchone()
+
         if result:
             return result[0]
         else:
             # Автоматически создаем источник если его нет
             return self.add_feed(url, f"Auto-created: {url}")
-    
+
     def get_all_feeds(self, active_only=True):
         conn = self.get_connection()
-        cursor = conn.cursor()
         query = "SELECT * FROM feeds"
         if active_only:
             query += " WHERE active = 1"
-        cursor.execute(query)
-        feeds = cursor.fetchall()
-        conn.close()
-        return feeds
-    
+        return conn.execute(query).fetchall()
+
     def search_articles(self, keywords, limit=20):
         conn = self.get_connection()
-        cursor = conn.cursor()
         search_terms = []
         params = []
         for keyword in keywords:
             term = f"%{keyword.lower()}%"
             search_terms.append('(LOWER(a.title) LIKE ? OR LOWER(a.description) LIKE ? OR LOWER(a.content) LIKE ?)')
             params.extend([term, term, term])
-        
-        query = f'''SELECT a.title, a.link, a.description, a.published_date, 
+
+        query = f'''SELECT a.title, a.link, a.description, a.published_date,
                    a.author, f.title as feed_title, f.url as feed_url
             FROM articles a JOIN feeds f ON a.feed_id = f.id
             WHERE {' AND '.join(search_terms)}
             ORDER BY a.published_date DESC LIMIT ?'''
-        
+
         params.append(limit)
-        cursor.execute(query, params)
-        results = cursor.fetchall()
-        conn.close()
-        return results
-    
-    def add_article(self, feed_id, title, link, description, content, author, published_date, 
-                   guid=None, category=None, tags=None, full_text=None, media_attachments=None, 
+        return conn.execute(query, params).fetchall()
+
+    def add_article(self, feed_id, title, link, description, content, author, published_date,
+                   guid=None, category=None, tags=None, full_text=None, media_attachments=None,
                    modification_date=None, news_id=None, content_type=None, newsline=None):
         """Добавление статьи с расширенными полями"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
         try:
             # Конвертируем tags и media_attachments в JSON строки
-            import json
             tags_json = json.dumps(tags, ensure_ascii=False) if tags else None
             media_json = json.dumps(media_attachments, ensure_ascii=False) if media_attachments else None
-            
-            cursor.execute('''
-                INSERT INTO articles 
-                (feed_id, title, link, description, content, author, published_date,
-                 guid, category, tags, full_text, media_attachments, modification_date,
-                 news_id, content_type, newsline)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (feed_id, title, link, description, content, author, published_date,
-                  guid, category, tags_json, full_text, media_json, modification_date,
-                  news_id, content_type, newsline))
-            
-            conn.commit()
-            article_id = cursor.lastrowid
+
+            with self.transaction() as conn:
+                cursor = conn.execute('INSERT INTO ' + ARTICLE_INSERT_SQL,
+                                      (feed_id, title, link, description, content, author, published_date,
+                                       guid, category, tags_json, full_text, media_json, modification_date,
+                                       news_id, content_type, newsline))
+                article_id = cursor.lastrowid
+                conn.execute('INSERT INTO article_outbox (article_id) VALUES (?)', (article_id,))
+
             print(f"💾 Сохранена статья: {title[:50]}...")
             return article_id
-            
+
         except sqlite3.IntegrityError:
             # Статья уже существует
             return None
-        finally:
-            conn.close()
+
+    def add_articles_bulk(self, feed_id, articles):
+        """
+        Пакетное добавление статей источника одной транзакцией (один fsync на фид).
+        Дубликаты по link пропускаются через INSERT OR IGNORE.
+
+        Returns:
+            list: id реально вставленных статей
+        """
+        rows = []
+        for article in articles:
+            tags = article.get('tags')
+            media_attachments = article.get('media_attachments')
+            rows.append((
+                feed_id,
+                article.get('title', ''),
+                article.get('link'),
+                article.get('description', ''),
+                article.get('content', ''),
+                article.get('author', ''),
+                article.get('published_date'),
+                article.get('guid'),
+                article.get('category'),
+                json.dumps(tags, ensure_ascii=False) if tags else None,
+                article.get('full_text'),
+                json.dumps(media_attachments, ensure_ascii=False) if media_attachments else None,
+                article.get('modification_date'),
+                article.get('news_id'),
+                article.get('content_type'),
+                article.get('newsline')
+            ))
+
+        if not rows:
+            return []
+
+        # BEGIN IMMEDIATE: между MAX(id) и вставкой никто другой не пишет,
+        # поэтому все id > last_id принадлежат этому пакету
+        with self.transaction(immediate=True) as conn:
+            last_id = conn.execute('SELECT COALESCE(MAX(id), 0) FROM articles').fetchone()[0]
+            conn.executemany('INSERT OR IGNORE INTO ' + ARTICLE_INSERT_SQL, rows)
+            inserted_ids = [row[0] for row in conn.execute(
+                'SELECT id FROM articles WHERE id > ? ORDER BY id', (last_id,)
+            )]
+            # Событие для User Notification Service в той же транзакции, что и сами статьи
+            conn.executemany('INSERT INTO article_outbox (article_id) VALUES (?)',
+                             [(article_id,) for article_id in inserted_ids])
+
+        if inserted_ids:
+            print(f"💾 Сохранено статей: {len(inserted_ids)} (источник {feed_id})")
+        return inserted_ids
 
     def save_article(self, article_data):
         """Сохранение статьи из словаря (для совместимости с MockDBManager)"""
@@ -208,40 +278,251 @@ class DatabaseManager:
 
     def update_feed_info(self, feed_url=None, feed_id=None, status=None, last_check=None, articles_count=0, error_msg=None, title=None, **kwargs):
         """Обновление информации о фиде - совместимость с MockDBManager и новый интерфейс"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
         # Определяем feed_id
         if feed_url and not feed_id:
             feed_id = self.get_feed_id_by_url(feed_url)
-        
+
         if not feed_id:
             print(f"⚠️ Не удалось определить feed_id для {feed_url}")
-            conn.close()
             return
-        
+
         updates = []
         params = []
-        
+
         if title:
             updates.append("title = ?")
             params.append(title)
-        
+
         updates.append("last_updated = ?")
         params.append(datetime.now())
         params.append(feed_id)
-        
+
         query = f"UPDATE feeds SET {', '.join(updates)} WHERE id = ?"
-        cursor.execute(query, params)
-        conn.commit()
-        conn.close()
-    
+        with self.transaction() as conn:
+            conn.execute(query, params)
+
+    def get_feed_validators(self):
+        """Сохраненные валидаторы условного GET: {url: (etag, last_modified)}"""
+        conn = self.get_connection()
+        return {
+            url: (etag, last_modified)
+            for url, etag, last_modified in conn.execute(
+                'SELECT url, etag, last_modified FROM feeds WHERE etag IS NOT NULL OR last_modified IS NOT NULL'
+            )
+        }
+
+    def save_feed_validators(self, feed_url, etag=None, last_modified=None):
+        """Сохранение ETag / Last-Modified последнего ответа 200 для фида"""
+        with self.transaction() as conn:
+            conn.execute('''
+                INSERT INTO feeds (url, title, etag, last_modified) VALUES (?, ?, ?, ?)
+                ON CONFLICT(url) DO UPDATE SET etag = excluded.etag, last_modified = excluded.last_modified
+            ''', (feed_url, f"Auto-created: {feed_url}", etag, last_modified))
+
+    def get_feed_content_hashes(self):
+        """Отпечатки последнего обработанного содержимого фидов: {url: content_hash}"""
+        conn = self.get_connection()
+        return dict(conn.execute('SELECT url, content_hash FROM feeds WHERE content_hash IS NOT NULL'))
+
+    def save_feed_content_hash(self, feed_url, content_hash):
+        """Сохранение отпечатка содержимого фида после успешной обработки"""
+        with self.transaction() as conn:
+            conn.execute('''
+                INSERT INTO feeds (url, title, content_hash) VALUES (?, ?, ?)
+                ON CONFLICT(url) DO UPDATE SET content_hash = excluded.content_hash
+            ''', (feed_url, f"Auto-created: {feed_url}", content_hash))
+
+    def get_feed_publish_rates(self, window_hours):
+        """Темп публикации по источникам за окно: {feed_id: статей в час}"""
+        conn = self.get_connection()
+        rows = conn.execute('''
+            SELECT feed_id, COUNT(*) FROM articles
+            WHERE added_date >= datetime('now', ?)
+            GROUP BY +feed_id
+        ''', (f'-{int(window_hours)} hours',))
+        return {str(feed_id): count / window_hours for feed_id, count in rows}
+
+    def get_feed_schedule(self):
+        """Сохраненное расписание опроса: [(source_id, interval, next_poll, last_poll, rate_per_hour)]"""
+        conn = self.get_connection()
+        return conn.execute(
+            'SELECT source_id, interval_seconds, next_poll, last_poll, rate_per_hour FROM feed_schedule'
+        ).fetchall()
+
+    def save_feed_schedule(self, rows):
+        """Сохранение расписания опроса одной транзакцией"""
+        with self.transaction() as conn:
+            conn.executemany('''
+                INSERT INTO feed_schedule (source_id, interval_seconds, next_poll, last_poll, rate_per_hour)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(source_id) DO UPDATE SET
+                    interval_seconds = excluded.interval_seconds,
+                    next_poll = excluded.next_poll,
+                    last_poll = excluded.last_poll,
+                    rate_per_hour = excluded.rate_per_hour
+            ''', rows)
+
+    def delete_feed_schedule(self, source_ids):
+        with self.transaction() as conn:
+            conn.executemany('DELETE FROM feed_schedule WHERE source_id = ?', [(source_id,) for source_id in source_ids])
+
+    def get_outbox_head(self):
+        """Последний seq в outbox новых статей"""
+        conn = self.get_connection()
+        return conn.execute('SELECT COALESCE(MAX(seq), 0) FROM article_outbox').fetchone()[0]
+
+    def get_outbox_offset(self, consumer):
+        """Позиция потребителя в outbox; новый потребитель начинает с текущего конца"""
+        conn = self.get_connection()
+        row = conn.execute('SELECT last_seq FROM outbox_offsets WHERE consumer = ?', (consumer,)).fetchone()
+        if row:
+            return row[0]
+        head = self.get_outbox_head()
+        self.commit_outbox_offset(consumer, head)
+        return head
+
+    def commit_outbox_offset(self, consumer, seq):
+        """Фиксация обработанной позиции; события, прочитанные всеми потребителями, удаляются"""
+        with self.transaction() as conn:
+            conn.execute('''
+                INSERT INTO outbox_offsets (consumer, last_seq, updated_at) VALUES (?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT(consumer) DO UPDATE SET last_seq = excluded.last_seq, updated_at = excluded.updated_at
+            ''', (consumer, seq))
+            conn.execute('DELETE FROM article_outbox WHERE seq <= (SELECT MIN(last_seq) FROM outbox_offsets)')
+
+    def get_subscriber_offsets(self, subscribers):
+        """
+        Курсоры получателей по articles.id.
+        Новый получатель начинает с последней статьи - старые статьи ему не отправляются.
+        """
+        conn = self.get_connection()
+        offsets = {}
+        for subscriber in subscribers:
+            row = conn.execute('SELECT last_article_id FROM subscriber_offsets WHERE subscriber = ?',
+                               (subscriber,)).fetchone()
+            if row:
+                offsets[subscriber] = row[0]
+
+        new_subscribers = [subscriber for subscriber in subscribers if subscriber not in offsets]
+        if new_subscribers:
+            last_id = conn.execute('SELECT COALESCE(MAX(id), 0) FROM articles').fetchone()[0]
+            started = {subscriber: last_id for subscriber in new_subscribers}
+            self.commit_subscriber_offsets(started)
+            offsets.update(started)
+        return offsets
+
+    def read_articles_after(self, after_id, limit=500):
+        """
+        Keyset пагинация по первичному ключу: статьи с id > after_id в порядке добавления
+
+        Returns:
+            list: (id, feed_id, title, link, description, tags, published_date, added_date)
+        """
+        conn = self.get_connection()
+        return conn.execute('''
+            SELECT id, feed_id, title, link, description, tags, published_date, added_date
+            FROM articles
+            WHERE id > ?
+            ORDER BY id
+            LIMIT ?
+        ''', (after_id, limit)).fetchall()
+
+    def commit_subscriber_offsets(self, offsets):
+        """Фиксация последней обработанной статьи получателей одной транзакцией: {subscriber: article_id}"""
+        with self.transaction() as conn:
+            conn.executemany(SUBSCRIBER_OFFSET_UPSERT_SQL, list(offsets.items()))
+
+    def enqueue_deliveries(self, deliveries, offsets):
+        """
+        Постановка сообщений в очередь доставки и сдвиг курсоров получателей одной транзакцией:
+        статья либо в очереди и курсор сдвинут, либо ни то ни другое.
+        Повторная постановка (получатель, статья) игнорируется.
+
+        Args:
+            deliveries: [(subscriber, article_id, published_date, payload_json)]
+            offsets: {subscriber: article_id}
+
+        Returns:
+            int: сколько сообщений действительно добавлено
+        """
+        with self.transaction() as conn:
+            changes = conn.total_changes
+            conn.executemany('''
+                INSERT OR IGNORE INTO delivery_queue (subscriber, article_id, published_date, payload)
+                VALUES (?, ?, ?, ?)
+            ''', deliveries)
+            added = conn.total_changes - changes
+            conn.executemany(SUBSCRIBER_OFFSET_UPSERT_SQL, list(offsets.items()))
+        return added
+
+    def claim_deliveries(self, subscribers, now, limit=500):
+        """
+        Готовые к отправке сообщения получателей (pending, время попытки наступило) переводятся в in_flight
+
+        Returns:
+            list: (subscriber, article_id, payload_json, attempts) в порядке published_date
+        """
+        if not subscribers:
+            return []
+        placeholders = ', '.join('?' * len(subscribers))
+        with self.transaction(immediate=True) as conn:
+            rows = conn.execute(f'''
+                SELECT subscriber, article_id, payload, attempts
+                FROM delivery_queue
+                WHERE status = 'pending' AND next_attempt <= ? AND subscriber IN ({placeholders})
+                ORDER BY published_date, article_id
+                LIMIT ?
+            ''', (now, *subscribers, limit)).fetchall()
+            conn.executemany('''
+                UPDATE delivery_queue SET status = 'in_flight', updated_at = CURRENT_TIMESTAMP
+                WHERE subscriber = ? AND article_id = ?
+            ''', [(row[0], row[1]) for row in rows])
+        return rows
+
+    def mark_delivery_sent(self, subscriber, article_id):
+        with self.transaction() as conn:
+            conn.execute('''
+                UPDATE delivery_queue SET status = 'sent', attempts = attempts + 1, last_error = NULL,
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE subscriber = ? AND article_id = ?
+            ''', (subscriber, article_id))
+
+    def mark_delivery_failed(self, subscriber, article_id, error, next_attempt=None):
+        """Неудачная попытка: повтор в next_attempt (unix time) или окончательный failed при next_attempt=None"""
+        with self.transaction() as conn:
+            conn.execute('''
+                UPDATE delivery_queue SET status = ?, attempts = attempts + 1,
+                    next_attempt = COALESCE(?, next_attempt), last_error = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE subscriber = ? AND article_id = ?
+            ''', ('failed' if next_attempt is None else 'pending', next_attempt, error, subscriber, article_id))
+
+    def recover_deliveries(self, retention_days):
+        """
+        Запуск сервиса: сообщения, оставшиеся in_flight после падения, возвращаются в очередь
+        (at-least-once - такое сообщение могло уйти перед падением); старые sent/failed удаляются.
+
+        Returns:
+            tuple: (возвращено в очередь, удалено)
+        """
+        with self.transaction() as conn:
+            requeued = conn.execute(
+                "UPDATE delivery_queue SET status = 'pending' WHERE status = 'in_flight'"
+            ).rowcount
+            purged = conn.execute('''
+                DELETE FROM delivery_queue
+                WHERE status IN ('sent', 'failed') AND updated_at < datetime('now', ?)
+            ''', (f'-{int(retention_days)} days',)).rowcount
+        return requeued, purged
+
+    def get_delivery_stats(self):
+        """Число сообщений очереди доставки по статусам"""
+        conn = self.get_connection()
+        return dict(conn.execute('SELECT status, COUNT(*) FROM delivery_queue GROUP BY status').fetchall())
+
     def get_feed_stats(self):
         """Статистика по источникам"""
         conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
+        return conn.execute('''
             SELECT f.title, f.url, f.active,
                    COUNT(a.id) as articles_count,
                    MAX(a.published_date) as last_article_date,
@@ -250,54 +531,113 @@ class DatabaseManager:
             LEFT JOIN articles a ON f.id = a.feed_id
             GROUP BY f.id
             ORDER BY articles_count DESC
-        ''')
-        
-        results = cursor.fetchall()
-        conn.close()
-        return results
-    
+        ''').fetchall()
+
     def get_articles_by_feed(self, feed_id, limit=100):
         """Получение статей источника"""
         conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
+        return conn.execute('''
             SELECT title, link, description, published_date, author
-            FROM articles 
+            FROM articles
             WHERE feed_id = ?
             ORDER BY published_date DESC
             LIMIT ?
-        ''', (feed_id, limit))
-        
-        results = cursor.fetchall()
-        conn.close()
-        return results
-    
+        ''', (feed_id, limit)).fetchall()
+
     def article_exists(self, link):
         """Проверка существования статьи по ссылке"""
         if not link:
             return False
-        
+
         conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT id FROM articles WHERE link = ?', (link,))
-        exists = cursor.fetchone() is not None
-        conn.close()
-        return exists
+        return conn.execute('SELECT 1 FROM articles WHERE link = ?', (link,)).fetchone() is not None
+
+    def iter_article_links(self, days):
+        """Ссылки статей, добавленных за последние days дней (по возрастанию added_date)"""
+        conn = self.get_connection()
+        cursor = conn.execute('''
+            SELECT link FROM articles
+            WHERE added_date >= datetime('now', ?)
+            ORDER BY added_date
+        ''', (f'-{int(days)} days',))
+        for (link,) in cursor:
+            yield link
 
     def is_article_new(self, url):
         """Проверка новизны статьи (для совместимости с MockDBManager)"""
         return not self.article_exists(url)
-    
+
     def cleanup_old_articles(self, days):
         """Удаление старых статей"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            DELETE FROM articles 
-            WHERE added_date < datetime('now', '-{} days')
-        '''.format(days))
-        deleted = cursor.rowcount
+        with self.transaction() as conn:
+            cursor = conn.execute('''
+                DELETE FROM articles
+                WHERE added_date < datetime('now', '-{} days')
+            '''.format(days))
+            deleted = cursor.rowcount
+        return deleted
+
+
+# Микро-бенчмарк: соединение на каждый вызов (старая схема) против пула соединений
+if __name__ == "__main__":
+    import tempfile
+    import time
+
+    ARTICLES = 2000
+
+    def bench_legacy(db_path):
+        """Старая схема: connect/commit/close на каждую операцию, журнал по умолчанию"""
+        conn = sqlite3.connect(db_path)
+        conn.execute('CREATE TABLE articles (id INTEGER PRIMARY KEY AUTOINCREMENT, feed_id INTEGER, title TEXT, link TEXT UNIQUE)')
         conn.commit()
         conn.close()
-        return deleted
\ No newline at end of file
+
+        start = time.perf_counter()
+        for i in range(ARTICLES):
+            conn = sqlite3.connect(db_path)
+            conn.execute('SELECT id FROM articles WHERE link = ?', (f'https://example.com/{i}',)).fetchone()
+            conn.close()
+            conn = sqlite3.connect(db_path)
+            conn.execute('INSERT INTO articles (feed_id, title, link) VALUES (?, ?, ?)',
+                         (1, f'Статья {i}', f'https://example.com/{i}'))
+            conn.commit()
+            conn.close()
+        insert_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for i in range(ARTICLES):
+            conn = sqlite3.connect(db_path)
+            conn.execute('SELECT id FROM articles WHERE link = ?', (f'https://example.com/{i}',)).fetchone()
+            conn.close()
+        lookup_time = time.perf_counter() - start
+        return insert_time, lookup_time
+
+    def bench_pooled(db_path):
+        """Новая схема: долгоживущее соединение, WAL, кэш подготовленных выражений"""
+        db = DatabaseManager(db_path)
+
+        start = time.perf_counter()
+        for i in range(ARTICLES):
+            link = f'https://example.com/{i}'
+            if not db.article_exists(link):
+                with db.transaction() as conn:
+                    conn.execute('INSERT INTO articles (feed_id, title, link) VALUES (?, ?, ?)',
+                                 (1, f'Статья {i}', link))
+        insert_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for i in range(ARTICLES):
+            db.article_exists(f'https://example.com/{i}')
+        lookup_time = time.perf_counter() - start
+        db.close()
+        return insert_time, lookup_time
+
+    print(f"🧪 Бенчмарк SQLite: {ARTICLES} статей")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        results = {
+            'до (connect на вызов)': bench_legacy(os.path.join(tmp_dir, 'legacy.db')),
+            'после (пул + WAL)': bench_pooled(os.path.join(tmp_dir, 'pooled.db'))
+        }
+
+    for name, (insert_time, lookup_time) in results.items():
+        print(f"📊 {name}: вставки {ARTICLES / insert_time:,.0f}/с, поиск {ARTICLES / lookup_time:,.0f}/с")
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+RSS Media Bus - In-memory индекс уже виденных ссылок
+Bloom-фильтр + LRU недавних хешей перед DatabaseManager.article_exists
+"""
+
+import math
+import hashlib
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Optional
+
+
+def _link_hash(link: str) -> bytes:
+    return hashlib.blake2b(link.encode('utf-8', errors='ignore'), digest_size=16).digest()
+
+
+class BloomFilter:
+    """Bloom-фильтр с двойным хешированием поверх 128-битного blake2b"""
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        self.capacity = max(1, int(capacity))
+        self.error_rate = error_rate
+
+        # Оптимальные m (бит) и k (хешей) для заданной емкости и доли ложных срабатываний
+        self.size = max(8, int(-self.capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, digest: bytes):
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        for i in range(self.hash_count):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, digest: bytes):
+        for position in self._positions(digest):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, digest: bytes) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(digest))
+
+    @property
+    def saturated(self) -> bool:
+        """Элементов больше расчетной емкости - доля ложных срабатываний растет"""
+        return self.count > self.capacity
+
+
+class SeenLinkIndex:
+    """
+    Индекс ссылок статей, уже сохраненных в БД.
+    Отвечает без обращения к диску: "точно новая" (промах Bloom) или "видели" (хеш в LRU).
+    Только вероятные совпадения Bloom вне LRU проверяются через SQLite.
+    """
+
+    def __init__(self, capacity: int, lru_size: int = 20000, error_rate: float = 0.001):
+        self.bloom = BloomFilter(capacity, error_rate)
+        self.lru_size = lru_size
+        self.recent: OrderedDict = OrderedDict()
+
+        self.stats: Dict[str, int] = {
+            'misses': 0,           # Bloom: точно новая ссылка
+            'lru_hits': 0,         # найдена в LRU без обращения к БД
+            'db_checks': 0,        # вероятное совпадение, проверено в SQLite
+            'db_hits': 0,          # SQLite подтвердил, что статья есть
+            'false_positives': 0   # Bloom ошибся: в БД статьи нет
+        }
+
+    def add(self, link: Optional[str]):
+        """Запомнить ссылку как сохраненную в БД"""
+        if not link:
+            return
+        digest = _link_hash(link)
+        self.bloom.add(digest)
+        self._remember(digest)
+
+    def add_many(self, links: Iterable[Optional[str]]):
+        for link in links:
+            self.add(link)
+
+    def _remember(self, digest: bytes):
+        self.recent[digest] = True
+        self.recent.move_to_end(digest)
+        if len(self.recent) > self.lru_size:
+            self.recent.popitem(last=False)
+
+    def is_seen(self, link: Optional[str], exists_in_db: Callable[[str], bool]) -> bool:
+        """
+        Есть ли ссылка в БД. exists_in_db вызывается только для вероятных совпадений Bloom.
+        Пустые ссылки всегда считаются новыми - их дедупликацию делает сама БД.
+        """
+        if not link:
+            return False
+
+        digest = _link_hash(link)
+        if digest not in self.bloom:
+            self.stats['misses'] += 1
+            return False
+
+        if digest in self.recent:
+            self.recent.move_to_end(digest)
+            self.stats['lru_hits'] += 1
+            return True
+
+        self.stats['db_checks'] += 1
+        if exists_in_db(link):
+            self.stats['db_hits'] += 1
+            self._remember(digest)
+            return True
+
+        self.stats['false_positives'] += 1
+        return False
+
+    def get_stats(self) -> Dict[str, float]:
+        stats = dict(self.stats)
+        lookups = stats['misses'] + stats['lru_hits'] + stats['db_checks']
+        stats['lookups'] = lookups
+        stats['disk_free_ratio'] = (stats['misses'] + stats['lru_hits']) / lookups if lookups else 0.0
+        stats['bloom_items'] = self.bloom.count
+        stats['bloom_capacity'] = self.bloom.capacity
+        return stats
+
+    def reset_stats(self):
+        for key in self.stats:
+            self.stats[key] = 0
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+RSS Media Bus - Задержки фидов и бюджет времени цикла опроса
+p50/p95 по последним запросам каждого фида: порог hedged запроса и оценка,
+успеет ли повтор до конца цикла
+"""
+
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from config import (
+    FETCH_LATENCY_HISTORY, FETCH_HEDGE_MIN_SAMPLES, FETCH_HEDGE_MIN_DELAY_SECONDS,
+    FETCH_DEFAULT_LATENCY_SECONDS
+)
+
+
+class CycleDeadlineExceeded(Exception):
+    """Бюджет цикла исчерпан - запрос к фиду откладывается до следующего опроса"""
+
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class LatencyTracker:
+    """Скользящая история задержек (до заголовков ответа) по URL фида"""
+
+    def __init__(self, history: int = FETCH_LATENCY_HISTORY):
+        self.history = history
+        self.samples: Dict[str, Deque[float]] = {}
+
+    def record(self, feed_url: str, latency: float):
+        samples = self.samples.get(feed_url)
+        if samples is None:
+            samples = self.samples[feed_url] = deque(maxlen=self.history)
+        samples.append(latency)
+
+    def percentiles(self, feed_url: str) -> Optional[Tuple[float, float]]:
+        """(p50, p95) или None без истории"""
+        samples = self.samples.get(feed_url)
+        if not samples:
+            return None
+        ordered = sorted(samples)
+        return _percentile(ordered, 0.5), _percentile(ordered, 0.95)
+
+    def hedge_delay(self, feed_url: str) -> Optional[float]:
+        """Через сколько отправлять второй запрос: p95 фида, None - мало истории"""
+        samples = self.samples.get(feed_url)
+        if not samples or len(samples) < FETCH_HEDGE_MIN_SAMPLES:
+            return None
+        return max(FETCH_HEDGE_MIN_DELAY_SECONDS, self.percentiles(feed_url)[1])
+
+    def expected_latency(self, feed_url: str) -> float:
+        """Пессимистичная оценка длительности запроса для планирования повтора"""
+        percentiles = self.percentiles(feed_url)
+        return percentiles[1] if percentiles else FETCH_DEFAULT_LATENCY_SECONDS
+
+    def slowest(self, limit: int = 3) -> List[Tuple[str, float, float]]:
+        """Фиды с наибольшим p95: [(url, p50, p95)]"""
+        report = [(feed_url, *self.percentiles(feed_url)) for feed_url in self.samples if self.samples[feed_url]]
+        return sorted(report, key=lambda row: row[2], reverse=True)[:limit]
+
+
+def remaining(deadline: Optional[float]) -> float:
+    """Остаток бюджета цикла в секундах (deadline - time.monotonic())"""
+    return float('inf') if deadline is None else deadline - time.monotonic()
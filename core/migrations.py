@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+RSS Media Bus - Версионированные миграции схемы SQLite
+Текущая версия схемы хранится в PRAGMA user_version, каждая миграция применяется один раз
+"""
+
+import sqlite3
+from typing import Callable, List, Tuple, Union
+
+
+def _add_article_fields(conn: sqlite3.Connection):
+    """Расширенные поля articles (бывший _migrate_articles_table)"""
+    new_fields = [
+        ('guid', 'TEXT'),
+        ('category', 'TEXT'),
+        ('tags', 'TEXT'),
+        ('full_text', 'TEXT'),
+        ('media_attachments', 'TEXT'),
+        ('modification_date', 'TIMESTAMP'),
+        ('news_id', 'TEXT'),
+        ('content_type', 'TEXT'),
+        ('newsline', 'TEXT')
+    ]
+
+    existing_columns = [row[1] for row in conn.execute("PRAGMA table_info(articles)")]
+    for field_name, field_type in new_fields:
+        if field_name not in existing_columns:
+            conn.execute(f"ALTER TABLE articles ADD COLUMN {field_name} {field_type}")
+            print(f"✅ Добавлен столбец: {field_name}")
+
+
+# (версия, описание, SQL-выражения или функция(conn))
+MIGRATIONS: List[Tuple[int, str, Union[List[str], Callable]]] = [
+    (1, "Расширенные поля articles", _add_article_fields),
+    (2, "Индексы для выборок по дате, источнику и guid", [
+        # Новые статьи для уведомлений и очистка по сроку хранения
+        "CREATE INDEX IF NOT EXISTS idx_articles_added_date ON articles (added_date)",
+        # Статьи источника по дате + COUNT/MAX в статистике (покрывающий, id = rowid)
+        "CREATE INDEX IF NOT EXISTS idx_articles_feed_published ON articles (feed_id, published_date)",
+        "CREATE INDEX IF NOT EXISTS idx_articles_guid ON articles (guid)",
+    ]),
+    (3, "Валидаторы условного GET для фидов (ETag / Last-Modified)", [
+        "ALTER TABLE feeds ADD COLUMN etag TEXT",
+        "ALTER TABLE feeds ADD COLUMN last_modified TEXT",
+    ]),
+    (4, "Отпечаток содержимого фида для пропуска неизмененных ответов", [
+        "ALTER TABLE feeds ADD COLUMN content_hash TEXT",
+    ]),
+    (5, "Состояние адаптивного расписания опроса источников", [
+        """CREATE TABLE IF NOT EXISTS feed_schedule (
+            source_id TEXT PRIMARY KEY,
+            interval_seconds REAL NOT NULL,
+            next_poll REAL NOT NULL,
+            last_poll REAL,
+            rate_per_hour REAL DEFAULT 0
+        )""",
+        # Темп публикации по источникам: диапазон по added_date без обращения к строкам таблицы
+        "CREATE INDEX IF NOT EXISTS idx_articles_added_feed ON articles (added_date, feed_id)",
+        "DROP INDEX IF EXISTS idx_articles_added_date",
+    ]),
+    (6, "Outbox новых статей для User Notification Service", [
+        # seq монотонно растет (AUTOINCREMENT не переиспользует номера после очистки)
+        """CREATE TABLE IF NOT EXISTS article_outbox (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            article_id INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )""",
+        # Позиция чтения outbox по потребителям - переживает перезапуск процесса
+        """CREATE TABLE IF NOT EXISTS outbox_offsets (
+            consumer TEXT PRIMARY KEY,
+            last_seq INTEGER NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )""",
+    ]),
+    (7, "Курсор каждого получателя по articles.id", [
+        # Ключ - user_id::config_id; последний обработанный id статьи (keyset пагинация)
+        """CREATE TABLE IF NOT EXISTS subscriber_offsets (
+            subscriber TEXT PRIMARY KEY,
+            last_article_id INTEGER NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )""",
+    ]),
+    (8, "Очередь доставки статей получателям", [
+        # Ключ получатель + статья: повторная постановка той же статьи игнорируется.
+        # payload - готовое сообщение (после фильтра и перевода), status: pending/in_flight/sent/failed
+        """CREATE TABLE IF NOT EXISTS delivery_queue (
+            subscriber TEXT NOT NULL,
+            article_id INTEGER NOT NULL,
+            published_date TIMESTAMP,
+            payload TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt REAL NOT NULL DEFAULT 0,
+            last_error TEXT,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (subscriber, article_id)
+        )""",
+        # Выборка готовых к отправке: диапазон по (status, next_attempt) без обхода отправленных
+        "CREATE INDEX IF NOT EXISTS idx_delivery_due ON delivery_queue (status, next_attempt)",
+    ]),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def apply_migrations(conn: sqlite3.Connection) -> int:
+    """
+    Применяет все миграции новее текущей версии схемы.
+    Должна вызываться внутри явной транзакции с блокировкой записи (DatabaseManager.transaction(immediate=True)):
+    DDL выполняется в этой транзакции и при ошибке откатывается вместе с user_version,
+    а версия читается уже после захвата блокировки - другой процесс не применит те же миграции повторно.
+
+    Returns:
+        int: версия схемы после миграций
+    """
+    current_version = get_schema_version(conn)
+
+    for version, description, migration in MIGRATIONS:
+        if version <= current_version:
+            continue
+
+        if callable(migration):
+            migration(conn)
+        else:
+            for statement in migration:
+                conn.execute(statement)
+
+        # PRAGMA не поддерживает параметры - версия всегда int из MIGRATIONS
+        conn.execute(f"PRAGMA user_version = {int(version)}")
+        current_version = version
+        print(f"🗄️ Миграция схемы v{version}: {description}")
+
+    return current_version
+
+
+# Горячие запросы, которые не должны сканировать articles целиком
+HOT_QUERIES = {
+    'subscriber_articles': ('''
+        SELECT id, feed_id, title, link, description, tags, published_date, added_date
+        FROM articles
+        WHERE id > ?
+        ORDER BY id
+        LIMIT ?
+    ''', (0, 500)),
+    'articles_by_feed': ('''
+        SELECT title, link, description, published_date, author
+        FROM articles
+        WHERE feed_id = ?
+        ORDER BY published_date DESC
+        LIMIT ?
+    ''', ('tass.ru', 100)),
+    'feed_stats': ('''
+        SELECT f.title, f.url, f.active,
+               COUNT(a.id) as articles_count,
+               MAX(a.published_date) as last_article_date,
+               f.last_updated
+        FROM feeds f
+        LEFT JOIN articles a ON f.id = a.feed_id
+        GROUP BY f.id
+        ORDER BY articles_count DESC
+    ''', ()),
+    'cleanup_old_articles': ('''
+        DELETE FROM articles
+        WHERE added_date < datetime('now', '-90 days')
+    ''', ()),
+    # +feed_id: группировка во временном B-дереве, иначе планировщик обходит весь индекс по feed_id
+    'feed_publish_rates': ('''
+        SELECT feed_id, COUNT(*) FROM articles
+        WHERE added_date >= datetime('now', ?)
+        GROUP BY +feed_id
+    ''', ('-48 hours',)),
+    'due_deliveries': ('''
+        SELECT subscriber, article_id, payload, attempts
+        FROM delivery_queue
+        WHERE status = 'pending' AND next_attempt <= ? AND subscriber IN (?)
+        ORDER BY published_date, article_id
+        LIMIT ?
+    ''', (0, 'user::config', 500)),
+    'article_by_guid': ('SELECT id FROM articles WHERE guid = ?', ('guid',)),
+    'article_exists': ('SELECT 1 FROM articles WHERE link = ?', ('https://example.com',)),
+}
+
+
+def find_full_scans(conn: sqlite3.Connection) -> List[Tuple[str, str]]:
+    """
+    Проверяет планы HOT_QUERIES через EXPLAIN QUERY PLAN.
+    Любой SCAN таблицы articles (в том числе полный обход индекса) и автоматический
+    индекс, который SQLite строит полным проходом по таблице, считаются регрессией.
+
+    Returns:
+        list: (имя запроса, строка плана) для каждого найденного полного сканирования
+    """
+    full_scans = []
+    for name, (query, params) in HOT_QUERIES.items():
+        for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", params):
+            detail = row[-1]
+            table = detail.split()[1] if len(detail.split()) > 1 else ''
+            if table not in ('articles', 'a', 'delivery_queue'):
+                continue
+            if detail.startswith('SCAN ') or 'AUTOMATIC' in detail:
+                full_scans.append((name, detail))
+    return full_scans
+
+
+# Регрессионная проверка планов горячих запросов
+if __name__ == "__main__":
+    import os
+    import sys
+    import tempfile
+    from core.database import DatabaseManager
+
+    print("🧪 Проверка планов горячих запросов")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = DatabaseManager(os.path.join(tmp_dir, 'plans.db'))
+        conn = db.get_connection()
+
+        # Немного данных по нескольким источникам и ANALYZE, чтобы планировщик видел реальную статистику
+        for feed_number in range(20):
+            feed_id = db.add_feed(f'https://example.com/feed/{feed_number}.xml')
+            db.add_articles_bulk(feed_id, [
+                {'title': f'Статья {i}', 'link': f'https://example.com/{feed_number}/{i}',
+                 'guid': f'{feed_number}-{i}', 'published_date': f'2025-01-01 00:{i % 60:02d}:00'}
+                for i in range(50)
+            ])
+        # Статьи распределены по всему сроку хранения, как в рабочей базе
+        with db.transaction() as conn:
+            conn.execute("UPDATE articles SET added_date = datetime('now', '-' || (id % 90) || ' days')")
+        conn.execute("ANALYZE")
+
+        print(f"📊 Версия схемы: {get_schema_version(conn)}")
+        for name, (query, params) in HOT_QUERIES.items():
+            plan = [row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", params)]
+            print(f"   {name}: {' | '.join(plan)}")
+
+        full_scans = find_full_scans(conn)
+        db.close()
+
+    if full_scans:
+        for name, detail in full_scans:
+            print(f"❌ {name}: {detail}")
+        sys.exit(1)
+
+    print("✅ Полных сканирований articles нет")
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+RSS Media Bus - Адаптивное расписание опроса источников
+Интервал каждого фида подбирается по темпу публикации из articles.added_date,
+очередь опроса - куча по времени следующего опроса, состояние хранится в feed_schedule
+"""
+
+import heapq
+import random
+import time
+from typing import Dict, List, Optional
+
+from config import (
+    POLL_MIN_INTERVAL_SECONDS, POLL_MAX_INTERVAL_SECONDS, POLL_TARGET_ARTICLES_PER_POLL,
+    POLL_RATE_WINDOW_HOURS, POLL_JITTER
+)
+
+
+class PollScheduler:
+    """Приоритетная очередь опроса: быстрые фиды чаще, медленные - реже"""
+
+    def __init__(self, db_manager, default_interval: float = 120):
+        self.db = db_manager
+        self.default_interval = default_interval
+
+        # source_id -> {'interval', 'next_poll', 'last_poll', 'rate_per_hour'}
+        self.states: Dict[str, Dict[str, Optional[float]]] = {}
+        # (next_poll, source_id); устаревшие записи отбрасываются при извлечении
+        self.queue: List = []
+
+        self._load()
+
+    def _load(self):
+        """Восстановление расписания после перезапуска"""
+        for source_id, interval, next_poll, last_poll, rate_per_hour in self.db.get_feed_schedule():
+            self.states[source_id] = {
+                'interval': interval,
+                'next_poll': next_poll,
+                'last_poll': last_poll,
+                'rate_per_hour': rate_per_hour or 0.0
+            }
+            heapq.heappush(self.queue, (next_poll, source_id))
+        if self.states:
+            print(f"⏱️ Расписание опроса восстановлено: {len(self.states)} источников")
+
+    def sync_sources(self, source_ids):
+        """Синхронизация с активными источниками (старт и hot reload sources.yaml)"""
+        source_ids = set(source_ids)
+        now = time.time()
+
+        removed = [source_id for source_id in self.states if source_id not in source_ids]
+        for source_id in removed:
+            del self.states[source_id]
+        if removed:
+            self.db.delete_feed_schedule(removed)
+
+        added = [source_id for source_id in source_ids if source_id not in self.states]
+        for source_id in added:
+            # Новые источники опрашиваются сразу, с небольшим разбросом
+            next_poll = now + random.uniform(0, POLL_JITTER * self.default_interval)
+            self.states[source_id] = {
+                'interval': self.default_interval,
+                'next_poll': next_poll,
+                'last_poll': None,
+                'rate_per_hour': 0.0
+            }
+            heapq.heappush(self.queue, (next_poll, source_id))
+
+        if added or removed:
+            self.learn_rates()
+            self.save()
+            print(f"⏱️ Расписание опроса: +{len(added)} / -{len(removed)} источников, всего {len(self.states)}")
+
+    def learn_rates(self):
+        """Пересчет интервалов по темпу публикации за POLL_RATE_WINDOW_HOURS"""
+        rates = self.db.get_feed_publish_rates(POLL_RATE_WINDOW_HOURS)
+        for source_id, state in self.states.items():
+            state['rate_per_hour'] = rates.get(source_id, 0.0)
+            state['interval'] = self._interval_for(state['rate_per_hour'])
+
+    def _interval_for(self, rate_per_hour: float) -> float:
+        """Интервал, за который в среднем появляется POLL_TARGET_ARTICLES_PER_POLL статей"""
+        if rate_per_hour <= 0:
+            return POLL_MAX_INTERVAL_SECONDS
+        interval = POLL_TARGET_ARTICLES_PER_POLL / rate_per_hour * 3600
+        return min(POLL_MAX_INTERVAL_SECONDS, max(POLL_MIN_INTERVAL_SECONDS, interval))
+
+    def pop_due(self, now: Optional[float] = None) -> List[str]:
+        """Источники, время опроса которых наступило"""
+        now = now or time.time()
+        due = []
+        while self.queue and self.queue[0][0] <= now:
+            next_poll, source_id = heapq.heappop(self.queue)
+            state = self.states.get(source_id)
+            # Источник удален или перепланирован - запись в куче устарела
+            if state is None or state['next_poll'] != next_poll:
+                continue
+            due.append(source_id)
+        return due
+
+    def mark_polled(self, source_ids, now: Optional[float] = None):
+        """Планирование следующего опроса после обработки источников"""
+        now = now or time.time()
+        self.learn_rates()
+        for source_id in source_ids:
+            state = self.states.get(source_id)
+            if state is None:
+                continue
+            jitter = random.uniform(1 - POLL_JITTER, 1 + POLL_JITTER)
+            state['last_poll'] = now
+            state['next_poll'] = now + state['interval'] * jitter
+            heapq.heappush(self.queue, (state['next_poll'], source_id))
+        self.save()
+
+    def defer(self, source_ids, now: Optional[float] = None):
+        """Фиды, не уложившиеся в бюджет цикла: повторный опрос через минимальный интервал"""
+        now = now or time.time()
+        for source_id in source_ids:
+            state = self.states.get(source_id)
+            if state is None:
+                continue
+            state['next_poll'] = now + POLL_MIN_INTERVAL_SECONDS * random.uniform(1, 1 + POLL_JITTER)
+            heapq.heappush(self.queue, (state['next_poll'], source_id))
+        self.save()
+
+    def seconds_until_next(self, now: Optional[float] = None) -> float:
+        now = now or time.time()
+        while self.queue:
+            next_poll, source_id = self.queue[0]
+            state = self.states.get(source_id)
+            if state is None or state['next_poll'] != next_poll:
+                heapq.heappop(self.queue)
+                continue
+            return max(0.0, next_poll - now)
+        return self.default_interval
+
+    def save(self):
+        self.db.save_feed_schedule([
+            (source_id, state['interval'], state['next_poll'], state['last_poll'], state['rate_per_hour'])
+            for source_id, state in self.states.items()
+        ])
+
+
+def print_schedule(db_manager):
+    """Таблица расписания опроса из БД"""
+    rows = sorted(db_manager.get_feed_schedule(), key=lambda row: row[2])
+    if not rows:
+        print("⚠️ Расписание опроса пустое (RSS Bus Core еще не запускался)")
+        return
+
+    now = time.time()
+    print(f"{'Источник':<32} {'Статей/ч':>9} {'Интервал':>9} {'Следующий':>10} {'Прошлый':>9}")
+    print("-" * 73)
+    for source_id, interval, next_poll, last_poll, rate_per_hour in rows:
+        next_in = max(0, next_poll - now)
+        last_ago = f"{(now - last_poll) / 60:.0f} мин" if last_poll else "—"
+        print(f"{source_id[:32]:<32} {rate_per_hour or 0:>9.2f} {interval / 60:>7.1f}м "
+              f"{next_in / 60:>8.1f}м {last_ago:>9}")
+    print(f"\n📊 Источников: {len(rows)}, опросов в час: {sum(3600 / row[1] for row in rows):.0f}")
+
+
+# Просмотр расписания: python3 -m core.poll_scheduler
+if __name__ == "__main__":
+    from core.database import DatabaseManager
+
+    print("⏱️ Адаптивное расписание опроса RSS источников")
+    print_schedule(DatabaseManager())
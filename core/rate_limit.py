@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+RSS Media Bus - Ограничители частоты и параллелизма запросов
+Token bucket на хост, общий лимит одновременных запросов по AIMD
+и отдельная полоса для медленных хостов
+"""
+
+import time
+import asyncio
+import contextlib
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+import aiohttp
+
+from config import (
+    HOST_REQUESTS_PER_SECOND, HOST_BURST, FETCH_CONCURRENCY_START, FETCH_CONCURRENCY_MIN,
+    FETCH_CONCURRENCY_MAX, FETCH_LATENCY_TARGET_SECONDS, FETCH_SLOW_HOST_SECONDS, FETCH_SLOW_LANE_SLOTS
+)
+
+# Вес нового замера в скользящей средней задержки хоста
+LATENCY_EWMA_ALPHA = 0.3
+
+# Ошибки, означающие перегрузку сети или хоста (HTTP ошибки сайта сюда не входят)
+CONGESTION_ERRORS = (asyncio.TimeoutError, aiohttp.ClientConnectionError)
+
+
+class TokenBucket:
+    """
+    Token bucket с резервированием: reserve() сразу списывает токен (баланс может уйти в минус)
+    и возвращает паузу до его появления - ожидающие обслуживаются по очереди без блокировок.
+    """
+
+    def __init__(self, rate: float, burst: float = 1, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.tokens = float(burst)
+        self.updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, tokens: float = 1) -> float:
+        """Списать токены; сколько секунд подождать до их появления"""
+        self._refill()
+        self.tokens -= tokens
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def delay(self, tokens: float = 1) -> float:
+        """Через сколько секунд будут доступны токены - без списания"""
+        self._refill()
+        return max(0.0, (tokens - self.tokens) / self.rate)
+
+    def block(self, seconds: float):
+        """Не выдавать токены ближайшие seconds секунд (например, по retry_after сервера)"""
+        self._refill()
+        self.tokens = min(self.tokens, -seconds * self.rate)
+
+    async def acquire(self, tokens: float = 1):
+        wait = self.reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class AIMDLimiter:
+    """
+    Общий лимит одновременных запросов: +1 за окно быстрых ответов (аддитивный рост),
+    вдвое меньше при медленном ответе или перегрузке (не чаще раза за target_latency)
+    """
+
+    def __init__(self, initial: int, minimum: int, maximum: int, target_latency: float):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_latency = target_latency
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.last_decrease = 0.0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    async def release(self, latency: float, congested: bool = False):
+        async with self._condition:
+            self.in_flight -= 1
+            if congested or latency > self.target_latency:
+                now = time.monotonic()
+                # Один эпизод перегрузки - одно уменьшение, а не по разу на каждый ответ
+                if now - self.last_decrease >= self.target_latency:
+                    self.limit = max(self.minimum, self.limit / 2)
+                    self.last_decrease = now
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+
+class HostLimiter:
+    """
+    Допуск запросов к фидам: семафор и token bucket хоста (источники одного хоста
+    разносятся во времени), затем общий AIMD лимит или полоса медленных хостов.
+    Ожидание своего хоста не занимает общий слот - быстрые хосты не стоят в очереди за медленными.
+    """
+
+    def __init__(self, max_connections_per_host: int = 2, host_limits: Optional[Dict[str, int]] = None,
+                 requests_per_second: float = HOST_REQUESTS_PER_SECOND, burst: float = HOST_BURST,
+                 latency_target: float = FETCH_LATENCY_TARGET_SECONDS,
+                 slow_host_seconds: float = FETCH_SLOW_HOST_SECONDS):
+        self.max_connections_per_host = max_connections_per_host
+        self.host_limits = host_limits or {}
+        self.requests_per_second = requests_per_second
+        self.burst = burst
+        self.slow_host_seconds = slow_host_seconds
+
+        self.global_limit = AIMDLimiter(
+            FETCH_CONCURRENCY_START, FETCH_CONCURRENCY_MIN, FETCH_CONCURRENCY_MAX, latency_target
+        )
+        self.slow_lane = asyncio.Semaphore(FETCH_SLOW_LANE_SLOTS)
+
+        self.host_semaphores: Dict[str, asyncio.Semaphore] = {}
+        self.host_buckets: Dict[str, TokenBucket] = {}
+        # Скользящая средняя задержки по хостам (секунды)
+        self.host_latency: Dict[str, float] = {}
+
+    @staticmethod
+    def host_key(url: str) -> str:
+        host = (urlparse(url).hostname or '').lower()
+        return host[4:] if host.startswith('www.') else host
+
+    def is_slow(self, host: str) -> bool:
+        return self.host_latency.get(host, 0.0) > self.slow_host_seconds
+
+    def _host_semaphore(self, host: str):
+        semaphore = self.host_semaphores.get(host)
+        if semaphore is None:
+            limit = self.host_limits.get(host, self.host_limits.get(f'www.{host}', self.max_connections_per_host))
+            if limit <= 0:
+                return contextlib.nullcontext()
+            semaphore = self.host_semaphores[host] = asyncio.Semaphore(limit)
+        return semaphore
+
+    def _host_bucket(self, host: str) -> TokenBucket:
+        bucket = self.host_buckets.get(host)
+        if bucket is None:
+            bucket = self.host_buckets[host] = TokenBucket(self.requests_per_second, self.burst)
+        return bucket
+
+    @contextlib.asynccontextmanager
+    async def slot(self, url: str):
+        """Слот на один запрос: держится до конца чтения ответа"""
+        host = self.host_key(url)
+        async with self._host_semaphore(host):
+            await self._host_bucket(host).acquire()
+
+            slow = self.is_slow(host)
+            if slow:
+                await self.slow_lane.acquire()
+            else:
+                await self.global_limit.acquire()
+
+            started = time.monotonic()
+            congested = False
+            try:
+                yield
+            except CONGESTION_ERRORS:
+                congested = True
+                raise
+            finally:
+                latency = time.monotonic() - started
+                previous = self.host_latency.get(host)
+                self.host_latency[host] = latency if previous is None else (
+                    LATENCY_EWMA_ALPHA * latency + (1 - LATENCY_EWMA_ALPHA) * previous
+                )
+                if slow:
+                    self.slow_lane.release()
+                else:
+                    # Медленный хост влияет на общий лимит только до изоляции
+                    await self.global_limit.release(latency, congested)
+
+    def get_stats(self) -> Dict:
+        stats = {
+            'limit': int(self.global_limit.limit),
+            'peak_in_flight': self.global_limit.peak_in_flight,
+            'slow_hosts': sorted(host for host in self.host_latency if self.is_slow(host))
+        }
+        self.global_limit.peak_in_flight = self.global_limit.in_flight
+        return stats
+
+
+# Моделирование цикла: python3 -m core.rate_limit
+if __name__ == "__main__":
+    import random
+
+    FAST_HOSTS, FEEDS_PER_FAST_HOST, SLOW_HOSTS = 40, 2, 6
+    FAST_LATENCY, SLOW_LATENCY = 0.05, 1.5
+
+    def build_feeds():
+        feeds = [(f'https://slow{n}.example/feed', SLOW_LATENCY) for n in range(SLOW_HOSTS)]
+        for n in range(FAST_HOSTS):
+            feeds += [(f'https://fast{n}.example/feed/{i}', FAST_LATENCY) for i in range(FEEDS_PER_FAST_HOST)]
+        random.Random(1).shuffle(feeds)
+        # Медленные хосты в начале очереди - худший случай для общего семафора
+        feeds.sort(key=lambda feed: feed[1] != SLOW_LATENCY)
+        return feeds
+
+    async def flat_semaphore_cycle(feeds):
+        semaphore = asyncio.Semaphore(5)
+
+        async def fetch(latency):
+            async with semaphore:
+                await asyncio.sleep(latency)
+        await asyncio.gather(*(fetch(latency) for _, latency in feeds))
+
+    async def host_limiter_cycle(limiter, feeds):
+        async def fetch(url, latency):
+            async with limiter.slot(url):
+                await asyncio.sleep(latency)
+        await asyncio.gather(*(fetch(url, latency) for url, latency in feeds))
+
+    async def run_simulation():
+        print("🧪 Моделирование цикла опроса: общий Semaphore(5) vs лимиты по хостам + AIMD")
+        feeds = build_feeds()
+        print(f"📋 {len(feeds)} фидов: {SLOW_HOSTS} медленных хостов по {SLOW_LATENCY}с, "
+              f"{FAST_HOSTS} быстрых по {FEEDS_PER_FAST_HOST} фида ({FAST_LATENCY}с)")
+
+        started = time.monotonic()
+        await flat_semaphore_cycle(feeds)
+        print(f"   Semaphore(5):          {time.monotonic() - started:5.2f}с")
+
+        # Пороги уменьшены пропорционально модельным задержкам
+        limiter = HostLimiter(max_connections_per_host=2, requests_per_second=20, burst=2,
+                              latency_target=0.2, slow_host_seconds=1.0)
+        for cycle in range(1, 4):
+            started = time.monotonic()
+            await host_limiter_cycle(limiter, feeds)
+            stats = limiter.get_stats()
+            print(f"   HostLimiter, цикл {cycle}:   {time.monotonic() - started:5.2f}с "
+                  f"(лимит {stats['limit']}, пик {stats['peak_in_flight']}, медленных хостов {len(stats['slow_hosts'])})")
+
+    asyncio.run(run_simulation())
@@ -3,110 +3,307 @@ import aiohttp
 import asyncio
 import sqlite3
 import time
+import hashlib
+import contextlib
 from datetime import datetime, timezone, timedelta
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from urllib.parse import urlparse
 import traceback
+import xml.etree.ElementTree as ET
 from .error_manager import ErrorManager
+from .dedup_index import SeenLinkIndex
+from .stream_parser import StreamingFeedParser
+from .proxy_pool import ProxyPool
+from .rate_limit import HostLimiter
+from .latency_budget import LatencyTracker, CycleDeadlineExceeded, remaining
+from config import (
+    ARTICLE_RETENTION_DAYS, DEDUP_EXPECTED_ARTICLES_PER_DAY,
+    DEDUP_BLOOM_ERROR_RATE, DEDUP_LRU_SIZE, PARSE_EXECUTOR, PARSE_WORKERS,
+    STREAM_PARSE_MIN_BYTES, STREAM_CHUNK_SIZE, HTTP_TIMEOUT, HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_CONNECTIONS_PER_HOST, HTTP_KEEPALIVE_TIMEOUT, HTTP_DNS_CACHE_TTL,
+    FETCH_CYCLE_BUDGET_SECONDS, FETCH_MIN_ATTEMPT_SECONDS
+)
+
+# Сколько записей фида разбирается за цикл
+MAX_ENTRIES_PER_FEED = 50
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'application/rss+xml, application/xml, text/xml, */*',
+    'Accept-Encoding': 'gzip, deflate',
+    'Accept-Language': 'en-US,en;q=0.9',
+    'Connection': 'keep-alive'
+}
+
+
+def parse_feed_content(content, max_entries=MAX_ENTRIES_PER_FEED):
+    """
+    Разбор RSS в пуле парсинга (поток или отдельный процесс).
+    Возвращает только picklable данные: dict/list/str/datetime вместо FeedParserDict.
+    """
+    try:
+        feed_data = feedparser.parse(content)
+    except Exception as e:
+        print(f"⚠️ Ошибка парсинга feedparser: {e}")
+        return None
+
+    articles = []
+    for entry in feed_data.entries[:max_entries]:
+        try:
+            article_data = AsyncRSSParser._extract_article_data(entry)
+            if article_data:
+                articles.append(article_data)
+        except Exception as e:
+            print(f"⚠️ Ошибка обработки статьи: {e}")
+
+    return {
+        'title': feed_data.feed.get('title'),
+        'entries_count': len(feed_data.entries),
+        'articles': articles
+    }
+
+
+def load_http_settings(overrides):
+    """Настройки HTTP пула: config.py + секция http из sources.yaml"""
+    settings = {
+        'max_connections': HTTP_MAX_CONNECTIONS,
+        'max_connections_per_host': HTTP_MAX_CONNECTIONS_PER_HOST,
+        'keepalive_timeout': HTTP_KEEPALIVE_TIMEOUT,
+        'dns_cache_ttl': HTTP_DNS_CACHE_TTL,
+        'host_limits': {}
+    }
+    settings.update({key: value for key, value in overrides.items() if value is not None})
+    settings['host_limits'] = {
+        host.lower(): int(limit) for host, limit in (settings['host_limits'] or {}).items()
+    }
+    return settings
+
+
+def create_http_session(settings, timeout=HTTP_TIMEOUT):
+    """
+    HTTP сессия с keep-alive пулом и кэшем DNS.
+    Лимит на хост соблюдает HostLimiter парсера, поэтому у коннектора он не задан.
+    Создается внутри работающего event loop.
+    """
+    connector = aiohttp.TCPConnector(
+        limit=settings['max_connections'],
+        limit_per_host=0,
+        keepalive_timeout=settings['keepalive_timeout'],
+        use_dns_cache=True,
+        ttl_dns_cache=settings['dns_cache_ttl'],
+        enable_cleanup_closed=True
+    )
+    return aiohttp.ClientSession(
+        timeout=aiohttp.ClientTimeout(total=timeout),
+        connector=connector,
+        headers=DEFAULT_HEADERS
+    )
+
 
 class AsyncRSSParser:
-    def __init__(self, db_manager, config=None):
+    def __init__(self, db_manager, config=None, http_settings=None):
         self.db = db_manager
         self.config = config
         
+        # Долгоживущий HTTP пул на все циклы: keep-alive + кэш DNS (создается в event loop)
+        self.http_settings = load_http_settings(http_settings or {})
+        self.session = None
+        # Допуск запросов: вежливость к хосту, общий AIMD лимит, изоляция медленных хостов
+        self.limiter = HostLimiter(
+            self.http_settings['max_connections_per_host'], self.http_settings['host_limits']
+        )
+        # p50/p95 по фидам: порог hedged запроса и оценка повтора в бюджете цикла
+        self.latency = LatencyTracker()
+        # Долгоживущие сессии для proxy_required источников: по одной на прокси из config/proxy.yaml
+        self.proxy_pool = ProxyPool(lambda timeout: create_http_session(self.http_settings, timeout))
+        
         # Новая система управления ошибками
         self.error_manager = ErrorManager(db_manager)
         
+        # Индекс уже сохраненных ссылок: повторные записи фидов отсекаются без SQLite
+        self.seen_links = None
+        self._warm_seen_links()
+        
+        # Условный GET: ETag / Last-Modified по URL фида (персистентно в таблице feeds)
+        self.feed_validators = self.db.get_feed_validators() if hasattr(self.db, 'get_feed_validators') else {}
+        # Отпечаток последнего обработанного тела фида: одинаковый ответ не парсится повторно
+        self.feed_hashes = self.db.get_feed_content_hashes() if hasattr(self.db, 'get_feed_content_hashes') else {}
+        # Размер последнего полного ответа - для оценки сэкономленного трафика на 304
+        self.feed_body_sizes = {}
+        # Фиды с невалидным для потокового разбора XML - всегда читаются целиком
+        self.stream_disabled = set()
+        self.cycle_stats = self._new_cycle_stats()
+        self.last_cycle_stats = {}
+        
+        # Общий пул парсинга на все фиды: потоки или процессы (обход GIL для feedparser)
+        self.parse_executor = self._create_parse_executor()
+        
         print(f"🧐 AsyncRSSParser: только парсинг и сохранение в БД")
 
+    def _create_parse_executor(self):
+        """Долгоживущий пул для feedparser, тип и размер - из PARSE_EXECUTOR / PARSE_WORKERS"""
+        if PARSE_EXECUTOR == 'process':
+            print(f"⚙️ Пул парсинга: {PARSE_WORKERS} процессов")
+            return ProcessPoolExecutor(max_workers=PARSE_WORKERS)
+        print(f"⚙️ Пул парсинга: {PARSE_WORKERS} потоков")
+        return ThreadPoolExecutor(max_workers=PARSE_WORKERS, thread_name_prefix='rss-parse')
+
+    def close(self):
+        """Остановка пула парсинга (при завершении RSS Bus Core)"""
+        if self.parse_executor:
+            self.parse_executor.shutdown(wait=True, cancel_futures=True)
+            self.parse_executor = None
+
+    def _get_session(self):
+        if self.session is None or self.session.closed:
+            self.session = create_http_session(self.http_settings)
+            settings = self.http_settings
+            print(f"🔌 HTTP пул: до {settings['max_connections']} соединений, "
+                  f"{settings['max_connections_per_host']} на хост, keep-alive {settings['keepalive_timeout']}с, "
+                  f"DNS кэш {settings['dns_cache_ttl']}с")
+        return self.session
+
+    async def close_session(self):
+        """Закрытие HTTP пула и сессий прокси (при завершении RSS Bus Core)"""
+        if self.session and not self.session.closed:
+            await self.session.close()
+        self.session = None
+        await self.proxy_pool.close()
+
+    def _reset_cycle_stats(self):
+        """Цикл без запросов: статистика (и отложенные фиды) прошлого цикла не переносится в него"""
+        self.last_cycle_stats = {}
+        self.cycle_stats = self._new_cycle_stats()
+
+    def _new_cycle_stats(self):
+        return {
+            'requests': 0,
+            'not_modified': 0,
+            'unchanged': 0,
+            'streamed': 0,
+            'bytes_downloaded': 0,
+            'bytes_saved': 0,
+            'hedged': 0,
+            'hedge_wins': 0,
+            'deferred': []
+        }
+
+    def _warm_seen_links(self):
+        """Построение индекса дедупликации по статьям за период хранения"""
+        links = []
+        if hasattr(self.db, 'iter_article_links'):
+            links = list(self.db.iter_article_links(ARTICLE_RETENTION_DAYS))
+        capacity = max(DEDUP_EXPECTED_ARTICLES_PER_DAY * ARTICLE_RETENTION_DAYS, len(links) * 2)
+        self.seen_links = SeenLinkIndex(capacity, DEDUP_LRU_SIZE, DEDUP_BLOOM_ERROR_RATE)
+        self.seen_links.add_many(links)
+        print(f"🧠 Индекс дедупликации: {len(links)} ссылок (емкость {capacity})")
+
     async def parse_all_feeds_async(self, feeds):
         if not feeds:
             print("⚠️ Нет активных источников")
+            self._reset_cycle_stats()
             return 0
         print(f"📡 Начинаю асинхронную обработку {len(feeds)} источников")
-        timeout = aiohttp.ClientTimeout(total=30)
-        connector = aiohttp.TCPConnector(
-            limit=10, 
-            limit_per_host=3,
-            force_close=True,
-            enable_cleanup_closed=True
-        )
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'Accept': 'application/rss+xml, application/xml, text/xml, */*',
-            'Accept-Encoding': 'gzip, deflate',
-            'Accept-Language': 'en-US,en;q=0.9',
-            'Connection': 'keep-alive'
-        }
-        async with aiohttp.ClientSession(
-            timeout=timeout, 
-            connector=connector,
-            headers=headers
-        ) as session:
-            tasks = []
-            for i, feed_info in enumerate(feeds):
-                # Поддержка разных форматов: старый (id, url), новый (id, url, name), с прокси (id, url, name, proxy_required, proxy_settings)
-                if len(feed_info) >= 5:
-                    feed_id, feed_url, feed_name, proxy_required, proxy_settings = feed_info
-                elif len(feed_info) >= 3:
-                    feed_id, feed_url, feed_name = feed_info[0], feed_info[1], feed_info[2]
-                    proxy_required, proxy_settings = False, {}
-                else:
-                    feed_id, feed_url = feed_info[0], feed_info[1]
-                    feed_name = self._extract_domain_name(feed_url)
-                    proxy_required, proxy_settings = False, {}
+        if self.seen_links.bloom.saturated:
+            print("🧠 Индекс дедупликации переполнен, перестраиваю из БД")
+            self._warm_seen_links()
+        session = self._get_session()
+        # Запросы цикла укладываются в бюджет; не успевшие фиды откладываются до следующего опроса
+        deadline = time.monotonic() + FETCH_CYCLE_BUDGET_SECONDS
+        # Выведенные из ротации прокси перепроверяются до запросов цикла
+        if any(len(feed_info) >= 5 and feed_info[3] for feed_info in feeds):
+            await self.proxy_pool.check_due()
+        tasks = []
+        for i, feed_info in enumerate(feeds):
+            # Поддержка разных форматов: старый (id, url), новый (id, url, name), с прокси (id, url, name, proxy_required, proxy_settings)
+            if len(feed_info) >= 5:
+                feed_id, feed_url, feed_name, proxy_required, proxy_settings = feed_info
+            elif len(feed_info) >= 3:
+                feed_id, feed_url, feed_name = feed_info[0], feed_info[1], feed_info[2]
+                proxy_required, proxy_settings = False, {}
+            else:
+                feed_id, feed_url = feed_info[0], feed_info[1]
+                feed_name = self._extract_domain_name(feed_url)
+                proxy_required, proxy_settings = False, {}
+            
+            should_skip, reason = self.error_manager.should_skip_feed(feed_url)
+            if should_skip:
+                print(f"⏸️ {feed_name}: {reason}")
+                continue
+            task = self._parse_single_feed_async(
+                session, feed_id, feed_url, feed_name, proxy_required, proxy_settings, deadline
+            )
+            tasks.append(task)
+        if not tasks:
+            print("⚠️ Нет доступных источников для обработки")
+            self._reset_cycle_stats()
+            return 0
+        # Параллелизм ограничивается на уровне запросов (HostLimiter), а не задач целиком
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        total_new_articles = 0
+        successful_feeds = 0
+        failed_feeds = 0
+        # Сопоставляем результаты с задачами
+        task_index = 0
+        for i, feed_info in enumerate(feeds):
+            feed_name = feed_info[2] if len(feed_info) >= 3 else self._extract_domain_name(feed_info[1])
+            
+            should_skip, _ = self.error_manager.should_skip_feed(feed_info[1])
+            if should_skip:
+                continue
                 
-                should_skip, reason = self.error_manager.should_skip_feed(feed_url)
-                if should_skip:
-                    print(f"⏸️ {feed_name}: {reason}")
-                    continue
-                task = self._parse_single_feed_async(session, feed_id, feed_url, feed_name, proxy_required, proxy_settings)
-                tasks.append(task)
-            if not tasks:
-                print("⚠️ Нет доступных источников для обработки")
-                return 0
-            semaphore = asyncio.Semaphore(5)
-            async def limited_task(task):
-                async with semaphore:
-                    return await task
-            limited_tasks = [limited_task(task) for task in tasks]
-            results = await asyncio.gather(*limited_tasks, return_exceptions=True)
-            total_new_articles = 0
-            successful_feeds = 0
-            failed_feeds = 0
-            # Сопоставляем результаты с задачами
-            task_index = 0
-            for i, feed_info in enumerate(feeds):
-                feed_name = feed_info[2] if len(feed_info) >= 3 else self._extract_domain_name(feed_info[1])
+            if task_index < len(results):
+                result = results[task_index]
+                task_index += 1
                 
-                should_skip, _ = self.error_manager.should_skip_feed(feed_info[1])
-                if should_skip:
-                    continue
-                    
-                if task_index < len(results):
-                    result = results[task_index]
-                    task_index += 1
-                    
-                    if isinstance(result, Exception):
-                        print(f"❌ {feed_name}: {str(result)[:50]}")
-                        failed_feeds += 1
-                        self.error_manager.record_error(
-                            feed_info[1], feed_name, "exception", 
-                            error_message=str(result)[:100]
-                        )
+                if isinstance(result, Exception):
+                    print(f"❌ {feed_name}: {str(result)[:50]}")
+                    failed_feeds += 1
+                    self.error_manager.record_error(
+                        feed_info[1], feed_name, "exception", 
+                        error_message=str(result)[:100]
+                    )
+                else:
+                    total_new_articles += result
+                    successful_feeds += 1
+                    self.error_manager.reset_errors(feed_info[1])
+                    if result > 0:
+                        print(f"✅ {feed_name}: {result} новых")
                     else:
-                        total_new_articles += result
-                        successful_feeds += 1
-                        self.error_manager.reset_errors(feed_info[1])
-                        if result > 0:
-                            print(f"✅ {feed_name}: {result} новых")
-                        else:
-                            print(f"📡 {feed_name}: без новых")
-            print(f"📊 Обработано: {successful_feeds} успешно, {failed_feeds} с ошибками")
-            print(f"📰 Всего новых статей: {total_new_articles}")
-            return total_new_articles
+                        print(f"📡 {feed_name}: без новых")
+        print(f"📊 Обработано: {successful_feeds} успешно, {failed_feeds} с ошибками")
+        print(f"📰 Всего новых статей: {total_new_articles}")
+        cycle_stats = self.cycle_stats
+        not_modified_ratio = cycle_stats['not_modified'] / cycle_stats['requests'] if cycle_stats['requests'] else 0
+        print(f"📉 Условный GET: {cycle_stats['not_modified']}/{cycle_stats['requests']} ответов 304 "
+              f"({not_modified_ratio:.0%}), скачано {cycle_stats['bytes_downloaded'] // 1024} КБ, "
+              f"сэкономлено ~{cycle_stats['bytes_saved'] // 1024} КБ")
+        if cycle_stats['streamed']:
+            print(f"🌊 Потоковый разбор: {cycle_stats['streamed']} больших фидов")
+        if cycle_stats['hedged'] or cycle_stats['deferred']:
+            print(f"⏱️ Бюджет цикла: hedged запросов {cycle_stats['hedged']} (быстрее первого: {cycle_stats['hedge_wins']}), "
+                  f"отложено фидов {len(cycle_stats['deferred'])}")
+        slowest = ', '.join(
+            f"{self._extract_domain_name(feed_url)} {p50:.1f}/{p95:.1f}с" for feed_url, p50, p95 in self.latency.slowest()
+        )
+        if slowest:
+            print(f"🐢 Самые медленные фиды (p50/p95): {slowest}")
+        limiter_stats = self.limiter.get_stats()
+        print(f"🚦 Параллелизм: лимит {limiter_stats['limit']} (пик {limiter_stats['peak_in_flight']}), "
+              f"медленных хостов: {len(limiter_stats['slow_hosts'])}"
+              + (f" ({', '.join(limiter_stats['slow_hosts'][:5])})" if limiter_stats['slow_hosts'] else ''))
+        print(f"⏭️ Без изменений (парсинг пропущен): {cycle_stats['not_modified'] + cycle_stats['unchanged']} "
+              f"(304: {cycle_stats['not_modified']}, тот же отпечаток: {cycle_stats['unchanged']})")
+        self.last_cycle_stats = dict(cycle_stats, not_modified_ratio=not_modified_ratio)
+        self.cycle_stats = self._new_cycle_stats()
+        dedup_stats = self.seen_links.get_stats()
+        print(f"🧠 Дедупликация: {dedup_stats['misses']} новых, {dedup_stats['lru_hits']} из LRU, "
+              f"{dedup_stats['db_checks']} проверок в БД ({dedup_stats['false_positives']} ложных срабатываний)")
+        self.seen_links.reset_stats()
+        return total_new_articles
 
-    async def _parse_single_feed_async(self, session, feed_id, feed_url, feed_name=None, proxy_required=False, proxy_settings=None):
+    async def _parse_single_feed_async(self, session, feed_id, feed_url, feed_name=None, proxy_required=False,
+                                       proxy_settings=None, deadline=None):
         if not feed_name:
             feed_name = self._extract_domain_name(feed_url)
         
@@ -116,172 +313,317 @@ class AsyncRSSParser:
         max_retries = 3
         retry_delay = 2
         
-        # Определяем нужно ли использовать прокси
-        current_session = session
-        proxy_session = None
-        
-        if proxy_required and proxy_settings.get('url'):
-            print(f"🌐 {feed_name}: используем прокси ({proxy_settings.get('region', 'unknown')})")
-            # Создаем отдельную сессию с прокси
-            timeout = aiohttp.ClientTimeout(total=30)
-            connector = aiohttp.TCPConnector(
-                limit=5,
-                limit_per_host=2,
-                force_close=True,
-                enable_cleanup_closed=True
-            )
-            headers = {
-                'User-Agent': 'RSS Media Monitor/2.0 (Proxy)',
-                'Accept': 'application/rss+xml, application/xml, text/xml, */*',
-                'Accept-Encoding': 'gzip, deflate',
-                'Connection': 'keep-alive'
-            }
-            proxy_session = aiohttp.ClientSession(
-                timeout=timeout,
-                connector=connector,
-                headers=headers
-            )
-            current_session = proxy_session
-        
-        try:
-            for attempt in range(max_retries):
-                try:
-                    if attempt > 0:
-                        print(f"📡 {feed_name} попытка {attempt + 1}/{max_retries}")
-                    
-                    # Используем прокси если настроен
-                    request_kwargs = {}
-                    if proxy_required and proxy_settings.get('url'):
-                        request_kwargs['proxy'] = proxy_settings['url']
-                    
-                    async with current_session.get(feed_url, **request_kwargs) as response:
-                        if response.status == 404:
-                            print(f"❌ {feed_name}: RSS не найден (404)")
+        for attempt in range(max_retries):
+            current_session, proxy_url = session, None
+            try:
+                if attempt > 0:
+                    print(f"📡 {feed_name} попытка {attempt + 1}/{max_retries}")
+                
+                # Прокси из пула: на каждой попытке - первый живой по списку источника и региона
+                request_kwargs = {'headers': self._conditional_headers(feed_url)}
+                if proxy_required:
+                    current_session, proxy_url = self.proxy_pool.route(proxy_settings, session)
+                    if proxy_url:
+                        request_kwargs['proxy'] = proxy_url
+                        print(f"🌐 {feed_name}: через прокси {self.proxy_pool.describe(proxy_url)}")
+                    else:
+                        print(f"🌐 {feed_name}: прокси недоступны, прямое соединение")
+                
+                self.cycle_stats['requests'] += 1
+                # Слот хоста держится до конца чтения ответа - соединение затем возвращается в пул
+                async with self.limiter.slot(feed_url), self._fetch(current_session, feed_url, request_kwargs, deadline) as response:
+                    if response.status == 407:
+                        self.proxy_pool.mark_failure(proxy_url)
+                    else:
+                        self.proxy_pool.mark_success(proxy_url)
+                    if response.status == 304:
+                        # Фид не изменился с прошлого ответа - парсинг не нужен
+                        self.cycle_stats['not_modified'] += 1
+                        self.cycle_stats['bytes_saved'] += self.feed_body_sizes.get(feed_url, 0)
+                        print(f"📡 {feed_name}: не изменился (304)")
+                        return 0
+                    elif response.status == 404:
+                        print(f"❌ {feed_name}: RSS не найден (404)")
+                        self.error_manager.record_error(
+                            feed_url, feed_name, "not_found", 404, "RSS feed не найден"
+                        )
+                        return 0
+                    elif response.status >= 400:
+                        # Специальная обработка 403 ошибок
+                        if response.status == 403:
+                            alternative = self.error_manager.should_try_alternative_method(feed_url, 403)
+                            print(f"🚫 {feed_name}: 403 Forbidden (рекомендация: {alternative})")
                             self.error_manager.record_error(
-                                feed_url, feed_name, "not_found", 404, "RSS feed не найден"
+                                feed_url, feed_name, "forbidden", 403, 
+                                f"Доступ запрещен, попробуйте: {alternative}"
                             )
-                            return 0
-                        elif response.status >= 400:
-                            # Специальная обработка 403 ошибок
-                            if response.status == 403:
-                                alternative = self.error_manager.should_try_alternative_method(feed_url, 403)
-                                print(f"🚫 {feed_name}: 403 Forbidden (рекомендация: {alternative})")
-                                self.error_manager.record_error(
-                                    feed_url, feed_name, "forbidden", 403, 
-                                    f"Доступ запрещен, попробуйте: {alternative}"
-                                )
-                            else:
-                                self.error_manager.record_error(
-                                    feed_url, feed_name, "http_error", response.status, 
-                                    f"HTTP {response.status}"
-                                )
-                            
-                            raise aiohttp.ClientResponseError(
-                                request_info=response.request_info,
-                                history=response.history,
-                                status=response.status
+                        else:
+                            self.error_manager.record_error(
+                                feed_url, feed_name, "http_error", response.status, 
+                                f"HTTP {response.status}"
                             )
-                        content = await response.text(encoding='utf-8', errors='ignore')
+                        
+                        raise aiohttp.ClientResponseError(
+                            request_info=response.request_info,
+                            history=response.history,
+                            status=response.status
+                        )
+                    feed_data = None
+                    if self._should_stream(feed_url, response):
+                        # Большой фид: разбираем по мере чтения и не дочитываем лишнее
+                        feed_data = await self._stream_parse_response(feed_url, response)
+                        content_hash = self._articles_fingerprint(feed_data['articles'])
+                    else:
+                        body = await response.read()
+                        content = body.decode('utf-8', errors='ignore')
                         if not content or len(content) < 100:
                             raise Exception("Получен пустой или слишком короткий ответ")
-                    
-                    loop = asyncio.get_event_loop()
-                    with ThreadPoolExecutor(max_workers=2) as executor:
-                        feed_data = await loop.run_in_executor(
-                            executor, self._safe_parse_feed, content
-                        )
-                    if not feed_data or not feed_data.entries:
-                        print(f"⚠️ {feed_name}: RSS пустой")
+                        self.cycle_stats['bytes_downloaded'] += len(body)
+                        self.feed_body_sizes[feed_url] = len(body)
+                        content_hash = hashlib.blake2b(body, digest_size=16).hexdigest()
+                    # Валидаторы запоминаются только вместе с сохраненными статьями - иначе 304 потеряет их
+                    response_headers = response.headers
+                
+                # Сервер игнорирует условный GET, но отдает байт-в-байт тот же фид
+                if self.feed_hashes.get(feed_url) == content_hash:
+                    self.cycle_stats['unchanged'] += 1
+                    print(f"📡 {feed_name}: содержимое не изменилось")
+                    self._store_validators(feed_url, response_headers)
+                    return 0
+                
+                if feed_data is None:
+                    loop = asyncio.get_running_loop()
+                    feed_data = await loop.run_in_executor(
+                        self.parse_executor, parse_feed_content, content
+                    )
+                if not feed_data or not feed_data['entries_count']:
+                    print(f"⚠️ {feed_name}: RSS пустой")
+                    if feed_data is not None:
+                        self._store_content_hash(feed_url, content_hash)
+                        self._store_validators(feed_url, response_headers)
+                    return 0
+                feed_title = feed_data['title'] or self._extract_domain_name(feed_url)
+                # Обновляем информацию о ленте по URL, чтобы таблица feeds содержала запись
+                self.db.update_feed_info(feed_url=feed_url, title=feed_title)
+                new_articles_count = await self._process_articles_async(
+                    feed_id, feed_url, feed_data['articles'], content_hash, response_headers
+                )
+                return new_articles_count
+            except CycleDeadlineExceeded:
+                self._defer(feed_id, feed_name)
+                return 0
+            except asyncio.TimeoutError:
+                print(f"⏰ {feed_name}: таймаут (попытка {attempt + 1})")
+                self.proxy_pool.mark_failure(proxy_url)
+                if attempt == max_retries - 1:  # Последняя попытка
+                    self.error_manager.record_error(
+                        feed_url, feed_name, "timeout", 
+                        error_message="Превышено время ожидания ответа"
+                    )
+                if attempt < max_retries - 1:
+                    if not await self._backoff(feed_id, feed_name, feed_url, retry_delay, deadline):
                         return 0
-                    feed_title = getattr(feed_data.feed, 'title', self._extract_domain_name(feed_url))
-                    # Обновляем информацию о ленте по URL, чтобы таблица feeds содержала запись
-                    self.db.update_feed_info(feed_url=feed_url, title=feed_title)
-                    new_articles_count = await self._process_articles_async(
-                        feed_id, feed_url, feed_data.entries
+                    retry_delay *= 2
+            except aiohttp.ClientError as e:
+                print(f"🌐 {feed_name}: сетевая ошибка")
+                if not isinstance(e, aiohttp.ClientResponseError):
+                    # HTTP ошибка сайта - прокси при этом работает
+                    self.proxy_pool.mark_failure(proxy_url)
+                if attempt == max_retries - 1:  # Последняя попытка
+                    self.error_manager.record_error(
+                        feed_url, feed_name, "network_error", 
+                        error_message=str(e)[:100]
                     )
-                    return new_articles_count
-                except asyncio.TimeoutError:
-                    print(f"⏰ {feed_name}: таймаут (попытка {attempt + 1})")
-                    if attempt == max_retries - 1:  # Последняя попытка
-                        self.error_manager.record_error(
-                            feed_url, feed_name, "timeout", 
-                            error_message="Превышено время ожидания ответа"
-                        )
-                    if attempt < max_retries - 1:
-                        await asyncio.sleep(retry_delay)
-                        retry_delay *= 2
-                except aiohttp.ClientError as e:
-                    print(f"🌐 {feed_name}: сетевая ошибка")
-                    if attempt == max_retries - 1:  # Последняя попытка
-                        self.error_manager.record_error(
-                            feed_url, feed_name, "network_error", 
-                            error_message=str(e)[:100]
-                        )
-                    if attempt < max_retries - 1:
-                        await asyncio.sleep(retry_delay)
-                        retry_delay *= 2
-                except Exception as e:
-                    print(f"❌ {feed_name}: ошибка парсинга")
-                    if attempt == max_retries - 1:  # Последняя попытка
-                        self.error_manager.record_error(
-                            feed_url, feed_name, "parsing_error", 
-                            error_message=str(e)[:100]
-                        )
-                    if attempt < max_retries - 1:
-                        await asyncio.sleep(retry_delay)
-                        retry_delay *= 2
-        finally:
-            # Закрываем прокси сессию если была создана
-            if proxy_session:
-                await proxy_session.close()
+                if attempt < max_retries - 1:
+                    if not await self._backoff(feed_id, feed_name, feed_url, retry_delay, deadline):
+                        return 0
+                    retry_delay *= 2
+            except Exception as e:
+                print(f"❌ {feed_name}: ошибка парсинга")
+                if attempt == max_retries - 1:  # Последняя попытка
+                    self.error_manager.record_error(
+                        feed_url, feed_name, "parsing_error", 
+                        error_message=str(e)[:100]
+                    )
+                if attempt < max_retries - 1:
+                    if not await self._backoff(feed_id, feed_name, feed_url, retry_delay, deadline):
+                        return 0
+                    retry_delay *= 2
         print(f"💥 {feed_name}: все попытки исчерпаны")
         return 0
 
-    def _safe_parse_feed(self, content):
+    @contextlib.asynccontextmanager
+    async def _fetch(self, session, feed_url, request_kwargs, deadline=None):
+        """
+        GET в пределах бюджета цикла. Если фид с историей не ответил за свой p95,
+        уходит второй (hedged) запрос; используется первый полученный ответ, второй отменяется.
+        """
+        if remaining(deadline) < FETCH_MIN_ATTEMPT_SECONDS:
+            raise CycleDeadlineExceeded(feed_url)
+
+        started = time.monotonic()
+        requests = [asyncio.create_task(self._request(session, feed_url, request_kwargs, deadline))]
+        response = None
         try:
-            return feedparser.parse(content)
-        except Exception as e:
-            print(f"⚠️ Ошибка парсинга feedparser: {e}")
-            return None
+            hedge_delay = self.latency.hedge_delay(feed_url)
+            if hedge_delay is not None and hedge_delay + FETCH_MIN_ATTEMPT_SECONDS < remaining(deadline):
+                done, _ = await asyncio.wait(requests, timeout=hedge_delay)
+                if not done:
+                    self.cycle_stats['hedged'] += 1
+                    requests.append(asyncio.create_task(self._request(session, feed_url, request_kwargs, deadline)))
+            response = await self._first_response(requests)
+        finally:
+            # Проигравший запрос отменяется, уже полученный лишний ответ освобождает соединение
+            for request in requests:
+                if not request.done():
+                    request.cancel()
+            for result in await asyncio.gather(*requests, return_exceptions=True):
+                if isinstance(result, aiohttp.ClientResponse) and result is not response:
+                    result.release()
+
+        if len(requests) > 1 and requests[1].done() and not requests[1].cancelled() \
+                and requests[1].exception() is None and requests[1].result() is response:
+            self.cycle_stats['hedge_wins'] += 1
+        self.latency.record(feed_url, time.monotonic() - started)
+        async with response:
+            yield response
+
+    async def _request(self, session, feed_url, request_kwargs, deadline):
+        """Один GET; таймаут сессии урезается до остатка бюджета цикла"""
+        budget = remaining(deadline)
+        session_timeout = session.timeout.total
+        if session_timeout is None or budget < session_timeout:
+            request_kwargs = dict(request_kwargs, timeout=aiohttp.ClientTimeout(total=max(budget, 0.1)))
+        return await session.get(feed_url, **request_kwargs)
+
+    @staticmethod
+    async def _first_response(requests):
+        """Первый успешный ответ; если все запросы упали - ошибка первого из них"""
+        pending = set(requests)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for request in done:
+                if request.exception() is None:
+                    return request.result()
+        raise requests[0].exception()
+
+    async def _backoff(self, feed_id, feed_name, feed_url, retry_delay, deadline):
+        """Пауза перед повтором; False - повтор не успевает в бюджет цикла и фид отложен"""
+        if retry_delay + self.latency.expected_latency(feed_url) > remaining(deadline):
+            self._defer(feed_id, feed_name)
+            return False
+        await asyncio.sleep(retry_delay)
+        return True
+
+    def _defer(self, feed_id, feed_name):
+        self.cycle_stats['deferred'].append(feed_id)
+        print(f"⏳ {feed_name}: не укладывается в бюджет цикла, отложен до следующего опроса")
+
+    def _conditional_headers(self, feed_url):
+        """If-None-Match / If-Modified-Since по сохраненным валидаторам фида"""
+        etag, last_modified = self.feed_validators.get(feed_url, (None, None))
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        return headers
+
+    def _store_validators(self, feed_url, response_headers):
+        """Запоминает ETag / Last-Modified ответа 200 (в БД - только при изменении)"""
+        validators = (response_headers.get('ETag'), response_headers.get('Last-Modified'))
+        if validators == self.feed_validators.get(feed_url, (None, None)):
+            return
+        self.feed_validators[feed_url] = validators
+        if hasattr(self.db, 'save_feed_validators'):
+            try:
+                self.db.save_feed_validators(feed_url, *validators)
+            except sqlite3.Error as e:
+                print(f"⚠️ Не удалось сохранить валидаторы {feed_url}: {e}")
 
-    async def _process_articles_async(self, feed_id, feed_url, entries):
-        new_articles_count = 0
+    def _should_stream(self, feed_url, response):
+        """Потоковый разбор для фидов больше STREAM_PARSE_MIN_BYTES (по заголовку или прошлому ответу)"""
+        if feed_url in self.stream_disabled:
+            return False
+        expected_size = response.content_length or self.feed_body_sizes.get(feed_url, 0)
+        return expected_size >= STREAM_PARSE_MIN_BYTES
+
+    async def _stream_parse_response(self, feed_url, response):
+        """Чтение ответа кусками с инкрементальным разбором до лимита записей или cutoff"""
+        parser = StreamingFeedParser(MAX_ENTRIES_PER_FEED, self._article_cutoff_time())
+        try:
+            async for chunk in response.content.iter_chunked(STREAM_CHUNK_SIZE):
+                parser.feed(chunk)
+                if parser.done:
+                    break
+            parser.close()
+        except ET.ParseError:
+            # Невалидный XML (feedparser к нему терпимее) - дальше этот фид читаем целиком
+            self.stream_disabled.add(feed_url)
+            raise
+        finally:
+            self.cycle_stats['bytes_downloaded'] += parser.bytes_read
+
+        self.cycle_stats['streamed'] += 1
+        if response.content_length:
+            self.feed_body_sizes[feed_url] = response.content_length
+        else:
+            self.feed_body_sizes[feed_url] = max(parser.bytes_read, self.feed_body_sizes.get(feed_url, 0))
+        return parser.result()
+
+    def _articles_fingerprint(self, articles):
+        """Отпечаток разобранных записей (для потокового режима, где тело читается не целиком)"""
+        digest = hashlib.blake2b(digest_size=16)
+        for article in articles:
+            published_date = article.get('published_date')
+            digest.update(f"{article.get('link')}\x1f{article.get('title')}\x1f"
+                          f"{published_date.isoformat() if published_date else ''}\x1e".encode('utf-8'))
+        return digest.hexdigest()
+
+    def _article_cutoff_time(self):
         max_age_hours = getattr(self.config, 'MAX_ARTICLE_AGE_HOURS', 24) if self.config else 24
-        cutoff_time = datetime.now(timezone.utc) - timedelta(hours=max_age_hours)
-        for entry in entries[:50]:
+        return datetime.now(timezone.utc) - timedelta(hours=max_age_hours)
+
+    def _store_content_hash(self, feed_url, content_hash):
+        """Запоминает отпечаток тела фида, статьи которого уже сохранены в БД"""
+        if self.feed_hashes.get(feed_url) == content_hash:
+            return
+        self.feed_hashes[feed_url] = content_hash
+        if hasattr(self.db, 'save_feed_content_hash'):
             try:
-                article_data = self._extract_article_data(entry)
-                if not article_data:
-                    continue
-                if article_data.get('published_date'):
-                    if article_data['published_date'] < cutoff_time:
-                        continue
-                if self.db.article_exists(article_data.get('link')):
+                self.db.save_feed_content_hash(feed_url, content_hash)
+            except sqlite3.Error as e:
+                print(f"⚠️ Не удалось сохранить отпечаток {feed_url}: {e}")
+
+    async def _process_articles_async(self, feed_id, feed_url, parsed_articles, content_hash=None,
+                                      response_headers=None):
+        cutoff_time = self._article_cutoff_time()
+        articles = []
+        for article_data in parsed_articles[:MAX_ENTRIES_PER_FEED]:
+            if article_data.get('published_date'):
+                if article_data['published_date'] < cutoff_time:
                     continue
-                article_id = self.db.add_article(
-                    feed_id=feed_id,
-                    title=article_data['title'],
-                    link=article_data['link'],
-                    description=article_data['description'],
-                    content=article_data['content'],
-                    author=article_data['author'],
-                    published_date=article_data['published_date'],
-                    guid=article_data.get('guid'),
-                    category=article_data.get('category'),
-                    tags=article_data.get('tags'),
-                    full_text=article_data.get('full_text'),
-                    media_attachments=article_data.get('media_attachments'),
-                    modification_date=article_data.get('modification_date'),
-                    news_id=article_data.get('news_id'),
-                    content_type=article_data.get('content_type'),
-                    newsline=article_data.get('newsline')
-                )
-                if article_id:
-                    new_articles_count += 1
-            except Exception as e:
-                print(f"⚠️ Ошибка обработки статьи: {e}")
-                continue
-        return new_articles_count
+            articles.append(article_data)
+        # Уже сохраненные ссылки отсекаются в памяти, в SQLite идут только вероятные совпадения Bloom
+        articles = [
+            article for article in articles
+            if not self.seen_links.is_seen(article.get('link'), self.db.article_exists)
+        ]
+        inserted_ids = []
+        if articles:
+            # Одна транзакция на весь фид: дубликаты отсекает INSERT OR IGNORE по link
+            try:
+                inserted_ids = self.db.add_articles_bulk(feed_id, articles)
+            except sqlite3.Error as e:
+                # Отпечаток и валидаторы не сохраняем - тот же ответ будет обработан в следующем цикле
+                print(f"⚠️ Ошибка сохранения статей {feed_url}: {e}")
+                return 0
+            self.seen_links.add_many(article.get('link') for article in articles)
+        if content_hash:
+            self._store_content_hash(feed_url, content_hash)
+        if response_headers is not None:
+            self._store_validators(feed_url, response_headers)
+        return len(inserted_ids)
 
     def _extract_domain_name(self, url):
         try:
@@ -306,7 +648,8 @@ class AsyncRSSParser:
 
     # Старые методы обработки ошибок удалены - теперь используется ErrorManager
 
-    def _extract_article_data(self, entry):
+    @staticmethod
+    def _extract_article_data(entry):
         try:
             import re
             title = entry.get('title', '').strip()
@@ -420,4 +763,78 @@ class AsyncRSSParser:
         except Exception as e:
             print(f"⚠️ Ошибка извлечения данных статьи: {e}")
             traceback.print_exc()
-            return None
\ No newline at end of file
+            return None
+
+# Бенчмарк HTTP пула против локального stub-сервера: python3 -m core.source_manager
+if __name__ == "__main__":
+    import statistics
+    from aiohttp import web
+
+    FEEDS, CYCLES = 20, 10
+
+    async def run_benchmark():
+        print("🧪 Бенчмарк: долгоживущий HTTP пул vs новая сессия на каждый цикл")
+
+        body = ('<?xml version="1.0" encoding="utf-8"?><rss version="2.0"><channel><title>Stub</title>'
+                + ''.join(f'<item><title>Новость {i}</title><link>https://example.com/{i}</link></item>'
+                          for i in range(50))
+                + '</channel></rss>').encode('utf-8')
+        connections = set()
+
+        async def feed_handler(request):
+            connections.add(request.transport.get_extra_info('peername'))
+            return web.Response(body=body, content_type='application/rss+xml')
+
+        app = web.Application()
+        app.router.add_get('/feed/{n}', feed_handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        port = runner.addresses[0][1]
+        # localhost вместо 127.0.0.1 - запросы проходят через резолвер
+        urls = [f'http://localhost:{port}/feed/{n}' for n in range(FEEDS)]
+
+        async def fetch(session, url, latencies):
+            started = time.perf_counter()
+            async with session.get(url) as response:
+                await response.read()
+            latencies.append(time.perf_counter() - started)
+
+        async def run_cycle(session, latencies):
+            semaphore = asyncio.Semaphore(5)
+
+            async def limited(url):
+                async with semaphore:
+                    await fetch(session, url, latencies)
+            await asyncio.gather(*(limited(url) for url in urls))
+
+        results = {}
+
+        # Старое поведение: новая сессия и force_close в каждом цикле
+        latencies = []
+        connections.clear()
+        for _ in range(CYCLES):
+            connector = aiohttp.TCPConnector(limit=10, limit_per_host=3, force_close=True)
+            async with aiohttp.ClientSession(connector=connector, headers=DEFAULT_HEADERS) as session:
+                await run_cycle(session, latencies)
+        results['Сессия на цикл (force_close)'] = (latencies, len(connections))
+
+        # Новое поведение: одна сессия на все циклы
+        latencies = []
+        connections.clear()
+        session = create_http_session(load_http_settings({'max_connections_per_host': 5}))
+        for _ in range(CYCLES):
+            await run_cycle(session, latencies)
+        await session.close()
+        results['Долгоживущий пул (keep-alive)'] = (latencies, len(connections))
+
+        await runner.cleanup()
+
+        print(f"📊 {FEEDS} фидов x {CYCLES} циклов:")
+        for name, (latencies, opened) in results.items():
+            print(f"   {name:<30} медиана {statistics.median(latencies) * 1000:6.2f} мс, "
+                  f"p95 {sorted(latencies)[int(len(latencies) * 0.95)] * 1000:6.2f} мс, "
+                  f"TCP соединений: {opened}")
+
+    asyncio.run(run_benchmark())
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+RSS Media Bus - Потоковый разбор больших RSS/Atom фидов
+Байты ответа подаются в XMLPullParser по мере чтения, записи извлекаются по одной,
+разбор останавливается после лимита записей или на записи старше cutoff
+"""
+
+import re
+import email.utils
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+ITEM_TAGS = ('item', 'entry')
+
+
+def _local_name(tag: str) -> str:
+    return tag.rsplit('}', 1)[-1].lower()
+
+
+def _namespace(tag: str) -> str:
+    return tag[1:].split('}', 1)[0].lower() if tag.startswith('{') else ''
+
+
+def _strip_html(text: str) -> str:
+    return re.sub(r'<[^>]+>', '', text).strip() if text else ''
+
+
+def _parse_date(value: Optional[str]) -> Optional[datetime]:
+    """RFC 822 (RSS pubDate) или ISO 8601 (Atom / dc:date) в aware UTC datetime"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        parsed = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        try:
+            parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+
+def _extract_item(item: ET.Element) -> Optional[Dict[str, Any]]:
+    """Элемент <item>/<entry> в словарь того же формата, что AsyncRSSParser._extract_article_data"""
+    title = link = guid = description = content = full_text = author = ''
+    published_raw = updated_raw = modification_raw = None
+    category = ''
+    tags: List[str] = []
+    media_attachments: List[Dict[str, Any]] = []
+    news_id = newsline = ''
+    content_type = 'article'
+
+    for child in item:
+        name = _local_name(child.tag)
+        text = (child.text or '').strip()
+        is_rbc = 'rbc' in _namespace(child.tag)
+
+        if is_rbc:
+            if name == 'full-text':
+                full_text = text
+            elif name == 'tag' and text:
+                tags.append(text)
+            elif name == 'image':
+                fields = {_local_name(field.tag): (field.text or '').strip() for field in child}
+                media_attachments.append({
+                    'type': 'image',
+                    'url': fields.get('url', ''),
+                    'mime_type': fields.get('type', 'image/jpeg'),
+                    'source': fields.get('source', ''),
+                    'copyright': fields.get('copyright', '')
+                })
+            elif name == 'video':
+                fields = {_local_name(field.tag): (field.text or '').strip() for field in child}
+                media_attachments.append({
+                    'type': 'video',
+                    'url': fields.get('url', ''),
+                    'mime_type': fields.get('type', 'video/mp4'),
+                    'copyright': fields.get('copyright', '')
+                })
+            elif name == 'news_id':
+                news_id = text
+            elif name == 'type':
+                content_type = text or content_type
+            elif name == 'newsline':
+                newsline = text
+            elif name == 'newsmodifdate':
+                modification_raw = text
+            continue
+
+        if name == 'title':
+            title = _strip_html(text)
+        elif name == 'link':
+            # RSS: текст элемента, Atom: href (предпочтительно rel="alternate")
+            href = child.get('href')
+            if href and (not link or child.get('rel', 'alternate') == 'alternate'):
+                link = href.strip()
+            elif text and not link:
+                link = text
+        elif name in ('guid', 'id'):
+            guid = guid or text
+        elif name in ('description', 'summary'):
+            description = description or text
+        elif name in ('encoded', 'content'):
+            content = content or text
+        elif name in ('author', 'creator'):
+            author_name = child.find('{*}name')
+            author = author or (author_name.text.strip() if author_name is not None and author_name.text else text)
+        elif name in ('pubdate', 'published', 'date', 'issued'):
+            published_raw = published_raw or text
+        elif name in ('updated', 'modified'):
+            updated_raw = updated_raw or text
+        elif name == 'category':
+            term = child.get('term') or text
+            if term:
+                category = category or term
+                tags.append(term)
+        elif name == 'enclosure':
+            media_attachments.append({
+                'type': 'enclosure',
+                'url': child.get('url', ''),
+                'mime_type': child.get('type', ''),
+                'length': child.get('length', 0)
+            })
+
+    if not title:
+        return None
+
+    published_date = _parse_date(published_raw) or _parse_date(updated_raw) or datetime.now(timezone.utc)
+
+    return {
+        'title': title,
+        'link': link,
+        'guid': guid,
+        'description': _strip_html(description),
+        'content': _strip_html(content),
+        'full_text': _strip_html(full_text),
+        'author': author,
+        'published_date': published_date,
+        'modification_date': _parse_date(modification_raw),
+        'category': category,
+        'tags': tags,
+        'media_attachments': media_attachments,
+        'news_id': news_id,
+        'content_type': content_type,
+        'newsline': newsline,
+        'categories': tags
+    }
+
+
+class StreamingFeedParser:
+    """
+    Инкрементальный разбор RSS 2.0 / Atom.
+    feed() принимает очередной кусок байтов; done=True - дальше читать ответ не нужно.
+    Записи считаются упорядоченными от новых к старым, как в RSS-лентах новостей.
+    """
+
+    def __init__(self, max_entries: int, cutoff_time: Optional[datetime] = None):
+        self.max_entries = max_entries
+        self.cutoff_time = cutoff_time
+
+        self.feed_title: Optional[str] = None
+        self.entries_count = 0
+        self.articles: List[Dict[str, Any]] = []
+        self.done = False
+        self.bytes_read = 0
+
+        self._parser = ET.XMLPullParser(events=('start', 'end'))
+        self._item_depth = 0
+
+    def feed(self, chunk: bytes):
+        if self.done:
+            return
+        self.bytes_read += len(chunk)
+        self._parser.feed(chunk)
+        self._drain_events()
+
+    def close(self):
+        """Завершение разбора; при ранней остановке недочитанный документ не ошибка"""
+        if self.done:
+            return
+        self._parser.close()
+        self._drain_events()
+
+    def result(self) -> Dict[str, Any]:
+        """Результат в формате parse_feed_content"""
+        return {
+            'title': self.feed_title,
+            'entries_count': self.entries_count,
+            'articles': self.articles
+        }
+
+    def _drain_events(self):
+        for event, element in self._parser.read_events():
+            name = _local_name(element.tag)
+
+            if event == 'start':
+                if name in ITEM_TAGS:
+                    self._item_depth += 1
+                continue
+
+            if name in ITEM_TAGS:
+                self._item_depth -= 1
+                self._handle_item(element)
+                # Освобождаем память разобранной записи
+                element.clear()
+                if self.done:
+                    return
+            elif name == 'title' and self._item_depth == 0 and self.feed_title is None:
+                self.feed_title = (element.text or '').strip() or None
+
+    def _handle_item(self, element: ET.Element):
+        self.entries_count += 1
+        article = _extract_item(element)
+        if article:
+            if self.cutoff_time and article['published_date'] < self.cutoff_time:
+                # Дальше только более старые записи
+                self.done = True
+                return
+            self.articles.append(article)
+
+        if self.entries_count >= self.max_entries:
+            self.done = True
+
+
+# Тестирование
+if __name__ == "__main__":
+    from datetime import timedelta
+
+    print("🧪 Тестирование StreamingFeedParser")
+
+    now = datetime.now(timezone.utc)
+    items = []
+    for i in range(200):
+        pub_date = email.utils.format_datetime(now - timedelta(minutes=30 * i))
+        items.append(
+            f"<item><title>Новость {i}</title><link>https://example.com/{i}</link>"
+            f"<description>&lt;p&gt;Описание {i}&lt;/p&gt;</description>"
+            f"<category>экономика</category><pubDate>{pub_date}</pubDate>"
+            f"<rbc_news:full-text>Полный текст {i}</rbc_news:full-text></item>"
+        )
+    document = (
+        '<?xml version="1.0" encoding="utf-8"?>'
+        '<rss version="2.0" xmlns:rbc_news="https://www.rbc.ru"><channel><title>Тестовый фид</title>'
+        + ''.join(items) + '</channel></rss>'
+    ).encode('utf-8')
+
+    for max_entries, cutoff in ((50, None), (50, now - timedelta(hours=6))):
+        parser = StreamingFeedParser(max_entries, cutoff)
+        for offset in range(0, len(document), 4096):
+            parser.feed(document[offset:offset + 4096])
+            if parser.done:
+                break
+        parser.close()
+        result = parser.result()
+        print(f"📊 max_entries={max_entries}, cutoff={'6ч' if cutoff else 'нет'}: "
+              f"{len(result['articles'])} статей, прочитано {parser.bytes_read}/{len(document)} байт")
+        first = result['articles'][0]
+        print(f"   {result['title']} | {first['title']} | {first['description']} | {first['full_text']} | {first['tags']}")
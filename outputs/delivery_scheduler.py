@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+RSS Media Bus - Планировщик доставки сообщений по чатам
+Воркер на (bot_token, chat_id): чаты отправляют параллельно под общими лимитами Telegram,
+внутри топика статьи уходят по published_date
+"""
+
+import asyncio
+import heapq
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from outputs.telegram_rate_limit import TelegramRateLimiter
+from outputs.telegram_sender import pack_digest
+from config import DIGEST_MIN_ARTICLES, DIGEST_MAX_WAIT_SECONDS
+
+ChatKey = Tuple[str, str]
+# Очередь внутри чата: конфиг получателя и топик
+LaneKey = Tuple[str, Optional[int]]
+Deliver = Callable[[List['DeliveryItem']], Awaitable[Any]]
+# Обработчик сбоя deliver: возвращает сообщения в очередь доставки с паузой
+DeliveryErrorHandler = Callable[[List['DeliveryItem'], Exception], Any]
+
+logger = logging.getLogger(__name__)
+
+
+class DigestConfig(NamedTuple):
+    """Режим дайджеста топика (digest в topics_mapping)"""
+    min_articles: int = DIGEST_MIN_ARTICLES
+    max_wait_seconds: float = DIGEST_MAX_WAIT_SECONDS
+
+    @classmethod
+    def from_mapping(cls, value) -> Optional['DigestConfig']:
+        """digest: true | {min_articles, max_wait_seconds}; отсутствие или false - без дайджеста"""
+        if not value:
+            return None
+        if isinstance(value, dict):
+            return cls(int(value.get('min_articles', DIGEST_MIN_ARTICLES)),
+                       float(value.get('max_wait_seconds', DIGEST_MAX_WAIT_SECONDS)))
+        return cls()
+
+
+class DeliveryItem(NamedTuple):
+    """Сообщение очереди доставки, назначенное в топик чата"""
+    sort_key: Tuple[str, int]  # (published_date, article_id) - порядок внутри топика
+    user_key: str
+    article_id: int
+    topic_id: Optional[int]
+    payload: str
+    attempts: int
+    digest: Optional[DigestConfig] = None
+    digest_entry: str = ''  # строка статьи в дайджесте (format_digest_entry)
+
+
+class ChatWorker:
+    """
+    Очереди топиков одного чата. Следующим уходит сообщение топика, который лимитер
+    допустит раньше всех (при равенстве - более раннее по published_date), так что
+    исчерпанный лимит одного топика не задерживает остальные.
+    Топик в режиме дайджеста копит статьи до min_articles или max_wait_seconds
+    и уходит одним сообщением в пределах лимита длины.
+    """
+
+    def __init__(self, chat_key: ChatKey, limiter: TelegramRateLimiter, deliver: Deliver,
+                 on_error: Optional[DeliveryErrorHandler] = None):
+        self.bot_token, self.chat_id = chat_key
+        self.limiter = limiter
+        self.deliver = deliver
+        self.on_error = on_error
+        self.lanes: Dict[LaneKey, List[DeliveryItem]] = {}
+        # Когда очередь топика стала непустой - отсчет ожидания дайджеста
+        self.lane_since: Dict[LaneKey, float] = {}
+        self.wakeup = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+    def __len__(self):
+        return sum(len(queue) for queue in self.lanes.values())
+
+    def put(self, item: DeliveryItem):
+        lane = (item.user_key, item.topic_id)
+        if lane not in self.lanes:
+            self.lanes[lane] = []
+            self.lane_since[lane] = self.limiter.clock()
+        heapq.heappush(self.lanes[lane], item)
+        self.wakeup.set()
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.run())
+
+    def _take(self, lane: LaneKey) -> List[DeliveryItem]:
+        """Одна статья или столько статей дайджеста, сколько помещается в сообщение"""
+        queue = self.lanes[lane]
+        if queue[0].digest is None:
+            items = [heapq.heappop(queue)]
+        else:
+            ordered = heapq.nsmallest(len(queue), queue)
+            items = ordered[:pack_digest([item.digest_entry for item in ordered])]
+            queue[:] = ordered[len(items):]
+        if not queue:
+            del self.lanes[lane], self.lane_since[lane]
+        return items
+
+    def _next(self) -> Tuple[Optional[List[DeliveryItem]], float]:
+        """(сообщения к отправке, None) или (None, сколько ждать ближайшего таймера дайджеста)"""
+        now = self.limiter.clock()
+        ready, wait = [], float('inf')
+        for lane, queue in self.lanes.items():
+            digest = queue[0].digest
+            if digest is not None and len(queue) < digest.min_articles:
+                remaining = self.lane_since[lane] + digest.max_wait_seconds - now
+                if remaining > 0:
+                    wait = min(wait, remaining)
+                    continue
+            ready.append(lane)
+        if not ready:
+            return None, wait
+        lane = min(ready, key=lambda lane: (
+            self.limiter.delay(self.bot_token, self.chat_id, lane[1]), self.lanes[lane][0].sort_key
+        ))
+        return self._take(lane), 0.0
+
+    async def _wait(self, seconds: float):
+        """Пауза до таймера дайджеста; новое сообщение в чате прерывает ее"""
+        self.wakeup.clear()
+        waiters = [asyncio.create_task(self.wakeup.wait()), asyncio.create_task(self.limiter.sleep(seconds))]
+        try:
+            await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for waiter in waiters:
+                waiter.cancel()
+
+    async def run(self):
+        """Воркер живет, пока у чата есть сообщения; новое сообщение запускает его снова"""
+        while self.lanes:
+            items, wait = self._next()
+            if items is None:
+                await self._wait(wait)
+                continue
+            try:
+                await self.deliver(items)
+            except Exception as e:
+                logger.error(f"❌ Ошибка доставки в чат {self.chat_id}: {e}")
+                self._failed(items, e)
+
+    def _failed(self, items: List[DeliveryItem], error: Exception):
+        """Сбой одной пачки не останавливает воркер; без обработчика сообщения вернутся в очередь при запуске"""
+        if self.on_error is None:
+            return
+        try:
+            self.on_error(items, error)
+        except Exception as e:
+            logger.error(f"❌ Не удалось вернуть в очередь {len(items)} сообщений чата {self.chat_id}: {e}")
+
+
+class DeliveryScheduler:
+    """
+    Воркеры по чатам; deliver(items) отправляет статью или дайджест и фиксирует результат в очереди доставки,
+    on_error(items, error) - если deliver завершился исключением
+    """
+
+    def __init__(self, limiter: TelegramRateLimiter, deliver: Deliver,
+                 on_error: Optional[DeliveryErrorHandler] = None):
+        self.limiter = limiter
+        self.deliver = deliver
+        self.on_error = on_error
+        self.workers: Dict[ChatKey, ChatWorker] = {}
+
+    def submit(self, chat_key: ChatKey, item: DeliveryItem):
+        worker = self.workers.get(chat_key)
+        if worker is None:
+            worker = self.workers[chat_key] = ChatWorker(chat_key, self.limiter, self.deliver, self.on_error)
+        worker.put(item)
+
+    def pending(self) -> int:
+        """Сообщений в памяти, еще не переданных в отправку"""
+        return sum(len(worker) for worker in self.workers.values())
+
+    def active_chats(self) -> int:
+        return sum(1 for worker in self.workers.values() if worker.task and not worker.task.done())
+
+    async def join(self):
+        """Дождаться, пока все воркеры опустошат свои очереди"""
+        while True:
+            tasks = [worker.task for worker in self.workers.values() if worker.task and not worker.task.done()]
+            if not tasks:
+                return
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def cancel(self):
+        """Остановка: недоставленные сообщения остаются in_flight и возвращаются в очередь при запуске"""
+        for worker in self.workers.values():
+            if worker.task and not worker.task.done():
+                worker.task.cancel()
+            worker.lanes.clear()
+            worker.lane_since.clear()
+
+
+# Моделирование в ускоренном времени: python3 -m outputs.delivery_scheduler
+if __name__ == "__main__":
+    import random
+    import time
+
+    TIME_SCALE = 100  # секунд модели за секунду реального времени
+    SEND_LATENCY = 0.15
+    ARTICLES, TOPICS = 50, 10
+
+    def model_clock():
+        return time.monotonic() * TIME_SCALE
+
+    async def model_sleep(seconds):
+        await asyncio.sleep(seconds / TIME_SCALE)
+
+    def build_backlog(chats):
+        """50 статей по 10 топикам, топики поровну разложены по чатам"""
+        rng = random.Random(24)
+        backlog = []
+        for article_id in range(ARTICLES):
+            topic = rng.randrange(TOPICS)
+            chat_id = f'-100{topic % chats}'
+            published = f'2025-01-01 00:{rng.randrange(60):02d}:00'
+            backlog.append((chat_id, DeliveryItem((published, article_id), f'user{chat_id}', article_id,
+                                                  (topic + 1) * 10, '', 0)))
+        return backlog
+
+    async def sequential(backlog):
+        """Как раньше: подписчик (чат) отправляет по одной статье и ждет 3 секунды; подписчики параллельно"""
+        chats: Dict[str, List[DeliveryItem]] = {}
+        for chat_id, item in backlog:
+            chats.setdefault(chat_id, []).append(item)
+
+        async def send_all(items):
+            for i, _ in enumerate(items):
+                await model_sleep(SEND_LATENCY)
+                if i < len(items) - 1:
+                    await model_sleep(3.0)
+        started = model_clock()
+        await asyncio.gather(*(send_all(items) for items in chats.values()))
+        return model_clock() - started
+
+    async def scheduled(backlog):
+        limiter = TelegramRateLimiter(clock=model_clock, sleep=model_sleep)
+        order: Dict[Tuple[str, int], List[Tuple[str, int]]] = {}
+
+        async def deliver(items):
+            item = items[0]
+            await limiter.acquire('bot', item.user_key[4:], item.topic_id)
+            await model_sleep(SEND_LATENCY)
+            order.setdefault((item.user_key, item.topic_id), []).append(item.sort_key)
+
+        scheduler = DeliveryScheduler(limiter, deliver)
+        started = model_clock()
+        for chat_id, item in backlog:
+            scheduler.submit(('bot', chat_id), item)
+        await scheduler.join()
+        assert all(keys == sorted(keys) for keys in order.values()), "нарушен порядок внутри топика"
+        return model_clock() - started
+
+    async def burst(articles, digest):
+        """Всплеск одного источника в один топик: (сообщений, секунд до последней статьи)"""
+        from outputs.telegram_sender import format_digest_entry
+
+        limiter = TelegramRateLimiter(clock=model_clock, sleep=model_sleep)
+        messages = []
+
+        async def deliver(items):
+            await limiter.acquire('bot', '-1001', 5)
+            await model_sleep(SEND_LATENCY)
+            messages.append(len(items))
+
+        scheduler = DeliveryScheduler(limiter, deliver)
+        started = model_clock()
+        for article_id in range(articles):
+            title = f'ТАСС: срочное сообщение номер {article_id} о ходе событий в регионе и реакции властей'
+            entry = format_digest_entry(title, f'https://tass.ru/proisshestviya/{20000000 + article_id}')
+            scheduler.submit(('bot', '-1001'), DeliveryItem(
+                ('2025-01-01', article_id), 'user', article_id, 5, '', 0, digest, entry
+            ))
+        await scheduler.join()
+        assert sum(messages) == articles
+        return len(messages), model_clock() - started
+
+    async def run_simulation():
+        print(f"🧪 Доставка {ARTICLES} статей по {TOPICS} топикам (время модели, секунды)")
+        for chats in (1, 2, 5, 10):
+            backlog = build_backlog(chats)
+            old_time = await sequential(backlog)
+            new_time = await scheduled(backlog)
+            print(f"   {chats:2d} чат(ов): последовательно с паузой 3с {old_time:6.1f} | воркеры по чатам {new_time:6.1f}")
+
+        print("🧪 Всплеск источника в один топик: по статье vs дайджест (сообщений / секунд)")
+        for articles in (5, 40, 120):
+            single = await burst(articles, None)
+            digest = await burst(articles, DigestConfig(min_articles=5, max_wait_seconds=60))
+            print(f"   {articles:3d} статей: по одной {single[0]:3d} / {single[1]:6.1f} | дайджест {digest[0]:3d} / {digest[1]:6.1f}")
+
+    asyncio.run(run_simulation())
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+RSS Media Bus - Лимиты отправки в Telegram
+Token bucket на бота (все чаты одного токена), на чат и на топик супергруппы.
+Лимиты общие для всех подписчиков с одним токеном и подстраиваются по ответам 429 (retry_after)
+"""
+
+import time
+import asyncio
+from typing import Dict, Optional, Tuple
+
+from core.rate_limit import TokenBucket
+from config import (
+    TELEGRAM_BOT_MESSAGES_PER_SECOND, TELEGRAM_BOT_BURST,
+    TELEGRAM_GROUP_MESSAGES_PER_MINUTE, TELEGRAM_GROUP_BURST,
+    TELEGRAM_PRIVATE_MESSAGES_PER_SECOND, TELEGRAM_PRIVATE_BURST,
+    TELEGRAM_TOPIC_MESSAGES_PER_MINUTE, TELEGRAM_TOPIC_BURST,
+    TELEGRAM_RATE_BACKOFF, TELEGRAM_RATE_RECOVERY, TELEGRAM_RATE_MIN_FRACTION
+)
+
+# Паузы короче этого считаются нулевыми (погрешность float при пополнении bucket'а)
+WAIT_EPSILON = 1e-6
+
+
+def per_minute_rate(limit_per_minute: float, burst: float) -> float:
+    """
+    Скорость пополнения bucket'а (в секунду) для лимита «limit сообщений за любые 60 секунд»:
+    за окно уходит весь запас плюс пополнение, поэтому rate * 60 + burst <= limit
+    """
+    return (limit_per_minute - burst) / 60
+
+
+def is_group_chat(chat_id) -> bool:
+    """Группы и каналы в Bot API имеют отрицательный chat_id"""
+    return str(chat_id).startswith('-')
+
+
+class TelegramRateLimiter:
+    """
+    Допуск сообщения: токен должен быть во всех трех bucket'ах (бот, чат, топик) одновременно,
+    списываются они вместе - ожидание в одном чате не расходует лимит бота впустую.
+    Запас bucket'ов входит в лимит окна, поэтому 429 означает, что лимит сервера ниже настроенного:
+    чат блокируется на retry_after, запас сбрасывается, скорость снижается. Успешные отправки
+    медленно возвращают скорость к исходной (запас - после нее), так что обученная скорость
+    держится ниже лимита сервера.
+    """
+
+    def __init__(self, clock=time.monotonic, sleep=asyncio.sleep):
+        self.clock = clock
+        self.sleep = sleep
+        self.bot_buckets: Dict[str, TokenBucket] = {}
+        self.chat_buckets: Dict[Tuple[str, str], TokenBucket] = {}
+        self.topic_buckets: Dict[Tuple[str, str, int], TokenBucket] = {}
+        # Исходный лимит чата (сообщений в секунду, запас) - к нему возвращается обученный лимит
+        self.chat_limits: Dict[Tuple[str, str], Tuple[float, float]] = {}
+        self.rate_limited = 0
+
+    def _bot_bucket(self, bot_token: str) -> TokenBucket:
+        bucket = self.bot_buckets.get(bot_token)
+        if bucket is None:
+            bucket = self.bot_buckets[bot_token] = TokenBucket(
+                TELEGRAM_BOT_MESSAGES_PER_SECOND, TELEGRAM_BOT_BURST, clock=self.clock
+            )
+        return bucket
+
+    def _chat_bucket(self, bot_token: str, chat_id) -> TokenBucket:
+        key = (bot_token, str(chat_id))
+        bucket = self.chat_buckets.get(key)
+        if bucket is None:
+            if is_group_chat(chat_id):
+                burst = TELEGRAM_GROUP_BURST
+                rate = per_minute_rate(TELEGRAM_GROUP_MESSAGES_PER_MINUTE, burst)
+            else:
+                rate, burst = TELEGRAM_PRIVATE_MESSAGES_PER_SECOND, TELEGRAM_PRIVATE_BURST
+            bucket = self.chat_buckets[key] = TokenBucket(rate, burst, clock=self.clock)
+            self.chat_limits[key] = (rate, burst)
+        return bucket
+
+    def _topic_bucket(self, bot_token: str, chat_id, topic_id: Optional[int]) -> Optional[TokenBucket]:
+        if not topic_id:
+            return None
+        key = (bot_token, str(chat_id), topic_id)
+        bucket = self.topic_buckets.get(key)
+        if bucket is None:
+            bucket = self.topic_buckets[key] = TokenBucket(
+                per_minute_rate(TELEGRAM_TOPIC_MESSAGES_PER_MINUTE, TELEGRAM_TOPIC_BURST),
+                TELEGRAM_TOPIC_BURST, clock=self.clock
+            )
+        return bucket
+
+    def _buckets(self, bot_token: str, chat_id, topic_id: Optional[int]):
+        buckets = [self._bot_bucket(bot_token), self._chat_bucket(bot_token, chat_id)]
+        topic_bucket = self._topic_bucket(bot_token, chat_id, topic_id)
+        if topic_bucket is not None:
+            buckets.append(topic_bucket)
+        return buckets
+
+    def delay(self, bot_token: str, chat_id, topic_id: Optional[int] = None) -> float:
+        """Через сколько секунд можно отправить сообщение (0 - сейчас)"""
+        return max(bucket.delay() for bucket in self._buckets(bot_token, chat_id, topic_id))
+
+    def try_acquire(self, bot_token: str, chat_id, topic_id: Optional[int] = None) -> float:
+        """Списать токены, если сообщение можно отправить сейчас; иначе - пауза до повторной попытки"""
+        buckets = self._buckets(bot_token, chat_id, topic_id)
+        wait = max(bucket.delay() for bucket in buckets)
+        if wait <= WAIT_EPSILON:
+            for bucket in buckets:
+                bucket.reserve()
+            return 0.0
+        return wait
+
+    async def acquire(self, bot_token: str, chat_id, topic_id: Optional[int] = None):
+        """Дождаться допуска сообщения в чат/топик"""
+        while True:
+            wait = self.try_acquire(bot_token, chat_id, topic_id)
+            if wait <= 0:
+                return
+            await self.sleep(wait)
+
+    def on_rate_limited(self, bot_token: str, chat_id, retry_after: float):
+        """Ответ 429: чат молчит retry_after секунд, его лимит снижается"""
+        self.rate_limited += 1
+        key = (bot_token, str(chat_id))
+        bucket = self._chat_bucket(bot_token, chat_id)
+        base_rate, _ = self.chat_limits[key]
+        bucket.block(retry_after)
+        bucket.rate = max(base_rate * TELEGRAM_RATE_MIN_FRACTION, bucket.rate * TELEGRAM_RATE_BACKOFF)
+        bucket.burst = 1
+
+    def on_sent(self, bot_token: str, chat_id):
+        """Успешная отправка: обученный лимит чата понемногу возвращается к исходному"""
+        key = (bot_token, str(chat_id))
+        bucket = self.chat_buckets.get(key)
+        if bucket is None:
+            return
+        base_rate, base_burst = self.chat_limits[key]
+        if bucket.rate < base_rate:
+            bucket.rate = min(base_rate, bucket.rate + base_rate * TELEGRAM_RATE_RECOVERY)
+        elif bucket.burst < base_burst:
+            bucket.burst = min(base_burst, bucket.burst + base_burst * TELEGRAM_RATE_RECOVERY)
+
+    def get_stats(self) -> Dict:
+        return {
+            'bots': len(self.bot_buckets),
+            'chats': len(self.chat_buckets),
+            'topics': len(self.topic_buckets),
+            'rate_limited': self.rate_limited,
+            'throttled_chats': sorted(
+                key[1] for key, bucket in self.chat_buckets.items()
+                if (bucket.rate, bucket.burst) < self.chat_limits[key]
+            )
+        }
+
+
+# Моделирование на виртуальных часах: python3 -m outputs.telegram_rate_limit
+if __name__ == "__main__":
+    import heapq
+    import random
+    from collections import deque
+
+    ARTICLES = 500
+    SEND_LATENCY = 0.15  # время ответа sendMessage (секунды)
+
+    class SimulatedClock:
+        def __init__(self):
+            self.now = 0.0
+
+        def __call__(self):
+            return self.now
+
+    class SimulatedTelegram:
+        """Сервер со скользящим окном: не больше limit сообщений в чат за 60 секунд и 30 в секунду на бота"""
+
+        def __init__(self, clock, group_limit_per_minute):
+            self.clock = clock
+            self.group_limit = group_limit_per_minute
+            self.windows: Dict[str, deque] = {}
+
+        def _admit(self, key, limit, period) -> Optional[float]:
+            window = self.windows.setdefault(key, deque())
+            now = self.clock()
+            while window and window[0] <= now - period:
+                window.popleft()
+            if len(window) >= limit:
+                return max(1, int(window[0] + period - now) + 1)
+            window.append(now)
+            return None
+
+        def send(self, chat_id) -> Optional[float]:
+            """None - отправлено, иначе retry_after"""
+            return self._admit('bot', 30, 1.0) or self._admit(chat_id, self.group_limit, 60.0)
+
+    def build_queues(articles, subscribers, chats):
+        """Очереди подписчиков со статьями по топикам; несколько подписчиков могут писать в один чат"""
+        rng = random.Random(22)
+        queues = {(f'user{n}', f'-100{n % chats}'): deque() for n in range(subscribers)}
+        for _ in range(articles):
+            queues[rng.choice(list(queues))].append(rng.randrange(1, 6) * 10)
+        return queues
+
+    def drain(queues, server_limit, limiter=None):
+        """
+        Воркер на подписчика. Без лимитера - как раньше: пауза 3 секунды после каждого сообщения
+        и ожидание retry_after при 429. Возвращает (минуты до опустошения очередей, число 429)
+        """
+        clock = SimulatedClock()
+        server = SimulatedTelegram(clock, server_limit)
+        if limiter is not None:
+            limiter = TelegramRateLimiter(clock=clock)
+        queues = {key: deque(queue) for key, queue in queues.items()}
+        events = [(0.0, key) for key in queues if queues[key]]
+        heapq.heapify(events)
+        finished, rate_limited = 0.0, 0
+        while events:
+            clock.now, key = heapq.heappop(events)
+            _, chat_id = key
+            if limiter is not None:
+                wait = limiter.try_acquire('bot', chat_id, queues[key][0])
+                if wait > 0:
+                    heapq.heappush(events, (clock.now + wait, key))
+                    continue
+            retry_after = server.send(chat_id)
+            pause = SEND_LATENCY
+            if retry_after is None:
+                queues[key].popleft()
+                finished = clock.now + SEND_LATENCY
+                if limiter is not None:
+                    limiter.on_sent('bot', chat_id)
+                else:
+                    pause += 3.0
+            else:
+                rate_limited += 1
+                if limiter is not None:
+                    limiter.on_rate_limited('bot', chat_id, retry_after)
+                else:
+                    pause += retry_after
+            if queues[key]:
+                heapq.heappush(events, (clock.now + pause, key))
+        return finished / 60, rate_limited
+
+    def lower_bound(queues, server_limit):
+        """Минимум времени при лимите сервера: самый загруженный чат, server_limit сообщений в минуту"""
+        per_chat = {}
+        for (_, chat_id), queue in queues.items():
+            per_chat[chat_id] = per_chat.get(chat_id, 0) + len(queue)
+        return max(0, (max(per_chat.values()) - 1) // server_limit)
+
+    print("🧪 Отправка очереди статей одним ботом (виртуальные часы; минуты / число ответов 429)")
+    scenarios = (
+        (1, 1, 'один подписчик'),
+        (4, 1, '4 подписчика в одном чате'),
+        (10, 10, '10 подписчиков в своих чатах'),
+        (30, 10, '30 подписчиков в 10 чатах'),
+    )
+    # Лимит сервера ниже настроенного показывает обучение на 429; при настроенном лимите 429 нет
+    # и в общих чатах (запас входит в лимит окна)
+    for articles, server_limit in ((ARTICLES, TELEGRAM_GROUP_MESSAGES_PER_MINUTE),
+                                   (ARTICLES, TELEGRAM_GROUP_MESSAGES_PER_MINUTE // 2),
+                                   (60, TELEGRAM_GROUP_MESSAGES_PER_MINUTE)):
+        print(f"📋 {articles} статей, сервер: {server_limit} сообщений в минуту на чат")
+        for subscribers, chats, title in scenarios:
+            queues = build_queues(articles, subscribers, chats)
+            fixed_time, fixed_429 = drain(queues, server_limit)
+            limiter_time, limiter_429 = drain(queues, server_limit, limiter=True)
+            print(f"   {title:30s} минимум {lower_bound(queues, server_limit):4d} | "
+                  f"пауза 3с {fixed_time:6.1f} / {fixed_429:4d} | лимитер {limiter_time:6.1f} / {limiter_429:4d}")
@@ -3,7 +3,50 @@ import json
 import time
 import re
 import html
-from config import REQUEST_TIMEOUT
+import asyncio
+import aiohttp
+from typing import Dict
+from config import REQUEST_TIMEOUT, TELEGRAM_CONNECTIONS_PER_BOT, TELEGRAM_MESSAGE_LIMIT
+from outputs.telegram_rate_limit import TelegramRateLimiter
+
+def format_article_message(title, link, description, categories):
+    """Статья в упрощенном формате: заголовок + полное описание + теги + ссылка (HTML)"""
+    message_parts = []
+    
+    # 1. ЗАГОЛОВОК (жирным)
+    message_parts.append(f"<b>{title}</b>")
+    message_parts.append("")  # Пустая строка
+    
+    # 2. ПОЛНОЕ ОПИСАНИЕ из RSS (без сокращений)
+    if description:
+        # Очищаем HTML теги и декодируем HTML-сущности
+        clean_description = re.sub(r'<[^>]+>', '', description)
+        
+        # Декодируем HTML-сущности (&mdash; → —, &laquo; → «, etc)
+        clean_description = html.unescape(clean_description)
+        
+        # Дополнительная очистка
+        clean_description = clean_description.replace('[continued]', '')
+        clean_description = clean_description.strip()
+        
+        if clean_description:
+            message_parts.append(clean_description)
+            message_parts.append("")  # Пустая строка
+    
+    # 3. ТЕГИ (все категории)
+    if categories:
+        tags_str = " ".join([f"#{cat.replace(' ', '_').replace('&', 'and')}" for cat in categories])
+        message_parts.append(f"🏷️ {tags_str}")
+    else:
+        message_parts.append("🏷️ #без_категории")
+    
+    # 4. ССЫЛКА на материал
+    if link:
+        message_parts.append("")  # Пустая строка
+        message_parts.append(f"🔗 {link}")
+    
+    # Собираем финальное сообщение
+    return "\n".join(message_parts)
 
 class TelegramSender:
     def __init__(self, bot_token, chat_id, topic_id=None):
@@ -109,43 +152,7 @@ class TelegramSender:
     def send_article(self, title, link, description, keywords, categories, source, topic_id=None, article_data=None):
         """Отправка статьи в упрощенном формате: заголовок + полное описание + теги"""
         try:
-            message_parts = []
-            
-            # 1. ЗАГОЛОВОК (жирным)
-            message_parts.append(f"<b>{title}</b>")
-            message_parts.append("")  # Пустая строка
-            
-            # 2. ПОЛНОЕ ОПИСАНИЕ из RSS (без сокращений)
-            if description:
-                # Очищаем HTML теги и декодируем HTML-сущности
-                clean_description = re.sub(r'<[^>]+>', '', description)
-                
-                # Декодируем HTML-сущности (&mdash; → —, &laquo; → «, etc)
-                clean_description = html.unescape(clean_description)
-                
-                # Дополнительная очистка
-                clean_description = clean_description.replace('[continued]', '')
-                clean_description = clean_description.strip()
-                
-                if clean_description:
-                    message_parts.append(clean_description)
-                    message_parts.append("")  # Пустая строка
-            
-            # 3. ТЕГИ (все категории)
-            if categories:
-                tags_str = " ".join([f"#{cat.replace(' ', '_').replace('&', 'and')}" for cat in categories])
-                message_parts.append(f"🏷️ {tags_str}")
-            else:
-                message_parts.append("🏷️ #без_категории")
-            
-            # 4. ССЫЛКА на материал
-            if link:
-                message_parts.append("")  # Пустая строка
-                message_parts.append(f"🔗 {link}")
-            
-            # Собираем финальное сообщение
-            message = "\n".join(message_parts)
-            
+            message = format_article_message(title, link, description, categories)
             return self.send_message(message, topic_id=topic_id, parse_mode='HTML')
             
         except Exception as e:
@@ -214,4 +221,152 @@ class TelegramSender:
             
         except Exception as e:
             print(f"⚠️ Не удалось получить информацию о топике: {e}")
-            return None
\ No newline at end of file
+            return None
+
+
+def format_digest_entry(title, link):
+    """Строка статьи в дайджесте: заголовок-ссылка (заголовок экранируется - одна ошибка разметки сорвала бы весь дайджест)"""
+    title = html.escape(html.unescape(title or 'Без заголовка'), quote=False)
+    if link:
+        return f'• <a href="{html.escape(link)}">{title}</a>'
+    return f"• {title}"
+
+def format_digest_message(entries):
+    """Дайджест: заголовок с числом материалов и строки статей (HTML)"""
+    return f"📰 <b>Дайджест: {len(entries)}</b>\n\n" + "\n\n".join(entries)
+
+def pack_digest(entries, limit=TELEGRAM_MESSAGE_LIMIT):
+    """Сколько первых строк помещается в одно сообщение дайджеста (минимум одна)"""
+    count, size = 1, len(format_digest_message(entries[:1]))
+    for entry in entries[1:]:
+        # Разделитель, строка и, возможно, лишняя цифра в счетчике заголовка
+        size += 2 + len(entry) + len(str(count + 1)) - len(str(count))
+        if size > limit:
+            break
+        count += 1
+    return count
+
+
+class AsyncTelegramSender:
+    """
+    Неблокирующая отправка в Telegram для asyncio сервисов (User Notification Service).
+    Одна aiohttp сессия с пулом keep-alive соединений на токен бота; темп задают общие
+    лимиты бота, чата и топика - пока один чат ждет, остальные продолжают отправку.
+    """
+    
+    # bot_token -> общая сессия всех чатов этого бота
+    _sessions: Dict[str, aiohttp.ClientSession] = {}
+    
+    # Лимиты Telegram общие для всех подписчиков (одинаковый токен - один bucket бота)
+    limiter = TelegramRateLimiter()
+    
+    def __init__(self, bot_token, chat_id, topic_id=None):
+        self.bot_token = bot_token
+        self.chat_id = chat_id
+        self.topic_id = topic_id  # ID топика для отправки сообщений
+        self.base_url = f"https://api.telegram.org/bot{bot_token}"
+    
+    def _get_session(self):
+        session = self._sessions.get(self.bot_token)
+        if session is None or session.closed:
+            session = self._sessions[self.bot_token] = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT),
+                connector=aiohttp.TCPConnector(limit=TELEGRAM_CONNECTIONS_PER_BOT)
+            )
+        return session
+    
+    @classmethod
+    async def close_all(cls):
+        """Закрытие сессий всех ботов при остановке сервиса"""
+        for session in cls._sessions.values():
+            if not session.closed:
+                await session.close()
+        cls._sessions.clear()
+    
+    async def _post(self, method, data):
+        """(HTTP статус, JSON ответа) запроса к Bot API"""
+        async with self._get_session().post(f"{self.base_url}/{method}", json=data) as response:
+            try:
+                payload = await response.json(content_type=None)
+            except (aiohttp.ContentTypeError, json.JSONDecodeError):
+                payload = {}
+            return response.status, payload or {}
+    
+    async def send_message(self, text, topic_id=None, parse_mode=None):
+        """
+        Отправка сообщения в Telegram с неблокирующей обработкой rate limiting
+        
+        Args:
+            text: Текст сообщения
+            topic_id: ID топика (переопределяет self.topic_id)
+            parse_mode: Режим парсинга ('HTML', 'Markdown' или None)
+        """
+        max_retries = 2
+        retry_count = 0
+        
+        data = {
+            "chat_id": self.chat_id,
+            "text": text,
+            "disable_web_page_preview": True
+        }
+        
+        # Режим парсинга
+        if parse_mode:
+            data["parse_mode"] = parse_mode
+        
+        # Определяем ID топика (приоритет у параметра)
+        target_topic_id = topic_id if topic_id is not None else self.topic_id
+        if target_topic_id:
+            data["message_thread_id"] = target_topic_id
+        
+        while retry_count < max_retries:
+            try:
+                await self.limiter.acquire(self.bot_token, self.chat_id, target_topic_id)
+                status, error_info = await self._post("sendMessage", data)
+                
+                if status == 200:
+                    self.limiter.on_sent(self.bot_token, self.chat_id)
+                    return True
+                elif status == 429:
+                    # Rate limiting - чат блокируется на retry_after, следующий acquire дождется без блокировки других чатов
+                    retry_after = error_info.get('parameters', {}).get('retry_after', 10)
+                    print(f"⏳ Rate limit #{retry_count + 1} для чата {self.chat_id}. Ожидание {retry_after} секунд...")
+                    self.limiter.on_rate_limited(self.bot_token, self.chat_id, retry_after)
+                    
+                    retry_count += 1
+                    continue
+                else:
+                    error_description = error_info.get('description', 'Неизвестная ошибка')
+                    
+                    # Специальная обработка ошибок топиков
+                    if 'message thread not found' in error_description.lower() and 'message_thread_id' in data:
+                        print(f"❌ Топик {target_topic_id} не найден, отправляю в общий чат")
+                        # Повторяем без топика через тот же цикл: лимитер, 429 и on_sent обрабатываются как обычно
+                        data.pop('message_thread_id')
+                        target_topic_id = None
+                        continue
+                    
+                    print(f"❌ Ошибка отправки: {error_description}")
+                    return False
+                    
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                print(f"❌ Ошибка отправки сообщения (попытка {retry_count + 1}): {e}")
+                retry_count += 1
+                if retry_count < max_retries:
+                    await asyncio.sleep(2)  # Короткая задержка при сетевых ошибках
+                    
+        print(f"❌ Не удалось отправить сообщение после {max_retries} попыток")
+        return False
+    
+    async def send_article(self, title, link, description, keywords, categories, source, topic_id=None, article_data=None):
+        """Отправка статьи в том же формате, что и TelegramSender.send_article"""
+        try:
+            message = format_article_message(title, link, description, categories)
+        except Exception as e:
+            print(f"❌ Ошибка формирования сообщения: {e}")
+            return False
+        return await self.send_message(message, topic_id=topic_id, parse_mode='HTML')
+    
+    async def send_digest(self, entries, topic_id=None):
+        """Отправка нескольких статей одним сообщением (строки format_digest_entry)"""
+        return await self.send_message(format_digest_message(entries), topic_id=topic_id, parse_mode='HTML')
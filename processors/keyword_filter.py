@@ -20,45 +20,125 @@ class FilterMode(Enum):
     PRIORITY = "priority"          # Приоритетные + обычные (с пометками)
     SMART = "smart"                # Умная фильтрация (ML подобная)
 
+# Длина префикса слова в ключе корзины кандидатов
+CANDIDATE_PREFIX_LENGTH = 3
+
+# re.IGNORECASE считает ı (турецкая i без точки) равной i/I, а casefold() - нет
+SRE_CASE_FIXES = str.maketrans({'ı': 'i'})
+
+def _trie_pattern(words: List[str]) -> str:
+    """Префиксное дерево слов одним регексом: в каждой позиции проверяется одна ветка, а не все слова"""
+    trie: Dict[str, Any] = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+    
+    def build(node: Dict[str, Any]) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if '' in node:
+            branches.append(r'\b')
+        return branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+    
+    return build(trie)
+
 class KeywordMatcher:
-    """Продвинутый матчер ключевых слов"""
+    """
+    Продвинутый матчер ключевых слов.
+    Один проход по тексту находит позиции, с которых может совпасть хоть одно слово (слова без
+    wildcards объединены в префиксное дерево); в позиции проверяются только слова с подходящим
+    префиксом. Счетчики по словам те же, что у findall отдельного шаблона.
+    """
     
     def __init__(self, keywords: List[str], case_sensitive: bool = False):
         self.keywords = keywords
         self.case_sensitive = case_sensitive
+        flags = 0 if case_sensitive else re.IGNORECASE
         
         # Компилируем регексы для производительности
         self.compiled_patterns = []
-        for keyword in keywords:
+        literal_keywords = []
+        wildcard_patterns = []
+        # Корзины кандидатов: (длина, префикс) -> индексы слов; слова без префикса проверяются везде
+        self.buckets: Dict[Tuple[int, str], List[int]] = {}
+        self.always: List[int] = []
+        for index, keyword in enumerate(keywords):
             # Поддержка wildcards: * и ?
             if '*' in keyword or '?' in keyword:
                 regex_pattern = keyword.replace('*', '.*').replace('?', '.')
-                flags = 0 if case_sensitive else re.IGNORECASE
-                self.compiled_patterns.append(re.compile(regex_pattern, flags))
+                wildcard_patterns.append(regex_pattern)
+                # Префикс до wildcard - буквальный, только если в нем нет символов регекса
+                prefix = re.split(r'[*?]', keyword)[0]
+                if re.escape(prefix) != prefix:
+                    prefix = ''
             else:
                 # Простое совпадение слов (границы слов)
-                escaped = re.escape(keyword)
-                pattern = r'\b' + escaped + r'\b'
-                flags = 0 if case_sensitive else re.IGNORECASE
-                self.compiled_patterns.append(re.compile(pattern, flags))
+                regex_pattern = r'\b' + re.escape(keyword) + r'\b'
+                literal_keywords.append(keyword)
+                prefix = keyword
+            self.compiled_patterns.append(re.compile(regex_pattern, flags))
+            
+            if prefix:
+                length = min(len(prefix), CANDIDATE_PREFIX_LENGTH)
+                self.buckets.setdefault((length, self._fold(prefix[:length])), []).append(index)
+            else:
+                self.always.append(index)
+        self.prefix_lengths = sorted({length for length, _ in self.buckets})
+        
+        # Позиции, с которых совпадает хотя бы одно слово
+        self.combined_pattern = None
+        alternatives = wildcard_patterns[:]
+        if literal_keywords:
+            alternatives.insert(0, r'\b' + _trie_pattern(literal_keywords))
+        if alternatives:
+            self.combined_pattern = re.compile('(?=' + '|'.join(f'(?:{pattern})' for pattern in alternatives) + ')', flags)
+    
+    def _fold(self, text: str) -> str:
+        # casefold()[:1] с поправкой SRE_CASE_FIXES объединяет все символы, которые re.IGNORECASE считает равными
+        if self.case_sensitive:
+            return text
+        return ''.join(char.casefold()[:1] for char in text).translate(SRE_CASE_FIXES)
+    
+    def count_matches(self, text: str) -> List[int]:
+        """Число непересекающихся совпадений каждого слова (как len(pattern.findall(text))) за один проход"""
+        counts = [0] * len(self.keywords)
+        if not self.combined_pattern:
+            return counts
+        # Как прежде, поиск идет по text.lower() (İ -> i + U+0307 меняет совпадения)
+        if not self.case_sensitive:
+            text = text.lower()
+        
+        # Следующее совпадение слова засчитывается не раньше конца предыдущего;
+        # после пустого совпадения - только непустое в той же позиции (правила findall)
+        next_start = [0] * len(self.keywords)
+        after_empty = [False] * len(self.keywords)
+        
+        for candidate in self.combined_pattern.finditer(text):
+            position = candidate.start()
+            indexes = list(self.always)
+            for length in self.prefix_lengths:
+                indexes += self.buckets.get((length, self._fold(text[position:position + length])), ())
+            
+            for index in indexes:
+                match = self.compiled_patterns[index].match(text, position)
+                if not match:
+                    continue
+                end = match.end()
+                if position < next_start[index] or (position == next_start[index] and after_empty[index] and position == end):
+                    continue
+                counts[index] += 1
+                next_start[index] = end
+                after_empty[index] = position == end
+        return counts
     
     def find_matches(self, text: str) -> List[Tuple[str, int]]:
         """Находит совпадения и возвращает (keyword, count) для каждого"""
-        matches = []
-        text_to_search = text if self.case_sensitive else text.lower()
-        
-        for i, pattern in enumerate(self.compiled_patterns):
-            keyword = self.keywords[i]
-            found_matches = pattern.findall(text_to_search)
-            if found_matches:
-                matches.append((keyword, len(found_matches)))
-        
-        return matches
+        return [(keyword, count) for keyword, count in zip(self.keywords, self.count_matches(text)) if count]
     
     def get_match_score(self, text: str) -> int:
         """Возвращает общий счет совпадений"""
-        matches = self.find_matches(text)
-        return sum(count for _, count in matches)
+        return sum(self.count_matches(text))
 
 class AdvancedKeywordFilter:
     """Продвинутый фильтр по ключевым словам"""
@@ -90,10 +170,15 @@ class AdvancedKeywordFilter:
         self.smart_categories = config.get('smart_categories', [])
         self.boost_multiplier = config.get('boost_multiplier', 2.0)
         
-        # Создаем матчеры
-        self.main_matcher = KeywordMatcher(self.keywords, self.case_sensitive) if self.keywords else None
-        self.priority_matcher = KeywordMatcher(self.priority_keywords, self.case_sensitive) if self.priority_keywords else None
-        self.exclude_matcher = KeywordMatcher(self.exclude_keywords, self.case_sensitive) if self.exclude_keywords else None
+        # Один матчер на все группы слов: обычные, приоритетные и исключающие - за один проход по тексту
+        self.matcher = KeywordMatcher(self.keywords + self.priority_keywords + self.exclude_keywords, self.case_sensitive)
+        main_end = len(self.keywords)
+        priority_end = main_end + len(self.priority_keywords)
+        self.groups = {
+            'main': slice(0, main_end),
+            'priority': slice(main_end, priority_end),
+            'exclude': slice(priority_end, None)
+        }
         
         logger.info(f"🔍 AdvancedKeywordFilter создан: режим={self.mode.value}, keywords={len(self.keywords)}")
     
@@ -108,6 +193,7 @@ class AdvancedKeywordFilter:
         
         # Извлекаем текст для анализа
         article_text = self._extract_text(article)
+        matches = self._find_matches(article_text)
         
         # Базовые метаданные
         metadata = {
@@ -121,8 +207,8 @@ class AdvancedKeywordFilter:
         }
         
         # Проверяем исключающие ключевые слова
-        if self.exclude_matcher:
-            exclude_matches = self.exclude_matcher.find_matches(article_text)
+        if self.exclude_keywords:
+            exclude_matches = matches['exclude']
             if exclude_matches:
                 metadata['excluded_keywords'] = [kw for kw, _ in exclude_matches]
                 metadata['filter_reason'] = f"Исключено по ключевым словам: {', '.join(metadata['excluded_keywords'])}"
@@ -134,16 +220,16 @@ class AdvancedKeywordFilter:
             return True, metadata
         
         elif self.mode == FilterMode.INCLUDE:
-            return self._filter_include_mode(article_text, metadata)
+            return self._filter_include_mode(matches, metadata)
         
         elif self.mode == FilterMode.EXCLUDE:
-            return self._filter_exclude_mode(article_text, metadata)
+            return self._filter_exclude_mode(matches, metadata)
         
         elif self.mode == FilterMode.PRIORITY:
-            return self._filter_priority_mode(article_text, metadata)
+            return self._filter_priority_mode(matches, metadata)
         
         elif self.mode == FilterMode.SMART:
-            return self._filter_smart_mode(article, article_text, metadata)
+            return self._filter_smart_mode(article, matches, metadata)
         
         else:
             metadata['filter_reason'] = "Неизвестный режим фильтрации"
@@ -159,13 +245,21 @@ class AdvancedKeywordFilter:
         
         return ' '.join(text_parts)
     
-    def _filter_include_mode(self, text: str, metadata: Dict) -> Tuple[bool, Dict]:
+    def _find_matches(self, text: str) -> Dict[str, List[Tuple[str, int]]]:
+        """(keyword, count) по группам слов: main, priority, exclude"""
+        counts = self.matcher.count_matches(text)
+        return {
+            group: [(keyword, count) for keyword, count in zip(self.matcher.keywords[span], counts[span]) if count]
+            for group, span in self.groups.items()
+        }
+    
+    def _filter_include_mode(self, matches: Dict, metadata: Dict) -> Tuple[bool, Dict]:
         """Режим включения: статья проходит если есть ключевые слова"""
-        if not self.main_matcher:
+        if not self.keywords:
             metadata['filter_reason'] = "Нет ключевых слов для включения"
             return True, metadata
         
-        matches = self.main_matcher.find_matches(text)
+        matches = matches['main']
         total_matches = sum(count for _, count in matches)
         
         metadata['matched_keywords'] = [kw for kw, _ in matches]
@@ -178,13 +272,13 @@ class AdvancedKeywordFilter:
             metadata['filter_reason'] = f"Недостаточно совпадений: {total_matches} < {self.min_matches}"
             return False, metadata
     
-    def _filter_exclude_mode(self, text: str, metadata: Dict) -> Tuple[bool, Dict]:
+    def _filter_exclude_mode(self, matches: Dict, metadata: Dict) -> Tuple[bool, Dict]:
         """Режим исключения: статья НЕ проходит если есть ключевые слова"""
-        if not self.main_matcher:
+        if not self.keywords:
             metadata['filter_reason'] = "Нет ключевых слов для исключения"
             return True, metadata
         
-        matches = self.main_matcher.find_matches(text)
+        matches = matches['main']
         total_matches = sum(count for _, count in matches)
         
         metadata['matched_keywords'] = [kw for kw, _ in matches]
@@ -197,19 +291,17 @@ class AdvancedKeywordFilter:
             metadata['filter_reason'] = f"Нет исключающих совпадений"
             return True, metadata
     
-    def _filter_priority_mode(self, text: str, metadata: Dict) -> Tuple[bool, Dict]:
+    def _filter_priority_mode(self, matches: Dict, metadata: Dict) -> Tuple[bool, Dict]:
         """Режим приоритета: приоритетные статьи + обычные с пометками"""
         # Проверяем приоритетные ключевые слова
-        priority_matches = []
-        if self.priority_matcher:
-            priority_matches = self.priority_matcher.find_matches(text)
+        priority_matches = matches['priority']
+        if self.priority_keywords:
             metadata['priority_keywords'] = [kw for kw, _ in priority_matches]
             metadata['is_priority'] = len(priority_matches) > 0
         
         # Проверяем обычные ключевые слова
-        regular_matches = []
-        if self.main_matcher:
-            regular_matches = self.main_matcher.find_matches(text)
+        regular_matches = matches['main']
+        if self.keywords:
             metadata['matched_keywords'] = [kw for kw, _ in regular_matches]
         
         total_priority = sum(count for _, count in priority_matches)
@@ -229,14 +321,15 @@ class AdvancedKeywordFilter:
             metadata['filter_reason'] = f"Недостаточно совпадений: {total_regular} обычных, {total_priority} приоритетных"
             return False, metadata
     
-    def _filter_smart_mode(self, article: Dict, text: str, metadata: Dict) -> Tuple[bool, Dict]:
+    def _filter_smart_mode(self, article: Dict, matches: Dict, metadata: Dict) -> Tuple[bool, Dict]:
         """Умная фильтрация с учетом категорий, источников и контекста"""
         score = 0
         reasons = []
+        priority_matches = matches['priority']
         
         # 1. Обычные ключевые слова
-        if self.main_matcher:
-            matches = self.main_matcher.find_matches(text)
+        if self.keywords:
+            matches = matches['main']
             keyword_score = sum(count for _, count in matches)
             score += keyword_score
             if matches:
@@ -244,8 +337,7 @@ class AdvancedKeywordFilter:
                 metadata['matched_keywords'] = [kw for kw, _ in matches]
         
         # 2. Приоритетные ключевые слова
-        if self.priority_matcher:
-            priority_matches = self.priority_matcher.find_matches(text)
+        if self.priority_keywords:
             priority_score = sum(count for _, count in priority_matches) * self.boost_multiplier
             score += priority_score
             if priority_matches:
@@ -393,4 +485,76 @@ if __name__ == "__main__":
     print(f"📊 Умный фильтр: {should_send}")
     print(f"   Причина: {metadata['filter_reason']}")
     print(f"   Счет: {metadata['match_score']}")
-    print(f"   Приоритет: {metadata['is_priority']}") 
\ No newline at end of file
+    print(f"   Приоритет: {metadata['is_priority']}")
+    
+    # Дифференциальная проверка: объединенный матчер против отдельного findall на каждое слово
+    import random
+    import time
+    
+    class LegacyKeywordMatcher:
+        """Прежний матчер: регекс и findall на каждое слово"""
+        
+        def __init__(self, keywords: List[str], case_sensitive: bool = False):
+            self.keywords = keywords
+            self.case_sensitive = case_sensitive
+            self.compiled_patterns = []
+            for keyword in keywords:
+                if '*' in keyword or '?' in keyword:
+                    regex_pattern = keyword.replace('*', '.*').replace('?', '.')
+                else:
+                    regex_pattern = r'\b' + re.escape(keyword) + r'\b'
+                flags = 0 if case_sensitive else re.IGNORECASE
+                self.compiled_patterns.append(re.compile(regex_pattern, flags))
+        
+        def find_matches(self, text: str) -> List[Tuple[str, int]]:
+            text_to_search = text if self.case_sensitive else text.lower()
+            matches = []
+            for keyword, pattern in zip(self.keywords, self.compiled_patterns):
+                found_matches = pattern.findall(text_to_search)
+                if found_matches:
+                    matches.append((keyword, len(found_matches)))
+            return matches
+    
+    rng = random.Random(19)
+    vocabulary = ['нефть', 'нефтяник', 'Газ', 'газпром', 'закон', 'Закон о связи', 'ЦБ', 'ставка',
+                  'oil', 'Oil price', 'AI', 'ai-модель', 'c++', 'ёлка', 'елка', 'срочно', 'в', 'и',
+                  # Символы, у которых классы регистра re и str.casefold() расходятся или lower() меняет длину
+                  'ıa', 'Ia', 'İstanbul', 'istanbul', 'ISTANBUL', 'ıı', 'straße', 'STRASSE', 'ſtop', 'Kelvin',
+                  'σοφία', 'ΣΟΦΙΑΣ', 'µs', 'ﬁnal', 'ǅ', 'ǆ']
+    vocabulary += [''.join(rng.choice('абвгдежзклмнопрстaeiouıİIσςß') for _ in range(rng.randint(1, 7))) for _ in range(300)]
+    wildcards = ['нефт*', 'газ?ром', 'з*н', '*', 'ставк?', 'oil*price', 'c+*', 'e.g*', '?и']
+    separators = [' ', ' ', ' ', ', ', '. ', '\n', '-', ' (', ') ', ' «', '» ']
+    
+    def random_text(words):
+        parts = []
+        for _ in range(words):
+            word = rng.choice(vocabulary)
+            parts.append(rng.choice([word, word.upper(), word.capitalize()]) + rng.choice(separators))
+        return ''.join(parts)
+    
+    print("\n🧪 Дифференциальная проверка KeywordMatcher против findall по каждому слову")
+    checked = 0
+    for case_sensitive in (False, True):
+        for _ in range(300):
+            keywords = rng.sample(vocabulary, rng.randint(1, 30)) + rng.sample(wildcards, rng.randint(0, 2))
+            keywords += rng.sample(keywords, min(len(keywords), rng.randint(0, 2)))  # повторы слов
+            rng.shuffle(keywords)
+            new_matcher = KeywordMatcher(keywords, case_sensitive)
+            old_matcher = LegacyKeywordMatcher(keywords, case_sensitive)
+            for _ in range(5):
+                text = random_text(rng.randint(0, 200))
+                assert new_matcher.find_matches(text) == old_matcher.find_matches(text), (keywords, text)
+                checked += 1
+    print(f"✅ Результаты совпадают на {checked} текстах")
+    
+    print("\n⏱️ find_matches, мкс на статью (~1500 символов)")
+    texts = [random_text(250) for _ in range(50)]
+    for count in (10, 100, 1000):
+        keywords = [rng.choice(vocabulary) + str(i) if i >= len(vocabulary) else vocabulary[i] for i in range(count)]
+        results = []
+        for matcher in (LegacyKeywordMatcher(keywords), KeywordMatcher(keywords)):
+            started = time.perf_counter()
+            for text in texts:
+                matcher.find_matches(text)
+            results.append((time.perf_counter() - started) / len(texts) * 1e6)
+        print(f"   {count:5d} слов: findall по словам {results[0]:9.1f} | один проход {results[1]:9.1f}")
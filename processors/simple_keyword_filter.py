@@ -1,16 +1,19 @@
 #!/usr/bin/env python3
 """
 Простой фильтр ключевых слов для RSS Media Bus
-Базовая фильтрация по вхождению подстроки
+Базовая фильтрация по вхождению подстроки или по основам слов (с учетом словоформ, match: stems)
 """
 
 import logging
 from typing import Dict, List, Any, Tuple
 
+from processors.keyword_automaton import AUTOMATON_MIN_KEYWORDS, get_automaton
+from processors.text_normalizer import article_terms, keyword_stems
+
 logger = logging.getLogger(__name__)
 
 class SimpleKeywordFilter:
-    """Простой фильтр по ключевым словам - точное вхождение подстроки"""
+    """Простой фильтр по ключевым словам - точное вхождение подстроки или по началу основы слова"""
     
     def __init__(self, config: Dict[str, Any]):
         """
@@ -19,18 +22,32 @@ class SimpleKeywordFilter:
             "mode": "include|exclude|all",
             "keywords": ["слово1", "слово2"],
             "case_sensitive": false,
-            "fields": ["title", "description"]
+            "fields": ["title", "description"],
+            "match": "substring|stems"
         }
+        
+        substring (по умолчанию): вхождение подстроки; всегда используется при case_sensitive.
+        stems: ключевое слово - начало основы слова статьи, "экология" находит
+        "экологии", но "атом" не находит "автоматом"; у фраз должны встретиться все слова.
         """
         self.mode = config.get('mode', 'all')
         self.keywords = config.get('keywords', [])
         self.case_sensitive = config.get('case_sensitive', False)
         self.fields = config.get('fields', ['title', 'description'])
+        self.match = 'substring' if self.case_sensitive else config.get('match', 'substring')
         
         # Подготавливаем ключевые слова для поиска
         if not self.case_sensitive:
             self.keywords = [kw.lower() for kw in self.keywords]
         
+        # Основы ключевых слов: статья нормализуется один раз, фильтр только проверяет множество
+        self.keyword_stems = [keyword_stems(kw) for kw in self.keywords] if self.match == 'stems' else None
+        
+        # Большие наборы подстрок ищем автоматом Aho–Corasick за один проход (общий для одинаковых списков)
+        self.automaton = None
+        if self.match == 'substring' and len(self.keywords) >= AUTOMATON_MIN_KEYWORDS:
+            self.automaton = get_automaton(tuple(self.keywords))
+        
         logger.info(f"🔍 SimpleKeywordFilter: режим={self.mode}, ключевых слов={len(self.keywords)}")
     
     def filter_article(self, article: Dict[str, Any]) -> Tuple[bool, Dict[str, Any]]:
@@ -50,16 +67,23 @@ class SimpleKeywordFilter:
                 'filter_reason': 'Все новости разрешены'
             }
         
-        # Извлекаем текст из статьи
-        text = self._extract_text(article)
-        if not self.case_sensitive:
-            text = text.lower()
-        
         # Ищем совпадения ключевых слов
-        matched_keywords = []
-        for keyword in self.keywords:
-            if keyword in text:  # Простое вхождение подстроки
-                matched_keywords.append(keyword)
+        if self.keyword_stems is not None:
+            # Термины статьи из кэша записи (нормализованы при чтении из БД)
+            terms = article_terms(article, self.fields)
+            matched_keywords = [
+                keyword for keyword, stems in zip(self.keywords, self.keyword_stems)
+                if stems and all(stem in terms for stem in stems)
+            ]
+        elif self.automaton:
+            text = self._extract_text(article, lower=not self.case_sensitive)
+            matched_keywords = self.automaton.find_in_order(text, self.keywords)
+        else:
+            text = self._extract_text(article, lower=not self.case_sensitive)
+            matched_keywords = []
+            for keyword in self.keywords:
+                if keyword in text:  # Простое вхождение подстроки
+                    matched_keywords.append(keyword)
         
         # Метаданные для отладки
         metadata = {
@@ -92,7 +116,7 @@ class SimpleKeywordFilter:
         
         return should_send, metadata
     
-    def _extract_text(self, article: Dict[str, Any]) -> str:
+    def _extract_text(self, article: Dict[str, Any], lower: bool = False) -> str:
         """Извлекает текст из указанных полей статьи"""
         text_parts = []
         
@@ -100,9 +124,10 @@ class SimpleKeywordFilter:
             if field in article and article[field]:
                 text_parts.append(str(article[field]))
         
-        return ' '.join(text_parts)
+        text = ' '.join(text_parts)
+        return text.lower() if lower else text
 
-# Тестирование
+# Тестирование (из корня проекта): python3 -m processors.simple_keyword_filter
 if __name__ == "__main__":
     print("🧪 Тестирование SimpleKeywordFilter")
     
@@ -155,4 +180,18 @@ if __name__ == "__main__":
         status = "✅ ОТПРАВИТЬ" if should_send else "❌ ЗАБЛОКИРОВАТЬ"
         print(f"   {i}. '{article['title']}' → {status}")
         print(f"      Найдено: {metadata['matched_keywords']}")
-        print(f"      Причина: {metadata['filter_reason']}") 
\ No newline at end of file
+        print(f"      Причина: {metadata['filter_reason']}")
+    
+    # Тест словоформ: основы против подстроки
+    morphology_articles = [
+        {'title': 'Доклад об экологии Арктики', 'description': 'Экологи оценили ущерб'},
+        {'title': 'Матч закончился автоматом', 'description': 'Судья назначил пенальти'}
+    ]
+    
+    print("\n📊 Тест словоформ (ключевые слова: 'экология', 'атом'):")
+    for match in ('substring', 'stems'):
+        morphology_filter = SimpleKeywordFilter({'mode': 'include', 'keywords': ['экология', 'атом'], 'match': match})
+        for i, article in enumerate(morphology_articles, 1):
+            should_send, metadata = morphology_filter.filter_article(article)
+            status = "✅ ОТПРАВИТЬ" if should_send else "❌ ЗАБЛОКИРОВАТЬ"
+            print(f"   {match}: {i}. '{article['title']}' → {status} {metadata['matched_keywords']}")
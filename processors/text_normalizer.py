@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+RSS Media Bus - Нормализация текста статей для фильтров ключевых слов (RU/EN)
+Токенизация, нижний регистр, ё -> е и легкий стемминг выполняются один раз на статью;
+фильтры проверяют ключевые слова по готовому множеству основ
+"""
+
+import re
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Any, Dict, FrozenSet, Iterable, Mapping, Tuple
+
+# Поля статьи, которые нормализуются при чтении из БД
+ARTICLE_TERM_FIELDS = ('title', 'description')
+
+# Ключевое слово - начало основы: основы статьи добавляются в множество со всеми префиксами от этой длины
+MIN_PREFIX_LENGTH = 3
+
+# Основа короче этого не укорачивается стеммингом
+MIN_STEM_LENGTH = 3
+
+TOKEN_PATTERN = re.compile(r'\w+')
+CYRILLIC_PATTERN = re.compile('[а-я]')
+
+# Окончания в порядке убывания длины - отрезается самое длинное подходящее
+RUSSIAN_ENDINGS = tuple(sorted({
+    # возвратные глаголы и причастия
+    'ся', 'сь',
+    # прилагательные и причастия
+    'ого', 'его', 'ому', 'ему', 'ыми', 'ими', 'ой', 'ей', 'ый', 'ий', 'ая', 'яя', 'ое', 'ее', 'ые', 'ие',
+    'ую', 'юю', 'ом', 'ем', 'их', 'ых', 'им', 'ым',
+    'ейший', 'ейшая', 'ейшее', 'ейшие', 'ейшего',
+    # глаголы
+    'ать', 'ять', 'еть', 'ить', 'ыть', 'уть', 'ал', 'ял', 'ил', 'ыл', 'ела', 'ала', 'яла', 'ила', 'ыла',
+    'али', 'яли', 'или', 'ыли', 'ет', 'ют', 'ут', 'ат', 'ят', 'ит', 'ешь', 'ишь', 'ете', 'ите', 'ует', 'уют',
+    # существительные
+    'а', 'я', 'о', 'е', 'и', 'ы', 'у', 'ю', 'ь', 'й',
+    'ам', 'ям', 'ах', 'ях', 'ами', 'ями', 'ов', 'ев', 'ей', 'ия', 'ие', 'ии', 'ию', 'ью', 'ья', 'ье',
+    'иям', 'иях', 'иями', 'ием', 'ией', 'ость', 'ости', 'остью', 'остей', 'ение', 'ения', 'ению', 'ением',
+    'ении', 'ений', 'ениям', 'ениях', 'ание', 'ания', 'анию', 'анием', 'ании', 'аний',
+}, key=len, reverse=True))
+
+ENGLISH_SUFFIXES = ('ations', 'ation', 'ings', 'ing', 'edly', 'ied', 'ies', 'ed', 'ly', 'es', 's')
+
+
+def _russian_stem(word: str) -> str:
+    for ending in RUSSIAN_ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= MIN_STEM_LENGTH:
+            return word[:-len(ending)]
+    return word
+
+
+def _english_stem(word: str) -> str:
+    for suffix in ENGLISH_SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= MIN_STEM_LENGTH:
+            stem = word[:-len(suffix)]
+            # policies -> polic(y), studied -> stud(y): приводим к одной основе
+            if suffix in ('ies', 'ied'):
+                stem += 'y'
+            return stem[:-1] if stem.endswith('y') else stem
+    return word[:-1] if word.endswith('y') and len(word) > MIN_STEM_LENGTH else word
+
+
+@lru_cache(maxsize=200000)
+def stem(word: str) -> str:
+    """Основа слова: нижний регистр, ё -> е, отрезанное окончание"""
+    word = word.lower().replace('ё', 'е')
+    if CYRILLIC_PATTERN.search(word):
+        return _russian_stem(word)
+    return _english_stem(word)
+
+
+def stems(text: str) -> Tuple[str, ...]:
+    """Основы слов текста в исходном порядке"""
+    return tuple(stem(token) for token in TOKEN_PATTERN.findall(text))
+
+
+def term_set(text: str) -> FrozenSet[str]:
+    """Основы слов текста и их префиксы от MIN_PREFIX_LENGTH символов"""
+    terms = set()
+    for word_stem in set(stems(text)):
+        terms.add(word_stem)
+        terms.update(word_stem[:length] for length in range(MIN_PREFIX_LENGTH, len(word_stem)))
+    return frozenset(terms)
+
+
+def build_article_terms(article: Mapping[str, Any], fields: Iterable[str] = ARTICLE_TERM_FIELDS) -> Mapping[Any, FrozenSet[str]]:
+    """
+    Нормализованные термины статьи по полям и их объединение (ключ - кортеж полей).
+    Результат кладется в запись статьи под ключом 'terms' - один раз на статью.
+    """
+    fields = tuple(fields)
+    terms: Dict[Any, FrozenSet[str]] = {
+        field: term_set(str(article[field])) if article.get(field) else frozenset() for field in fields
+    }
+    terms[fields] = frozenset().union(*(terms[field] for field in fields))
+    return MappingProxyType(terms)
+
+
+def article_terms(article: Mapping[str, Any], fields: Iterable[str]) -> FrozenSet[str]:
+    """Термины статьи по полям фильтра: из кэша записи ('terms'), а если его нет - вычисляются на месте"""
+    fields = tuple(fields)
+    cached = article.get('terms') or {}
+    if fields in cached:
+        return cached[fields]
+    return frozenset().union(*(
+        cached[field] if field in cached else term_set(str(article[field]))
+        for field in fields if article.get(field)
+    ))
+
+
+def keyword_stems(keyword: str) -> Tuple[str, ...]:
+    """Основы ключевого слова (фразы) - все должны быть среди терминов статьи"""
+    return tuple(dict.fromkeys(stems(keyword)))
+
+
+# Тестирование
+if __name__ == "__main__":
+    import time
+
+    print("🧪 Тестирование нормализации текста")
+    samples = [
+        ('экология', 'Новости экологии и экологическая повестка'),
+        ('эколог', 'Экологи призвали сократить выбросы'),
+        ('атом', 'Автоматом не считается'),
+        ('ёлка', 'Главную елку страны установили'),
+        ('зеленая энергия', 'Доля зелёной энергии выросла'),
+        ('policy', 'New climate policies announced'),
+        ('ESG', 'ESG-рейтинги компаний'),
+    ]
+    for keyword, text in samples:
+        terms = term_set(text)
+        matched = all(word_stem in terms for word_stem in keyword_stems(keyword))
+        substring = keyword.lower() in text.lower()
+        print(f"   '{keyword}' в «{text}»: основы {'✅' if matched else '❌'} | подстрока {'✅' if substring else '❌'}")
+
+    text = ' '.join([samples[0][1], samples[1][1], samples[4][1]] * 30)
+    started = time.perf_counter()
+    for _ in range(200):
+        term_set(text)
+    print(f"⏱️ Нормализация статьи ~{len(text)} символов: {(time.perf_counter() - started) / 200 * 1e6:.0f} мкс")
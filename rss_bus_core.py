@@ -15,12 +15,15 @@ from urllib.parse import urlparse
 from core.source_manager import AsyncRSSParser
 from core.database import DatabaseManager
 from core.hot_reload import HotReloadManager
+from core.poll_scheduler import PollScheduler
 
 class RSSBusCore:
     def __init__(self):
         self.sources = {}
         self.active_sources = []
+        self.http_settings = {}
         self.rss_parser = None
+        self.scheduler = None
         self.running = False
         
         # Hot Reload менеджер
@@ -72,6 +75,8 @@ class RSSBusCore:
                 data = yaml.safe_load(f)
             
             self.sources = data.get('sources', {})
+            # Лимиты HTTP пула (применяются при старте парсера)
+            self.http_settings = data.get('http') or {}
             
             # Фильтруем только активные источники
             self.active_sources = []
@@ -110,7 +115,8 @@ class RSSBusCore:
             # Создаем RSS парсер БЕЗ Telegram sender
             self.rss_parser = AsyncRSSParser(
                 db_manager=db_manager,
-                config=None
+                config=None,
+                http_settings=self.http_settings
             )
             
             print("✅ RSS парсер инициализирован (только БД)")
@@ -120,9 +126,12 @@ class RSSBusCore:
             print(f"❌ Ошибка инициализации парсера: {e}")
             return False
     
-    async def parse_cycle(self):
-        """Один цикл парсинга всех источников (только сохранение в БД)"""
-        if not self.active_sources:
+    async def parse_cycle(self, sources=None):
+        """Один цикл парсинга источников (по умолчанию всех активных, только сохранение в БД)"""
+        if sources is None:
+            sources = self.active_sources
+        
+        if not sources:
             print("⚠️ Нет активных источников для парсинга")
             return
         
@@ -140,11 +149,11 @@ class RSSBusCore:
             'errors': []
         }
         
-        print(f"🔄 Начинаю парсинг {len(self.active_sources)} источников...")
+        print(f"🔄 Начинаю парсинг {len(sources)} источников...")
         
         # Готовим все источники для РЕАЛЬНО асинхронной обработки
         feeds_batch = []
-        for source in self.active_sources:
+        for source in sources:
             # Используем source_id из конфигурации вместо извлечения домена
             # Передаем полную информацию о источнике включая прокси настройки
             feeds_batch.append((
@@ -171,35 +180,60 @@ class RSSBusCore:
         print(f"  ❌ Ошибки: {len(stats['unavailable'])}")  
         print(f"  📰 Новых статей: {stats['total_articles']}")
         
+        # Фиды без изменений: 304 Not Modified или тот же отпечаток содержимого
+        parser_stats = self.rss_parser.last_cycle_stats
+        if parser_stats:
+            short_circuited = parser_stats.get('not_modified', 0) + parser_stats.get('unchanged', 0)
+            print(f"  ⏭️ Без изменений: {short_circuited} (304: {parser_stats.get('not_modified', 0)}, "
+                  f"тот же отпечаток: {parser_stats.get('unchanged', 0)})")
+            if parser_stats.get('deferred'):
+                print(f"  ⏳ Отложено до следующего опроса: {len(parser_stats['deferred'])}")
+        
         if stats['errors']:
             print(f"  ⚠️ Проблемные источники: {len(stats['errors'])}")
     
     async def start_parsing(self, interval_minutes=2):  # Уменьшено с 5 до 2 минут
-        """Запуск непрерывного парсинга RSS (только БД)"""
+        """Запуск непрерывного парсинга RSS по адаптивному расписанию (только БД)"""
         self.running = True
         
+        # interval_minutes - стартовый интервал для источников без истории,
+        # дальше интервал каждого фида подстраивается под его темп публикации
+        self.scheduler = PollScheduler(self.rss_parser.db, default_interval=interval_minutes * 60)
+        self.scheduler.sync_sources(source['id'] for source in self.active_sources)
+        
         print(f"🚀 RSS Bus Core запущен")
-        print(f"⏰ Интервал: {interval_minutes} минут (ускоренный)")
+        print(f"⏰ Стартовый интервал: {interval_minutes} минут, далее адаптивно по каждому источнику")
         print(f"📡 Активных источников: {len(self.active_sources)}")
         print(f"💾 Режим: только сохранение в БД")
+        print(f"⏱️ Расписание: python3 -m core.poll_scheduler")
         print(f"🔄 Для остановки: Ctrl+C")
         print("=" * 50)
         
         try:
             while self.running:
-                timestamp = datetime.now().strftime('%H:%M:%S')
-                print(f"\n🔄 [{timestamp}] Начинаю цикл парсинга RSS")
+                due_ids = set(self.scheduler.pop_due())
+                if due_ids:
+                    timestamp = datetime.now().strftime('%H:%M:%S')
+                    print(f"\n🔄 [{timestamp}] Опрос по расписанию: {len(due_ids)} из {len(self.active_sources)} источников")
+                    
+                    due_sources = [source for source in self.active_sources if source['id'] in due_ids]
+                    await self.parse_cycle(due_sources)
+                    
+                    # Отложенные из-за бюджета цикла фиды опрашиваются снова вне очереди
+                    deferred_ids = due_ids & set(self.rss_parser.last_cycle_stats.get('deferred', []))
+                    self.scheduler.mark_polled(due_ids - deferred_ids)
+                    if deferred_ids:
+                        self.scheduler.defer(deferred_ids)
                 
-                await self.parse_cycle()
+                # Ждем ближайшего источника в очереди
+                sleep_seconds = self.scheduler.seconds_until_next()
+                if sleep_seconds >= 1:
+                    print(f"😴 Следующий опрос через {sleep_seconds:.0f}с")
                 
-                # Ждем до следующего цикла
-                sleep_seconds = interval_minutes * 60
-                print(f"😴 Ожидание {interval_minutes} минут...")
-                
-                for i in range(sleep_seconds):
-                    if not self.running:
-                        break
-                    await asyncio.sleep(1)
+                # Срок перепроверяется каждую секунду: hot reload ставит новые источники в очередь на сейчас
+                while self.running and sleep_seconds > 0:
+                    await asyncio.sleep(min(1, sleep_seconds))
+                    sleep_seconds = self.scheduler.seconds_until_next()
                 
         except KeyboardInterrupt:
             print(f"\n🛑 Получен сигнал остановки")
@@ -227,6 +261,9 @@ class RSSBusCore:
         
         print(f"✅ Источники перезагружены: {len(self.sources)} всего, {len(self.active_sources)} активных")
         
+        if self.scheduler:
+            self.scheduler.sync_sources(source['id'] for source in self.active_sources)
+        
         # Выводим обновленный список
         for source in self.active_sources[:5]:
             print(f"📡 {source['name']}")
@@ -260,6 +297,9 @@ class RSSBusCore:
                 'proxy_settings': {}
             })
             
+            if self.scheduler:
+                self.scheduler.sync_sources(source['id'] for source in self.active_sources)
+            
             # Сохраняем в файл для постоянства
             await self._save_sources_to_file()
             
@@ -297,6 +337,9 @@ class RSSBusCore:
     async def stop_parsing(self):
         """Остановка парсинга"""
         self.running = False
+        if self.rss_parser:
+            await self.rss_parser.close_session()
+            self.rss_parser.close()
         print(f"✅ RSS Bus Core остановлен")
 
 async def main():
@@ -321,6 +364,10 @@ async def main():
         await bus_core.start_parsing(interval_minutes=2)  # Ускорено до 2 минут
     except KeyboardInterrupt:
         print("\n🛑 Парсинг прерван пользователем")
+    finally:
+        # HTTP пул и пул парсинга закрываются при любом завершении
+        if bus_core.running:
+            await bus_core.stop_parsing()
     
     print("👋 RSS Bus Core завершен")
 
@@ -10,16 +10,38 @@ import yaml
 import signal
 import json
 import time
-import pytz
+from types import MappingProxyType
 from datetime import datetime, timedelta
 from pathlib import Path
+from typing import NamedTuple, Optional
 
 # Импорты наших модулей
 from core.database import DatabaseManager
-from outputs.telegram_sender import TelegramSender
+from outputs.telegram_sender import AsyncTelegramSender, format_digest_entry
+from outputs.delivery_scheduler import DeliveryScheduler, DeliveryItem, DigestConfig
 from core.hot_reload import HotReloadManager
 from processors.simple_keyword_filter import SimpleKeywordFilter
+from processors.text_normalizer import build_article_terms
 from core.translator import AutoTranslator
+from config import (
+    SOURCES_CONFIG, NOTIFICATION_OUTBOX_POLL_SECONDS, NOTIFICATION_BATCH_SIZE, DELIVERY_BATCH_SIZE,
+    NOTIFICATION_MAX_FAILURES, NOTIFICATION_PARK_SECONDS,
+    DELIVERY_RETRY_BASE_SECONDS, DELIVERY_RETRY_MAX_SECONDS, DELIVERY_MAX_ATTEMPTS, DELIVERY_RETENTION_DAYS
+)
+
+# Имя потребителя в outbox_offsets
+OUTBOX_CONSUMER = "user_notification_service"
+
+# Источники на русском - для старого формата topics_mapping (без translate) не переводятся
+RUSSIAN_SOURCES = ['habr', 'vc.ru', 'tass.ru', 'ria.ru', 'rbc.ru', 'lenta.ru', 'mk.ru', 'kp.ru', 'iz.ru', 'aif.ru', '360.ru', 'pnp.ru', 'ura.news', 'life.ru', 'rt.com', 'rg.ru', 'vedomosti', 'interfax.ru', 'lenta.ru', 'rapsinews.ru', 'ecopravda.ru']
+
+
+class SourceRoute(NamedTuple):
+    """Маршрут статей источника для получателя, вычисляется один раз при загрузке конфигов"""
+    topic_id: Optional[int]
+    keyword_filter: Optional[SimpleKeywordFilter]
+    translate: bool
+    digest: Optional[DigestConfig] = None
 
 
 class UserNotificationService:
@@ -27,7 +49,21 @@ class UserNotificationService:
         self.db = None
         self.users = {}
         self.running = False
-        self.last_check_time = {}
+        # Позиция в outbox новых статей (article_outbox.seq) - сигнал, что появились статьи
+        self.outbox_offset = 0
+        # Курсоры получателей: user_key -> последний обработанный articles.id (subscriber_offsets)
+        self.offsets = {}
+        # Ошибки получателей подряд и до какого момента (time.monotonic) получатель отложен
+        self.failure_counts = {}
+        self.parked_until = {}
+        # Индекс fan-out: feed_id -> получатели, у которых для источника настроен топик
+        self.source_index = {}
+        # Есть ли фильтры по основам слов (match: stems) - иначе термины статей не вычисляются
+        self.uses_stems = False
+        # Сигнал фоновой доставке: в очередь поставлены новые сообщения
+        self.delivery_wakeup = asyncio.Event()
+        # Воркеры доставки по чатам под общими лимитами Telegram
+        self.scheduler = DeliveryScheduler(AsyncTelegramSender.limiter, self._deliver, self._requeue)
         
         # Hot Reload менеджер
         self.hot_reload = HotReloadManager("User Notification Service")
@@ -53,7 +89,6 @@ class UserNotificationService:
                 data = yaml.safe_load(f)
             users_data = data.get('users', data)
             self.users = {}
-            self.last_check_time = {}
             for user_id, user_data in users_data.items():
                 if not user_data.get('active'):
                     continue
@@ -68,7 +103,7 @@ class UserNotificationService:
                     if not telegram_config.get('enabled') or not telegram_config.get('bot_token'):
                         continue
                     try:
-                        telegram_sender = TelegramSender(
+                        telegram_sender = AsyncTelegramSender(
                             bot_token=telegram_config['bot_token'],
                             chat_id=telegram_config['chat_id']
                         )
@@ -98,14 +133,15 @@ class UserNotificationService:
                             'chat_id': telegram_config['chat_id'],
                             'translation_settings': telegram_config.get('translation_settings', {})
                         }
-                        # Устанавливаем время на текущий момент чтобы обрабатывать только новые статьи  
-                        self.last_check_time[key] = datetime.now(pytz.timezone('Europe/Moscow'))
                         print(f"✅ Пользователь {user_id} / {config_id} настроен")
                         print(f"   📱 Chat ID: {telegram_config['chat_id']}")
                         print(f"   📡 Источников: {len(self.users[key]['sources'])}")
                         print(f"   🗂️ Топиков: {len(topics_mapping)}")
                     except Exception as e:
                         print(f"❌ Ошибка настройки Telegram для {user_id}/{config_id}: {e}")
+            self._sync_offsets()
+            self._compile_routes()
+            self._build_source_index()
             print(f"\n📊 Активных telegram-конфигов: {len(self.users)}")
             return len(self.users) > 0
         except Exception as e:
@@ -117,6 +153,11 @@ class UserNotificationService:
         try:
             self.db = DatabaseManager()
             print("✅ Подключение к базе данных инициализировано")
+            
+            # После перезапуска продолжаем с последнего обработанного события
+            self.outbox_offset = self.db.get_outbox_offset(OUTBOX_CONSUMER)
+            pending = self.db.get_outbox_head() - self.outbox_offset
+            print(f"📬 Outbox: позиция seq={self.outbox_offset}, ожидают обработки: {pending}")
             return True
         except Exception as e:
             print(f"❌ Ошибка подключения к БД: {e}")
@@ -175,83 +216,142 @@ class UserNotificationService:
                 # При ошибке фильтра - пропускаем статью
                 return True, []
         
-        # СТАРАЯ ФИЛЬТРАЦИЯ: Поддержка legacy processors для совместимости
-        processors = user_data.get('processors', [])
-        for processor in processors:
-            if processor.get('name') == 'keyword_filter':
-                config = processor.get('config', {})
-                keywords = config.get('keywords', [])
-                mode = config.get('mode', 'include')
-                min_matches = config.get('min_matches', 1)
-                if keywords:
-                    matched_keywords = self.check_keywords_in_article(article, keywords)
-                    if mode == 'include':
-                        if len(matched_keywords) >= min_matches:
-                            return True, matched_keywords
-                        else:
-                            return False, []
-                    elif mode == 'exclude':
-                        if len(matched_keywords) >= min_matches:
-                            return False, matched_keywords
+        # СТАРАЯ ФИЛЬТРАЦИЯ: Поддержка legacy processors для совместимости (фильтры созданы в _compile_routes)
+        for legacy_filter, mode, min_matches in user_data.get('legacy_filters', ()):
+            matched_keywords = self.check_keywords_in_article(article, legacy_filter)
+            if mode == 'include':
+                if len(matched_keywords) >= min_matches:
+                    return True, matched_keywords
+                else:
+                    return False, []
+            elif mode == 'exclude':
+                if len(matched_keywords) >= min_matches:
+                    return False, matched_keywords
         
         # Если фильтров нет - пропускаем статью
         return True, []
     
-    def check_keywords_in_article(self, article, keywords):
-        if not keywords:
-            return []
-        filter_config = {
-            'mode': 'include',
-            'keywords': keywords,
-            'case_sensitive': False,
-            'fields': ['title', 'description', 'content']
-        }
-        simple_filter = SimpleKeywordFilter(filter_config)
-        should_send, metadata = simple_filter.filter_article(article)
+    def check_keywords_in_article(self, article, keyword_filter):
+        should_send, metadata = keyword_filter.filter_article(article)
         return metadata.get('matched_keywords', []) if should_send else []
     
-    def get_topic_id_for_source(self, user_key, source_id):
-        user_data = self.users.get(user_key, {})
+    @staticmethod
+    def _compile_legacy_filters(processors):
+        """Legacy processors keyword_filter: (фильтр, mode, min_matches) - один фильтр на процессор"""
+        legacy_filters = []
+        for processor in processors:
+            if processor.get('name') != 'keyword_filter':
+                continue
+            config = processor.get('config', {})
+            keywords = config.get('keywords', [])
+            if keywords:
+                keyword_filter = SimpleKeywordFilter({
+                    'mode': 'include',
+                    'keywords': keywords,
+                    'case_sensitive': False,
+                    'fields': ['title', 'description', 'content']
+                })
+                legacy_filters.append((keyword_filter, config.get('mode', 'include'), config.get('min_matches', 1)))
+        return legacy_filters
+    
+    @staticmethod
+    def _match_mapping(topics_mapping, source_id, predicate):
+        """Первая запись topics_mapping для источника: прямое совпадение, затем частичное совпадение домена"""
+        if source_id in topics_mapping and predicate(topics_mapping[source_id]):
+            return source_id
+        for mapped_source, topic in topics_mapping.items():
+            if (mapped_source in source_id or source_id in mapped_source) and predicate(topic):
+                return mapped_source
+        return None
+    
+    def _compile_route(self, user_data, source_id):
         topics_mapping = user_data.get('topics_mapping', {})
         
-        # Поддержка разных форматов mapping
-        if source_id in topics_mapping:
-            topic = topics_mapping[source_id]
-            if isinstance(topic, dict):
-                return topic.get('topic_id')
-            return topic
+        topic_id = None
+        digest = None
+        topic_key = self._match_mapping(topics_mapping, source_id, lambda topic: True)
+        if topic_key is not None:
+            topic = topics_mapping[topic_key]
+            topic_id = topic.get('topic_id') if isinstance(topic, dict) else topic
+            # Режим дайджеста: статьи топика копятся и уходят одним сообщением
+            digest = DigestConfig.from_mapping(topic.get('digest')) if isinstance(topic, dict) else None
+        
+        # Фильтр - у первой подходящей записи с filter_config; один объект на запись mapping
+        keyword_filter = None
+        filter_key = self._match_mapping(
+            topics_mapping, source_id, lambda topic: isinstance(topic, dict) and topic.get('filter_config')
+        )
+        if filter_key is not None:
+            filters = user_data['source_filters']
+            if filter_key not in filters:
+                filters[filter_key] = SimpleKeywordFilter(topics_mapping[filter_key]['filter_config'])
+            keyword_filter = filters[filter_key]
         
-        # Fallback: ищем по частичному совпадению домена
-        for mapped_source, topic_id in topics_mapping.items():
-            if mapped_source in source_id or source_id in mapped_source:
-                if isinstance(topic_id, dict):
-                    return topic_id.get('topic_id')
-                return topic_id
+        source_config = topics_mapping.get(source_id)
+        if isinstance(source_config, dict):
+            # Новый формат с настройками перевода
+            translate = source_config.get('translate', False)
+        else:
+            # Старый формат - используем автоопределение по источнику
+            translate = not any(rus_source in source_id.lower() for rus_source in RUSSIAN_SOURCES)
         
-        return None
+        return SourceRoute(topic_id, keyword_filter, translate, digest)
     
-    def get_filter_for_source(self, user_key, source_id):
-        """Получает filter_config для конкретного источника"""
-        user_data = self.users.get(user_key, {})
-        topics_mapping = user_data.get('topics_mapping', {})
-        
-        # Проверяем прямое совпадение
-        if source_id in topics_mapping:
-            topic = topics_mapping[source_id]
-            if isinstance(topic, dict):
-                filter_config = topic.get('filter_config')
-                if filter_config:
-                    return SimpleKeywordFilter(filter_config)
-        
-        # Fallback: ищем по частичному совпадению домена
-        for mapped_source, topic_data in topics_mapping.items():
-            if mapped_source in source_id or source_id in mapped_source:
-                if isinstance(topic_data, dict):
-                    filter_config = topic_data.get('filter_config')
-                    if filter_config:
-                        return SimpleKeywordFilter(filter_config)
+    @staticmethod
+    def _known_source_ids():
+        try:
+            with open(SOURCES_CONFIG, 'r', encoding='utf-8') as f:
+                return set((yaml.safe_load(f) or {}).get('sources') or {})
+        except (OSError, yaml.YAMLError) as e:
+            print(f"⚠️ Не удалось прочитать {SOURCES_CONFIG}: {e}")
+            return set()
+    
+    def _compile_routes(self):
+        """Таблица маршрутов source_id -> SourceRoute и фильтры legacy processors для каждого получателя"""
+        source_ids = self._known_source_ids()
+        for user_data in self.users.values():
+            source_ids.update(user_data.get('topics_mapping', {}))
+            source_ids.update(user_data.get('sources', []))
         
-        return None
+        for user_key, user_data in self.users.items():
+            user_data['source_filters'] = {}
+            try:
+                user_data['legacy_filters'] = self._compile_legacy_filters(user_data.get('processors', []))
+                user_data['routes'] = {
+                    source_id: self._compile_route(user_data, source_id) for source_id in source_ids
+                }
+            except Exception as e:
+                print(f"⚠️ Ошибка создания фильтра для {user_key}: {e}")
+                user_data['routes'] = {}
+        
+        self.uses_stems = any(
+            self._stem_filter(keyword_filter)
+            for user_data in self.users.values()
+            for keyword_filter in (user_data.get('keyword_filter'), *user_data['source_filters'].values())
+        )
+    
+    @staticmethod
+    def _stem_filter(keyword_filter):
+        """Фильтр сопоставляет основы слов и читает термины статьи"""
+        return keyword_filter is not None and keyword_filter.keyword_stems is not None
+    
+    def _route(self, user_key, source_id):
+        """Маршрут источника - поиск в словаре; источник вне sources.yaml компилируется при первой статье"""
+        user_data = self.users.get(user_key, {})
+        routes = user_data.setdefault('routes', {})
+        route = routes.get(source_id)
+        if route is None:
+            user_data.setdefault('source_filters', {})
+            route = routes[source_id] = self._compile_route(user_data, source_id)
+            self.uses_stems = self.uses_stems or self._stem_filter(route.keyword_filter)
+        return route
+    
+    def get_topic_id_for_source(self, user_key, source_id):
+        return self._route(user_key, source_id).topic_id
+    
+    def get_filter_for_source(self, user_key, source_id):
+        """Фильтр для конкретного источника (созданный при компиляции маршрутов)"""
+        return self._route(user_key, source_id).keyword_filter
     
     async def send_article_to_user(self, article, user_key, matched_keywords=None):
         user_data = self.users.get(user_key)
@@ -270,7 +370,7 @@ class UserNotificationService:
             description = article.get('description', '')
             link = article.get('link', '')
             categories = article.get('tags', []) if article.get('tags') else []
-            success = telegram_sender.send_article(
+            success = await telegram_sender.send_article(
                 title=title,
                 link=link,
                 description=description,
@@ -293,220 +393,377 @@ class UserNotificationService:
     
     def should_translate_source(self, user_key, source_id):
         """Определяет нужно ли переводить конкретный источник для пользователя"""
-        user_data = self.users.get(user_key, {})
-        topics_mapping = user_data.get('topics_mapping', {})
-        
-        # Ищем настройки для этого источника
-        source_config = topics_mapping.get(source_id)
-        
-        if isinstance(source_config, dict):
-            # Новый формат с настройками перевода
-            return source_config.get('translate', False)
-        else:
-            # Старый формат - используем автоопределение по источнику
-            russian_sources = ['habr', 'vc.ru', 'tass.ru', 'ria.ru', 'rbc.ru', 'lenta.ru', 'mk.ru', 'kp.ru', 'iz.ru', 'aif.ru', '360.ru', 'pnp.ru', 'ura.news', 'life.ru', 'rt.com', 'rg.ru', 'vedomosti', 'interfax.ru', 'lenta.ru', 'rapsinews.ru', 'ecopravda.ru']
-            return not any(rus_source in source_id.lower() for rus_source in russian_sources)
+        return self._route(user_key, source_id).translate
     
-    async def check_articles_for_user(self, user_key):
-        """Проверка новых статей для пользователя с настоящей асинхронностью"""
-        try:
-            user_data = self.users[user_key]
-            last_check = self.last_check_time[user_key]
-            
-            self.logger.debug(f"Last check for {user_key}: {last_check}")
-            
-            # Конвертируем в UTC для запроса к БД
-            utc_time = last_check.astimezone(pytz.UTC)
-            self.logger.debug(f"Querying articles after {utc_time.strftime('%Y-%m-%d %H:%M:%S')} UTC (was {last_check.strftime('%Y-%m-%d %H:%M:%S')} Moscow)")
-            
-            # Получаем новые статьи, сортированные по времени публикации (ХРОНОЛОГИЧЕСКИЙ ПОРЯДОК!)
-            query = """
-                SELECT id, feed_id, title, link, description, tags, published_date, added_date
-                FROM articles 
-                WHERE added_date > ? 
-                ORDER BY published_date ASC, added_date ASC
-                LIMIT 500
-            """
-            
-            conn = self.db.get_connection()
-            cursor = conn.cursor()
-            cursor.execute(query, (utc_time.strftime('%Y-%m-%d %H:%M:%S'),))
-            articles = cursor.fetchall()
-            conn.close()
-            
-            self.logger.info(f"Found {len(articles)} potential new articles for {user_key}")
-            
-            if not articles:
-                self.logger.info(f"Sent 0 articles for {user_key}")
-                return 0
-            
-            # Фильтруем, переводим и подготавливаем статьи для отправки
-            articles_to_send = []
-            user_data = self.users[user_key]
+    def _sync_offsets(self):
+        """Курсоры для текущего набора получателей: сохраненные в БД или с последней статьи для новых"""
+        if self.db:
+            self.offsets = self.db.get_subscriber_offsets(list(self.users))
+    
+    def _build_source_index(self):
+        """Индекс источник -> получатели по скомпилированным маршрутам всех получателей"""
+        self.source_index = {}
+        known_sources = set()
+        for user_data in self.users.values():
+            known_sources.update(user_data.get('routes', {}))
+        for source_id in known_sources:
+            self._subscribers_for_source(source_id)
+    
+    def _subscribers_for_source(self, source_id):
+        """Получатели статей источника; источники вне sources.yaml добавляются при первой статье"""
+        subscribers = self.source_index.get(source_id)
+        if subscribers is None:
+            subscribers = self.source_index[source_id] = tuple(
+                user_key for user_key, user_data in self.users.items()
+                if (not user_data.get('sources') or str(source_id).lower() in user_data['sources'])
+                and self.get_topic_id_for_source(user_key, source_id) is not None
+            )
+        return subscribers
+    
+    async def check_articles_for_user(self, user_key, articles):
+        """Фильтрация и перевод статей страницы fan-out: [(статья, совпавшие ключевые слова)] для очереди доставки"""
+        # Фильтруем, переводим и подготавливаем статьи для отправки
+        articles_to_send = []
+        user_data = self.users[user_key]
 
-            # Получаем настройки перевода для этого бота
-            translation_settings = user_data.get('translation_settings', {})
+        # Получаем настройки перевода для этого бота
+        translation_settings = user_data.get('translation_settings', {})
 
-            # Создаем конфиг переводчика
-            translation_config = {
-                'enabled': bool(translation_settings),
-                'provider': translation_settings.get('provider', 'yandex'),
-                'source_lang': translation_settings.get('source_lang', 'auto'),
-                'target_lang': translation_settings.get('target_lang', 'ru'),
-                'fields': translation_settings.get('fields', ['title', 'description'])
-            }
+        # Создаем конфиг переводчика
+        translation_config = {
+            'enabled': bool(translation_settings),
+            'provider': translation_settings.get('provider', 'yandex'),
+            'source_lang': translation_settings.get('source_lang', 'auto'),
+            'target_lang': translation_settings.get('target_lang', 'ru'),
+            'fields': translation_settings.get('fields', ['title', 'description'])
+        }
 
-            async with AutoTranslator(translation_config) as translator:
-                for article_row in articles:
-                    article = {
-                        'id': article_row[0],
-                        'feed_id': article_row[1],
-                        'title': article_row[2],
-                        'link': article_row[3],
-                        'description': article_row[4],
-                        'tags': json.loads(article_row[5]) if article_row[5] else [],
-                        'published_date': article_row[6],
-                        'added_date': article_row[7]
-                    }
-                    
-                    # Сначала фильтруем
-                    should_send, matched_keywords = self.should_send_article_to_user(article, user_key)
-                    if should_send:
-                        # Проверяем нужен ли перевод для ЭТОГО источника
-                        if self.should_translate_source(user_key, article['feed_id']):
-                            # Переводим только если настройки источника говорят "переводить"
-                            translated_article = await translator.translate_article(article)
-                            articles_to_send.append((translated_article, matched_keywords))
-                        else:
-                            # Не переводим - добавляем как есть
-                            articles_to_send.append((article, matched_keywords))
-            
-            # МАССОВАЯ АСИНХРОННАЯ ОТПРАВКА без блокировки
-            if articles_to_send:
-                sent_count = await self._send_articles_batch_async(articles_to_send, user_key)
+        async with AutoTranslator(translation_config) as translator:
+            for article in articles:
+                # Сначала фильтруем
+                should_send, matched_keywords = self.should_send_article_to_user(article, user_key)
+                if should_send:
+                    # Проверяем нужен ли перевод для ЭТОГО источника
+                    if self.should_translate_source(user_key, article['feed_id']):
+                        # Переводим только если настройки источника говорят "переводить"
+                        translated_article = await translator.translate_article(article)
+                        articles_to_send.append((translated_article, matched_keywords))
+                    else:
+                        # Не переводим - добавляем как есть
+                        articles_to_send.append((article, matched_keywords))
+        
+        return articles_to_send
+    
+    @staticmethod
+    def _delivery_row(user_key, article, matched_keywords):
+        """Запись очереди доставки: готовое сообщение, переживающее перезапуск без повторного перевода"""
+        payload = {
+            'feed_id': article['feed_id'],
+            'published_date': article.get('published_date'),
+            'title': article.get('title'),
+            'link': article.get('link'),
+            'description': article.get('description'),
+            'tags': list(article.get('tags') or ()),
+            'matched_keywords': list(matched_keywords or ())
+        }
+        return user_key, article['id'], article.get('published_date'), json.dumps(payload, ensure_ascii=False)
+    
+    @staticmethod
+    def _retry_delay(attempts):
+        """Экспоненциальная пауза перед попыткой номер attempts + 1"""
+        return min(DELIVERY_RETRY_MAX_SECONDS, DELIVERY_RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+    
+    def _chat_key(self, user_key):
+        """Чат получателя: у нескольких конфигов может быть один бот и чат - общий воркер"""
+        telegram_sender = self.users[user_key]['telegram_sender']
+        return telegram_sender.bot_token, str(telegram_sender.chat_id)
+    
+    def _record_delivery(self, item, success, error):
+        """Результат отправки в очереди доставки: sent, повтор с экспоненциальной паузой или failed"""
+        if success:
+            self.db.mark_delivery_sent(item.user_key, item.article_id)
+        elif item.attempts + 1 >= DELIVERY_MAX_ATTEMPTS:
+            self.db.mark_delivery_failed(item.user_key, item.article_id, error)
+            self.logger.error(f"❌ {item.user_key}: статья {item.article_id} не доставлена после {item.attempts + 1} попыток")
+        else:
+            self.db.mark_delivery_failed(item.user_key, item.article_id, error,
+                                         time.time() + self._retry_delay(item.attempts + 1))
+    
+    def _undeliverable(self, item):
+        """Причина, по которой сообщение уже не доставить: конфиг изменился после постановки в очередь"""
+        if item.user_key not in self.users:
+            return 'получатель удален из конфигурации'
+        if self._route(item.user_key, json.loads(item.payload)['feed_id']).topic_id is None:
+            return 'топик для источника не настроен'
+        return None
+    
+    async def _deliver(self, items):
+        """
+        Отправка воркером чата: одна статья или дайджест топика (несколько статей одним сообщением).
+        Результат сразу фиксируется в очереди доставки для каждой статьи;
+        сообщения без получателя или топика сразу помечаются failed - повторы им не помогут.
+        """
+        deliverable = []
+        for item in items:
+            reason = self._undeliverable(item)
+            if reason is None:
+                deliverable.append(item)
+                continue
+            self.db.mark_delivery_failed(item.user_key, item.article_id, reason)
+            self.logger.warning(f"🚫 {item.user_key}: статья {item.article_id} не будет доставлена: {reason}")
+        if not deliverable:
+            return False
+        items = deliverable
+        
+        try:
+            if len(items) == 1:
+                article = json.loads(items[0].payload)
+                article['id'] = items[0].article_id
+                success = await self.send_article_to_user(article, items[0].user_key, article.pop('matched_keywords'))
             else:
-                sent_count = 0
-            
-            # Обновляем время только ПОСЛЕ успешной отправки
-            self.last_check_time[user_key] = datetime.now(pytz.timezone('Europe/Moscow'))
-            self.logger.info(f"Sent {sent_count} articles for {user_key}")
-            return sent_count
-            
+                success = await self.send_digest_to_user(items)
+            error = None if success else 'ошибка отправки'
         except Exception as e:
-            self.logger.error(f"❌ Ошибка проверки статей для {user_key}: {e}")
-            return 0
-
-    async def _send_articles_batch_async(self, articles_to_send, user_key):
-        """Оптимальная отправка статей с максимальным использованием лимитов Telegram"""
-        if not articles_to_send:
-            return 0
-            
-        self.logger.info(f"📤 Начинаю отправку {len(articles_to_send)} статей (оптимально)")
-        sent_count = 0
+            success, error = False, str(e)
         
-        # Создаем задачи для всех статей
-        tasks = []
-        for article, matched_keywords in articles_to_send:
-            task = self.send_article_to_user(article, user_key, matched_keywords)
-            tasks.append(task)
-        
-        # Отправляем с точным соблюдением лимита: 20 сообщений/минуту = 3 секунды на сообщение
-        for i, task in enumerate(tasks):
+        for item in items:
+            self._record_delivery(item, success, error)
+        return success
+    
+    def _requeue(self, items, error):
+        """Сбой воркера во время доставки: сообщения из in_flight возвращаются в очередь с паузой"""
+        for item in items:
             try:
-                success = await task
-                if success:
-                    sent_count += 1
-                    self.logger.info(f"✅ {i+1}/{len(tasks)}: статья отправлена")
-                else:
-                    self.logger.warning(f"❌ {i+1}/{len(tasks)}: ошибка отправки")
-                
-                # Точная задержка 3 секунды (кроме последнего сообщения)
-                if i < len(tasks) - 1:
-                    await asyncio.sleep(3.0)  # 20 сообщений/минуту
-                    
-            except Exception as e:
-                self.logger.error(f"❌ {i+1}/{len(tasks)}: исключение {e}")
-
-        total_time = len(articles_to_send) * 3
-        self.logger.info(f"📊 Отправлено {sent_count}/{len(articles_to_send)} статей за ~{total_time//60}м {total_time%60}с")
-        return sent_count
+                self._record_delivery(item, False, str(error))
+            except sqlite3.Error as e:
+                # Останется in_flight до recover_deliveries при следующем запуске
+                self.logger.error(f"❌ {item.user_key}: статья {item.article_id} не возвращена в очередь: {e}")
+    
+    async def send_digest_to_user(self, items):
+        """Дайджест топика: строки статей, собранные при раздаче воркерам"""
+        user_data = self.users.get(items[0].user_key)
+        if not user_data:
+            return False
+        success = await user_data['telegram_sender'].send_digest(
+            [item.digest_entry for item in items], topic_id=items[0].topic_id
+        )
+        if success:
+            print(f"📤 {items[0].user_key}: дайджест из {len(items)} статей → топик {items[0].topic_id}")
+        else:
+            print(f"❌ Ошибка отправки дайджеста {items[0].user_key}: {len(items)} статей")
+        return success
+    
+    def dispatch_due(self):
+        """
+        Готовые сообщения очереди доставки (in_flight) передаются воркерам своих чатов.
+        В памяти держится не больше DELIVERY_BATCH_SIZE сообщений - остальные ждут в БД.
+        """
+        limit = DELIVERY_BATCH_SIZE - self.scheduler.pending()
+        if limit <= 0:
+            return 0
+        rows = self.db.claim_deliveries(list(self.users), time.time(), limit)
+        for user_key, article_id, payload, attempts in rows:
+            article = json.loads(payload)
+            route = self._route(user_key, article['feed_id'])
+            item = DeliveryItem(
+                sort_key=(article.get('published_date') or '', article_id),
+                user_key=user_key,
+                article_id=article_id,
+                topic_id=route.topic_id,
+                payload=payload,
+                attempts=attempts,
+                digest=route.digest,
+                digest_entry=format_digest_entry(article.get('title'), article.get('link')) if route.digest else ''
+            )
+            self.scheduler.submit(self._chat_key(user_key), item)
+        if rows:
+            self.logger.info(f"📤 К отправке {len(rows)} сообщений, активных чатов: {self.scheduler.active_chats()}")
+        return len(rows)
+    
+    async def delivery_loop(self, poll_seconds=NOTIFICATION_OUTBOX_POLL_SECONDS):
+        """
+        Фоновая раздача очереди доставки воркерам чатов: просыпается после постановки
+        новых сообщений или по таймеру (повторы). Воркеры отправляют независимо -
+        медленный чат не задерживает раздачу остальным.
+        """
+        while self.running:
+            self.dispatch_due()
+            try:
+                await asyncio.wait_for(self.delivery_wakeup.wait(), poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self.delivery_wakeup.clear()
+    
+    def _article_from_row(self, row):
+        """
+        Строка read_articles_after в статью только для чтения: одна запись на всех получателей.
+        Переводчик работает с копией (article.copy()), оригинал не меняется.
+        Нормализованные термины ('terms') считаются здесь один раз для всех фильтров -
+        только если у кого-то из получателей есть фильтр по основам слов.
+        """
+        article_id, feed_id, title, link, description, tags, published_date, added_date = row
+        article = {
+            'id': article_id,
+            'feed_id': feed_id,
+            'title': title,
+            'link': link,
+            'description': description,
+            'tags': tuple(json.loads(tags)) if tags else (),
+            'published_date': published_date,
+            'added_date': added_date
+        }
+        if self.uses_stems:
+            article['terms'] = build_article_terms(article)
+        return MappingProxyType(article)
     
     async def notification_cycle(self):
+        """
+        Общий проход fan-out: страница новых статей читается и декодируется один раз,
+        затем раздается получателям через индекс источник -> получатели.
+        Отобранные статьи ставятся в очередь доставки в одной транзакции со сдвигом курсоров;
+        получатель с ошибкой фильтрации/перевода выбывает из прохода и повторит страницу со своего курсора
+        в следующем цикле (при новых событиях outbox), а после NOTIFICATION_MAX_FAILURES ошибок подряд
+        откладывается на NOTIFICATION_PARK_SECONDS.
+        """
+        outbox_head = self.db.get_outbox_head()
         if not self.users:
             self.logger.warning("⚠️ Нет активных telegram-конфигов")
-            return
-        cycle_start = datetime.now()
-        total_sent = 0
         
-        # ПАРАЛЛЕЛЬНАЯ обработка всех пользователей одновременно
-        tasks = []
-        for user_key in self.users:
-            task = self.check_articles_for_user(user_key)
-            tasks.append(task)
-        
-        # Ждем завершения ВСЕХ пользователей параллельно
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+        cycle_start = datetime.now()
+        total_queued = 0
+        total_articles = 0
         
-        for i, (user_key, result) in enumerate(zip(self.users.keys(), results)):
-            try:
+        now = time.monotonic()
+        offsets = {
+            user_key: self.offsets[user_key] for user_key in self.users
+            if user_key in self.offsets and self.parked_until.get(user_key, 0) <= now
+        }
+        failed = set()
+        cursor = min(offsets.values(), default=None)
+        
+        while cursor is not None:
+            # Отстающий получатель (после перезапуска) определяет начало общего чтения
+            rows = self.db.read_articles_after(cursor, NOTIFICATION_BATCH_SIZE)
+            if not rows:
+                break
+            page_end = rows[-1][0]
+            total_articles += len(rows)
+            
+            # Хронологический порядок отправки внутри страницы
+            articles = [self._article_from_row(row) for row in rows]
+            articles.sort(key=lambda article: (article['published_date'] or '', article['added_date'] or ''))
+            
+            batches = {}
+            for article in articles:
+                for user_key in self._subscribers_for_source(article['feed_id']):
+                    if user_key in offsets and user_key not in failed and article['id'] > offsets[user_key]:
+                        batches.setdefault(user_key, []).append(article)
+            
+            # ПАРАЛЛЕЛЬНАЯ обработка всех получателей страницы одновременно
+            user_keys = list(batches)
+            results = await asyncio.gather(
+                *(self.check_articles_for_user(user_key, batches[user_key]) for user_key in user_keys),
+                return_exceptions=True
+            )
+            
+            deliveries = []
+            for user_key, result in zip(user_keys, results):
                 if isinstance(result, Exception):
                     self.logger.error(f"❌ Ошибка для {user_key}: {result}")
-                else:
-                    sent_count = result
-                    total_sent += sent_count
-                    # Логируем только если есть новые статьи
-                    if sent_count > 0:
-                        user_name = self.users[user_key]['name']
-                        self.logger.info(f"📬 {user_name}: отправлено {sent_count} статей")
-            except Exception as e:
-                self.logger.error(f"❌ Ошибка обработки результата для {user_key}: {e}")
+                    failed.add(user_key)
+                    continue
+                deliveries.extend(self._delivery_row(user_key, article, keywords) for article, keywords in result)
+                # Логируем только если есть новые статьи
+                if result:
+                    user_name = self.users.get(user_key, {}).get('name', user_key)
+                    self.logger.info(f"📬 {user_name}: в очередь {len(result)} статей")
+            
+            advanced = {
+                user_key: page_end for user_key, offset in offsets.items()
+                if user_key not in failed and offset < page_end
+            }
+            if advanced:
+                total_queued += self.db.enqueue_deliveries(deliveries, advanced)
+                offsets.update(advanced)
+                self.offsets.update(advanced)
+                if deliveries:
+                    self.delivery_wakeup.set()
+            
+            # Получатели с ошибкой выбыли - чтение продолжается с отстающего из оставшихся
+            remaining = [offset for user_key, offset in offsets.items() if user_key not in failed]
+            if len(rows) < NOTIFICATION_BATCH_SIZE or not remaining:
+                break
+            cursor = max(page_end, min(remaining))
+        
+        # Outbox подтверждается независимо от ошибок получателей: отставших ведут их собственные курсоры,
+        # а постоянно падающий получатель не заставляет каждые poll_seconds перечитывать ту же страницу
+        self.outbox_offset = outbox_head
+        self.db.commit_outbox_offset(OUTBOX_CONSUMER, self.outbox_offset)
+        self._track_failures(offsets, failed, now)
         
         cycle_duration = (datetime.now() - cycle_start).total_seconds()
-        if total_sent > 0:
-            self.logger.info(f"🎯 Цикл завершен: {total_sent} статей за {cycle_duration:.1f}с")
+        if total_queued > 0:
+            self.logger.info(f"🎯 Цикл завершен: {total_articles} новых статей, в очередь {total_queued} за {cycle_duration:.1f}с")
         else:
-            self.logger.debug(f"🔄 Цикл завершен: новых статей нет ({cycle_duration:.1f}с)")
+            self.logger.debug(f"🔄 Цикл завершен: подходящих статей нет ({cycle_duration:.1f}с)")
+        return total_queued
     
-    async def start_notifications(self, interval_minutes=1):  # Ускорено с 2 до 1 минуты
-        """Запуск сервиса уведомлений с оптимальным интервалом"""
+    def _track_failures(self, processed, failed, now):
+        """Счетчик ошибок подряд: успешный проход сбрасывает его, порог откладывает получателя"""
+        for user_key in processed:
+            if user_key not in failed:
+                self.failure_counts.pop(user_key, None)
+                self.parked_until.pop(user_key, None)
+                continue
+            failures = self.failure_counts[user_key] = self.failure_counts.get(user_key, 0) + 1
+            if failures >= NOTIFICATION_MAX_FAILURES:
+                self.parked_until[user_key] = now + NOTIFICATION_PARK_SECONDS
+                self.logger.error(f"⏸️ {user_key}: {failures} ошибок подряд, отложен на {NOTIFICATION_PARK_SECONDS}с")
+            else:
+                self.logger.warning(f"⚠️ {user_key}: отстает с прошлой позиции (ошибка {failures} подряд)")
+    
+    async def start_notifications(self, poll_seconds=NOTIFICATION_OUTBOX_POLL_SECONDS):
+        """Запуск сервиса уведомлений: новые статьи приходят через outbox от RSS Bus Core"""
         self.running = True
         
         print(f"🔔 User Notification Service запущен")
-        print(f"⏰ Интервал проверки: {interval_minutes} минут (ускоренный)")
+        print(f"⏰ Проверка outbox новых статей каждые {poll_seconds}с")
         print(f"👥 Активных пользователей: {len(self.users)}")
         print(f"📱 Активных telegram-конфигов: {sum(len(user.get('telegram_configs', {})) for user in self.users.values() if isinstance(user, dict))}")
         print("=" * 60)
         
+        # Сообщения, прерванные падением или остановкой, возвращаются в очередь
+        requeued, purged = self.db.recover_deliveries(DELIVERY_RETENTION_DAYS)
+        if requeued:
+            print(f"♻️ Возвращено в очередь доставки: {requeued}")
+        if purged:
+            self.logger.info(f"🧹 Удалено старых записей очереди доставки: {purged}")
+        delivery_task = asyncio.create_task(self.delivery_loop(poll_seconds))
+        
         try:
             while self.running:
-                timestamp = datetime.now().strftime('%H:%M:%S')
-                print(f"\n🔔 [{timestamp}] Начинаю цикл уведомлений")
-                
-                await self.notification_cycle()
+                # Дешевая проверка MAX(seq) по первичному ключу вместо выборки статей
+                if self.db.get_outbox_head() > self.outbox_offset:
+                    timestamp = datetime.now().strftime('%H:%M:%S')
+                    print(f"\n🔔 [{timestamp}] Новые статьи в outbox")
+                    
+                    await self.notification_cycle()
                 
-                # Ждем до следующего цикла (поддержка дробных минут)
-                sleep_seconds = max(1, int(interval_minutes * 60))
-                print(f"😴 Ожидание {interval_minutes} минут...")
-
-                for i in range(sleep_seconds):
-                    if not self.running:
-                        break
-                    await asyncio.sleep(1)
+                await asyncio.sleep(poll_seconds)
                 
         except KeyboardInterrupt:
             print(f"\n🛑 Получен сигнал остановки")
             await self.stop_notifications()
+        finally:
+            delivery_task.cancel()
+            self.scheduler.cancel()
     
     async def _on_users_reload(self, new_users):
         """Callback для перезагрузки пользователей"""
         print("🔄 Перезагружаю пользователей User Notification Service...")
         
-        # Сохраняем старые времена последней проверки
-        old_last_check = self.last_check_time.copy()
-        
-        # Очищаем текущих пользователей
+        # Очищаем текущих пользователей (курсоры хранятся в БД и не сбрасываются)
         self.users = {}
-        self.last_check_time = {}
         
         # Загружаем новых пользователей используя существующую логику
         users_data = new_users if new_users else {}
@@ -521,9 +778,9 @@ class UserNotificationService:
                 if not telegram_config.get('enabled') or not telegram_config.get('bot_token'):
                     continue
                 
-                # Создаем TelegramSender для пользователя
+                # Создаем AsyncTelegramSender для пользователя
                 try:
-                    telegram_sender = TelegramSender(
+                    telegram_sender = AsyncTelegramSender(
                         bot_token=telegram_config['bot_token'],
                         chat_id=telegram_config['chat_id']
                     )
@@ -553,18 +810,18 @@ class UserNotificationService:
                         'translation_settings': telegram_config.get('translation_settings', {})
                     }
                     
-                    # Восстанавливаем время последней проверки или ставим текущее
-                    if key in old_last_check:
-                        self.last_check_time[key] = old_last_check[key]
-                        print(f"✅ Пользователь {key} перезагружен (время сохранено)")
-                    else:
-                        # Устанавливаем время на текущий момент чтобы обрабатывать только новые статьи  
-                        self.last_check_time[key] = datetime.now(pytz.timezone('Europe/Moscow'))
-                        print(f"✅ Пользователь {key} добавлен (новый)")
+                    print(f"✅ Пользователь {key} перезагружен")
                 
                 except Exception as e:
                     print(f"❌ Ошибка настройки Telegram для {user_id}::{config_id}: {e}")
         
+        # Оставшиеся получатели продолжают со своих курсоров, новые - с последней статьи;
+        # исправленный конфиг снимает паузу с отложенных получателей
+        self.failure_counts.clear()
+        self.parked_until.clear()
+        self._sync_offsets()
+        self._compile_routes()
+        self._build_source_index()
         print(f"✅ Пользователи перезагружены: {len(self.users)} активных")
     
     async def _on_topics_reload(self, new_topics):
@@ -574,12 +831,15 @@ class UserNotificationService:
         # Обновляем topics mapping для всех пользователей
         for user_key, user_data in self.users.items():
             user_data['topics_mapping'] = new_topics
+        self._compile_routes()
+        self._build_source_index()
         
         print("✅ Topics mapping обновлен для всех пользователей")
     
     async def stop_notifications(self):
         """Остановка сервиса уведомлений"""
         self.running = False
+        await AsyncTelegramSender.close_all()
         print(f"✅ User Notification Service остановлен")
 
 async def main():
@@ -601,10 +861,12 @@ async def main():
     
     # Запускаем сервис уведомлений
     try:
-        # 1 минута вместо 2 минут - более быстрые уведомления
-        await service.start_notifications(interval_minutes=1)
+        # Статьи приходят через outbox в течение нескольких секунд после сохранения
+        await service.start_notifications()
     except KeyboardInterrupt:
         print("\n🛑 Сервис прерван пользователем")
+    finally:
+        await AsyncTelegramSender.close_all()
     
     print("👋 User Notification Service завершен")
 